@@ -1,11 +1,16 @@
-from termcolor import colored
-from langchain_core.messages import SystemMessage, HumanMessage, BaseMessage
+from langchain_core.messages import HumanMessage, BaseMessage
 from typing import TypedDict, List
-from prompt_and_format import remove_multiline_think_blocks
-from model import model_llm
+from prompt_and_format import get_prompt, remove_multiline_think_blocks
+from model import get_model
+from fast_path import fast_path_router
+from compaction import append_messages
+from logs import get_logger
 import re
 
-llm = model_llm
+llm = get_model("analyze")
+# Interpreting the last OS output is a one-sentence job for the small model
+summary_llm = get_model("analyze_previous_summary")
+log = get_logger("analyse")
 
 class AgentState(TypedDict):
     messages: List[BaseMessage]
@@ -18,64 +23,88 @@ class AgentState(TypedDict):
     cycles: int
 
 
-def analyse_node_first_interaction(state: AgentState) -> AgentState:
+def _first_interaction_prompt(state: AgentState) -> tuple[str, List[BaseMessage]]:
     user_message = state["messages"][-1].content if state.get("messages") else ""
     # print(colored(f"[DEBUG] First interaction analysis:\n{user_message}\n{'-'*50}", "cyan"))
 
     if "problem is" in user_message.lower():
         user_message = user_message.split("problem is", 1)[-1].strip()
 
-    prompt = f"""
-Summarize the user's problem in one short sentence.
-User message:
-{user_message}
-Rules:
-- Do NOT propose a solution.
-- Max 30 words.
-"""
-    response = model_llm.invoke([SystemMessage(content=prompt)])
+    return user_message, get_prompt("analyze_first_interaction").messages(user_message=user_message)
+
+def _first_interaction_result(state: AgentState, user_message: str, response) -> AgentState:
     analysis_summary = remove_multiline_think_blocks(response.content.strip())
     # analysis_summary = response.content.strip()
 
-    print(colored(f"[DEBUG] Initial Problem Analysis: {analysis_summary}", "red"))
+    log.info("problem_analysis", summary=analysis_summary)
     return {
         **state,
         "analysis_summary": analysis_summary,
         "current_problem": analysis_summary,
-        "messages": state["messages"] + [HumanMessage(content=user_message)],
+        "messages": append_messages(state["messages"], [HumanMessage(content=user_message)]),
     }
 
-def analyse_node_previous_summary(state: AgentState) -> AgentState:
+def analyse_node_first_interaction(state: AgentState) -> AgentState:
+    shortcut = fast_path_router.run("analyze", state)
+    if shortcut is not None:
+        return shortcut
+
+    user_message, messages = _first_interaction_prompt(state)
+    response = llm.invoke(messages)
+    return _first_interaction_result(state, user_message, response)
+
+async def analyse_node_first_interaction_async(state: AgentState) -> AgentState:
+    shortcut = fast_path_router.run("analyze", state)
+    if shortcut is not None:
+        return shortcut
+
+    user_message, messages = _first_interaction_prompt(state)
+    response = await llm.ainvoke(messages)
+    return _first_interaction_result(state, user_message, response)
+
+def _previous_summary_prompt(state: AgentState) -> tuple[str, List[BaseMessage]]:
     user_message = state["messages"][-1].content if state.get("messages") else ""
     current_problem = state.get("current_problem", "")
     previous_summary = state.get("analysis_summary", "")
     last_action = state.get("last_action", None)
-    print(colored(f"[DEBUG] Previous summary analysis:\n{user_message}\n{'-'*50}", "cyan"))
-
-    prompt = f"""
-You are analyzing the output of an executed command in a multi-step reasoning process.
-The final goal is: "{current_problem}"
-Previous summary: "{previous_summary}"
-Last executed action: "{last_action}"
-System output: "{user_message}"
-Explain in ONE short sentence what this output means in relation to the goal.
-Examples:
-- If it's just a number → It's probably the result (file count).
-- If it's an error → Command failed, needs correction.
-- If unrelated → Output irrelevant to goal.
-Return only the interpretation, no extra text.
-    """
-    response = model_llm.invoke([SystemMessage(content=prompt)])
+    log.debug("previous_summary_analysis", user_message=user_message)
+
+    return user_message, get_prompt("analyze_previous_summary").messages(
+        current_problem=current_problem,
+        previous_summary=previous_summary,
+        last_action=last_action,
+        user_message=user_message,
+    )
+
+def _previous_summary_result(state: AgentState, user_message: str, response) -> AgentState:
     analysis_summary= remove_multiline_think_blocks(response.content.strip())
     # analysis_summary = response
-    print(colored(f"[DEBUG] Contextual Interpretation: {analysis_summary}", "cyan"))
+    log.info("contextual_interpretation", summary=analysis_summary)
 
     return {
         **state,
         "analysis_summary": analysis_summary,
-        "messages": state["messages"] + [HumanMessage(content=user_message)],
+        "messages": append_messages(state["messages"], [HumanMessage(content=user_message)]),
     }
 
+def analyse_node_previous_summary(state: AgentState) -> AgentState:
+    shortcut = fast_path_router.run("analyze", state)
+    if shortcut is not None:
+        return shortcut
+
+    user_message, messages = _previous_summary_prompt(state)
+    response = summary_llm.invoke(messages)
+    return _previous_summary_result(state, user_message, response)
+
+async def analyse_node_previous_summary_async(state: AgentState) -> AgentState:
+    shortcut = fast_path_router.run("analyze", state)
+    if shortcut is not None:
+        return shortcut
+
+    user_message, messages = _previous_summary_prompt(state)
+    response = await summary_llm.ainvoke(messages)
+    return _previous_summary_result(state, user_message, response)
+
 def start_new_task_if_needed(state: AgentState) -> AgentState:
     messages = state.get("messages", [])
     if not messages:
@@ -83,7 +112,7 @@ def start_new_task_if_needed(state: AgentState) -> AgentState:
 
     match = re.search(r"new problem in a new OS", messages[-1].content)
     if match:
-        print(colored("[DEBUG] Starting a new task, resetting analysis.", "yellow"))
+        log.info("new_task")
         return {
             **state,
             "analysis_summary": "",
@@ -106,3 +135,15 @@ def analyse_problem_node(state: AgentState) -> AgentState:
         return analyse_node_first_interaction(state)
     else:
         return analyse_node_previous_summary(state)
+
+async def analyse_problem_node_async(state: AgentState) -> AgentState:
+    """
+    Async variant of analyse_problem_node, used when the graph runs through ainvoke/astream.
+    """
+    state = start_new_task_if_needed(state)
+    previous_summary = state.get("analysis_summary", "")
+
+    if not previous_summary:
+        return await analyse_node_first_interaction_async(state)
+    else:
+        return await analyse_node_previous_summary_async(state)
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+import httpx
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import ensure_config
+from pydantic import PrivateAttr
+from compaction import TOKEN_RE, count_tokens
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mcp"))
+from doc_sections import parse_page
+
+# Answers used when a task script has nothing for the calling node.
+DEFAULT_RESPONSES = {
+    "analyze": "The user needs help with a Linux task.",
+    "reasoning_draft": "Think: I need more information.",
+    "planner": {"action": "reasoning_final"},
+    "reasoning_final": {"thought": "The task is complete.", "action": "finish", "code": ""},
+    "fast_pipeline": {"summary": "A Linux task.", "draft": "Nothing left to do.", "thought": "The task is complete.", "action": "finish", "code": ""},
+}
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Deterministic stand-in for the Ollama chat model.
+    Answers come from a per-node script (the node is read from the langgraph config metadata);
+    each call sleeps `latency` seconds plus one second per `tokens_per_second` completion tokens.
+    The server's KV cache is simulated over the last `kv_slots` prompts: the longest token prefix
+    shared with one of them is reported as cached, the rest as prefill.
+    """
+    latency: float = 0.0
+    tokens_per_second: float = 0.0
+    kv_slots: int = 4
+
+    _script: Dict[str, List[Any]] = PrivateAttr(default_factory=dict)
+    _calls: List[Dict] = PrivateAttr(default_factory=list)
+    _kv_cache: List[List[str]] = PrivateAttr(default_factory=list)
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def set_script(self, responses: Dict[str, Any]) -> None:
+        """A node's response is a string/dict, or a list consumed call by call (the last one repeats)."""
+        self._script = {node: list(r) if isinstance(r, list) else [r] for node, r in responses.items()}
+
+    def calls(self) -> List[Dict]:
+        return list(self._calls)
+
+    def reset_calls(self) -> None:
+        self._calls.clear()
+
+    def _cached_prefix(self, messages: List[BaseMessage]) -> int:
+        """Tokens of the prompt already in the simulated KV cache, then the prompt becomes the most recent slot."""
+        # Messages are rendered one after the other, role first, as a chat template does
+        tokens = [t for m in messages for t in TOKEN_RE.findall(f"{m.type}\n{m.content}")]
+        cached = 0
+        for slot in self._kv_cache:
+            shared = 0
+            for a, b in zip(slot, tokens):
+                if a != b:
+                    break
+                shared += 1
+            cached = max(cached, shared)
+        if self.kv_slots:
+            self._kv_cache = [tokens] + self._kv_cache[:self.kv_slots - 1]
+        return cached
+
+    def _respond(self, messages: List[BaseMessage]) -> tuple[AIMessage, float]:
+        node = ensure_config().get("metadata", {}).get("langgraph_node", "")
+        queue = self._script.get(node)
+        if queue:
+            response = queue.pop(0) if len(queue) > 1 else queue[0]
+        else:
+            response = DEFAULT_RESPONSES.get(node, "")
+        text = response if isinstance(response, str) else json.dumps(response)
+
+        prompt_tokens = sum(count_tokens(str(m.content)) for m in messages)
+        completion_tokens = count_tokens(text)
+        cached = self._cached_prefix(messages)
+        self._calls.append({
+            "node": node,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "prefix_cached_tokens": cached,
+        })
+
+        delay = self.latency + (completion_tokens / self.tokens_per_second if self.tokens_per_second else 0.0)
+        message = AIMessage(content=text, usage_metadata={
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        })
+        return message, delay
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message, delay = self._respond(messages)
+        time.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message, delay = self._respond(messages)
+        await asyncio.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def with_structured_output(self, schema, **kwargs):
+        # Scripted answers for structured nodes are already JSON objects
+        return self | PydanticOutputParser(pydantic_object=schema)
+
+class FakeDocServer:
+    """
+    In-process replacement for mcp/mcp_linux_doc.py, mounted with httpx.MockTransport.
+    `pages` maps a command to its man page text; search is a plain substring match per line,
+    semantic search ranks lines by shared words, sliced get_doc queries use the server's own parser.
+    """
+
+    def __init__(self, pages: Dict[str, str], latency: float = 0.0):
+        self.pages = pages
+        self.latency = latency
+        self.requests = 0
+        self.queries: List[tuple[str, Dict]] = []
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self)
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        time.sleep(self.latency)
+        params = request.url.params
+        self.queries.append((request.url.path, dict(params)))
+        if request.url.path == "/get_doc":
+            max_tokens = params.get("max_tokens")
+            return httpx.Response(200, json=self.get_doc(
+                params.get("command", ""), params.get("section"), params.get("flag"), int(max_tokens) if max_tokens else None,
+            ))
+        if request.url.path == "/search":
+            return httpx.Response(200, json=self.search(params.get("q", ""), params.get("command") or None, int(params.get("k", 5))))
+        if request.url.path == "/get_docs":
+            commands, flags = params.get_list("commands"), params.get_list("flags")
+            max_tokens = params.get("max_tokens")
+            return httpx.Response(200, json={"docs": {
+                command: self.get_doc(command, params.get("section"), (flags[i] if i < len(flags) else "") or None, int(max_tokens) if max_tokens else None)
+                for i, command in enumerate(commands)
+            }})
+        if request.url.path == "/semantic_search":
+            return httpx.Response(200, json=self.semantic_search(params.get("q", ""), params.get("command") or None, int(params.get("k", 5))))
+        return httpx.Response(404, json={"detail": "Not Found"})
+
+    def get_doc(self, command: str, section: str | None = None, flag: str | None = None, max_tokens: int | None = None) -> Dict:
+        page = self.pages.get(command)
+        if page is None:
+            return {"error": f"No documentation found for \'{command}\'", "not_found": True}
+        if section is None and flag is None and max_tokens is None:
+            return {"command": command, "summary": page.split("\n\n", 1)[0], "full_doc": page}
+        return {"command": command, **parse_page(command, page).slices(section, flag, max_tokens)}
+
+    def search(self, q: str, command: str | None, k: int) -> Dict:
+        if command is not None and command not in self.pages:
+            return {"error": f"No documentation found for \'{command}\'", "not_found": True}
+        results = []
+        for name, page in self.pages.items():
+            if command is not None and name != command:
+                continue
+            for line in page.splitlines():
+                if q.lower() in line.lower():
+                    results.append({"command": name, "section": "DESCRIPTION", "text": line.strip(), "score": 1.0})
+        return {"query": q, "command": command, "results": results[:k]}
+
+    def semantic_search(self, q: str, command: str | None, k: int) -> Dict:
+        words = set(TOKEN_RE.findall(q.lower()))
+        scored = []
+        for name, page in self.pages.items():
+            if command is not None and name != command:
+                continue
+            for line in page.splitlines():
+                shared = len(words & set(TOKEN_RE.findall(line.lower())))
+                if shared:
+                    scored.append((shared, {"command": name, "section": "DESCRIPTION", "text": line.strip(), "score": float(shared)}))
+        scored.sort(key=lambda item: -item[0])
+        return {"query": q, "command": command, "results": [hit for _, hit in scored[:k]]}
@@ -0,0 +1,194 @@
+"""
+Offline benchmark of the agent graph: the real StateGraph from main.py runs against
+ScriptedChatModel and FakeDocServer, so the numbers only depend on the code under test.
+
+    python -m benchmarks.run --latency 0.05 --tokens-per-second 200 --output bench.json
+
+Token and call counts are deterministic; wall times scale with the simulated latency.
+prefix_cached_tokens is the prefill the server saves by reusing its KV cache (see prompts/).
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import subprocess
+import time
+from collections import defaultdict
+from typing import Dict
+from langchain_core.callbacks import BaseCallbackHandler
+from langgraph.checkpoint.memory import MemorySaver
+
+import analyse
+import doc_client
+import main
+import reasoning
+import tools
+from fast_path import fast_path_router
+from logs import configure_logging
+from prompt_and_format import PROMPT_VERSION
+from session_store import build_initial_state, merge_session_context, context_size
+from benchmarks.fakes import ScriptedChatModel, FakeDocServer
+
+TASKS_PATH = os.path.join(os.path.dirname(__file__), "tasks.json")
+
+class NodeTimer(BaseCallbackHandler):
+    """Wall time of every graph node run, from the langgraph callbacks."""
+    run_inline = True
+
+    def __init__(self):
+        self._started: Dict = {}
+        self.runs: list[tuple[str, float]] = []
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node is not None and kwargs.get("name") == node:
+            self._started[run_id] = (node, time.perf_counter())
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            self.runs.append((started[0], time.perf_counter() - started[1]))
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self.on_chain_end(None, run_id=run_id)
+
+@contextlib.contextmanager
+def patched_environment(model: ScriptedChatModel, server: FakeDocServer):
+    """Point every node at the scripted model and the doc client at the fake server."""
+    saved = {
+        (analyse, "llm"): analyse.llm,
+        (analyse, "summary_llm"): analyse.summary_llm,
+        (reasoning, "llm"): reasoning.llm,
+        (main, "llm"): main.llm,
+        (main, "model_with_structured_output"): main.model_with_structured_output,
+        (main, "model_with_fast_output"): main.model_with_fast_output,
+        (main, "model_with_plan_output"): main.model_with_plan_output,
+    }
+    analyse.llm = analyse.summary_llm = reasoning.llm = main.llm = model
+    main.model_with_structured_output = model.with_structured_output(main.FinalResponse)
+    main.model_with_fast_output = model.with_structured_output(main.FastPipelineResponse)
+    main.model_with_plan_output = model.with_structured_output(main.PlanOutput)
+    doc_client.configure(doc_client.DocClientConfig(base_url="http://docs.local", max_retries=0), transport=server.transport())
+    # Results cached by an earlier run or by the real server must not leak into this one
+    tools.tool_cache.clear()
+    try:
+        yield
+    finally:
+        for (module, name), value in saved.items():
+            setattr(module, name, value)
+        doc_client.configure()
+        tools.tool_cache.clear()
+
+def _node_stats() -> Dict:
+    return {"runs": 0, "wall_time": 0.0, "llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "prefix_cached_tokens": 0}
+
+async def run_task(app_graph, task: Dict, model: ScriptedChatModel, server: FakeDocServer, run_id: str) -> Dict:
+    thread_id = f"bench-{run_id}-{task['id']}"
+    config = {"configurable": {"thread_id": thread_id}}
+    timer = NodeTimer()
+    model.reset_calls()
+    doc_requests = server.requests
+    hits_before = fast_path_router.hits.copy()
+    tool_cache_hits = tools.tool_cache.stats()["hits"]
+    context: Dict = {}
+    turns = []
+
+    started = time.perf_counter()
+    for turn in task["turns"]:
+        model.set_script(turn["responses"])
+        turn_started = time.perf_counter()
+        result = await app_graph.ainvoke(build_initial_state(context, turn["user"]), config={**config, "callbacks": [timer]})
+        context = merge_session_context(context, result)
+        turns.append({
+            "wall_time": time.perf_counter() - turn_started,
+            "last_action": result.get("last_action", ""),
+            "state_size": context_size(result),
+            "messages": len(result.get("messages", [])),
+        })
+    wall_time = time.perf_counter() - started
+
+    nodes = defaultdict(_node_stats)
+    for node, elapsed in timer.runs:
+        nodes[node]["runs"] += 1
+        nodes[node]["wall_time"] += elapsed
+    calls = model.calls()
+    for call in calls:
+        stats = nodes[call["node"]]
+        stats["llm_calls"] += 1
+        stats["prompt_tokens"] += call["prompt_tokens"]
+        stats["completion_tokens"] += call["completion_tokens"]
+        stats["prefix_cached_tokens"] += call["prefix_cached_tokens"]
+
+    return {
+        "id": task["id"],
+        "wall_time": wall_time,
+        "llm_calls": len(calls),
+        "prompt_tokens": sum(c["prompt_tokens"] for c in calls),
+        "completion_tokens": sum(c["completion_tokens"] for c in calls),
+        "prefix_cached_tokens": sum(c["prefix_cached_tokens"] for c in calls),
+        "doc_requests": server.requests - doc_requests,
+        "tool_cache_hits": tools.tool_cache.stats()["hits"] - tool_cache_hits,
+        "planner_loops": nodes["planner"]["runs"] if "planner" in nodes else 0,
+        "state_size": turns[-1]["state_size"] if turns else 0,
+        "shortcut_hits": dict(fast_path_router.hits - hits_before),
+        "turns": turns,
+        "nodes": dict(sorted(nodes.items())),
+    }
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run_benchmark(mode: str = "thorough", latency: float = 0.0, tokens_per_second: float = 0.0,
+                        doc_latency: float = 0.0, repeat: int = 1, tasks_path: str = TASKS_PATH,
+                        only: list[str] | None = None, kv_slots: int = 4) -> Dict:
+    with open(tasks_path) as f:
+        corpus = json.load(f)
+    tasks = [task for task in corpus["tasks"] if not only or task["id"] in only]
+
+    model = ScriptedChatModel(latency=latency, tokens_per_second=tokens_per_second, kv_slots=kv_slots)
+    server = FakeDocServer(corpus["pages"], latency=doc_latency)
+    # A private checkpointer so runs never see each other's threads
+    app_graph = (main.fast_graph if mode == "fast" else main.graph).compile(checkpointer=MemorySaver())
+
+    results = []
+    with patched_environment(model, server):
+        for run in range(repeat):
+            for task in tasks:
+                results.append({"run": run, **await run_task(app_graph, task, model, server, f"{mode}-{run}")})
+
+    totals = {key: sum(r[key] for r in results) for key in ("wall_time", "llm_calls", "prompt_tokens", "completion_tokens", "prefix_cached_tokens", "doc_requests", "planner_loops")}
+    return {
+        "commit": _git_commit(),
+        "config": {"mode": mode, "latency": latency, "tokens_per_second": tokens_per_second, "doc_latency": doc_latency, "repeat": repeat,
+                   "kv_slots": kv_slots, "prompt_version": PROMPT_VERSION},
+        "totals": totals,
+        "tasks": results,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark of the agent graph")
+    parser.add_argument("--mode", choices=["thorough", "fast"], default="thorough")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per LLM call before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Simulated completion speed, 0 = instant")
+    parser.add_argument("--doc-latency", type=float, default=0.0, help="Seconds per doc server request")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--kv-slots", type=int, default=4, help="Prompts kept in the simulated server KV cache (prefix reuse)")
+    parser.add_argument("--tasks", default=TASKS_PATH, help="Task corpus (JSON)")
+    parser.add_argument("--only", nargs="*", help="Task ids to run")
+    parser.add_argument("--output", default=None, help="Write the JSON report here instead of stdout")
+    parser.add_argument("--log-level", default="WARNING", help="Node log level during the run (logs go to stderr)")
+    args = parser.parse_args()
+
+    configure_logging(args.log_level)
+
+    report = asyncio.run(run_benchmark(args.mode, args.latency, args.tokens_per_second, args.doc_latency, args.repeat, args.tasks, args.only, args.kv_slots))
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
@@ -1,13 +1,14 @@
 import uuid
-from langchain_core.messages import HumanMessage
+from session_store import SessionStore, create_session_store, build_initial_state, merge_session_context
+from deadline import DEADLINE_KEY, DeadlineExceeded, deadline_after, finish_on_deadline
 
-session_cache = globals().get("session_cache", {})
+session_cache: SessionStore = create_session_store()
 
-def run_cli(app_graph, thread_id: str | None = None, output_mode: str = "last_action"):
+def run_cli(app_graph, thread_id: str | None = None, output_mode: str = "last_action", session_store: SessionStore | None = None):
     print("CLI mode - write 'exit' to leave\n")
+    sessions = session_store if session_store is not None else session_cache
 
     thread_id = thread_id or f"cli-{uuid.uuid4()}"
-    config = {"configurable": {"thread_id": thread_id}}
 
     def get_role(m):
 
@@ -35,7 +36,7 @@ def run_cli(app_graph, thread_id: str | None = None, output_mode: str = "last_ac
         if user_input.lower() in ("exit", "quit"):
             break
 
-        context = session_cache.get(thread_id, {
+        context = sessions.get(thread_id, {
             "expected_format": "",
             "analysis_summary": "",
             "tool_history": [],
@@ -47,30 +48,15 @@ def run_cli(app_graph, thread_id: str | None = None, output_mode: str = "last_ac
             "cycles": 0,
         })
 
-        initial_state = {
-            "messages": [HumanMessage(content=user_input)],
-            "expected_format": context.get("expected_format", ""),
-            "analysis_summary": context.get("analysis_summary", ""),
-            "tool_history": context.get("tool_history", []),
-            "draft_solution": context.get("draft_solution", ""),
-            "current_problem": context.get("current_problem", ""),
-            "last_action": context.get("last_action", ""),
-            "tool_context": context.get("tool_context", ""),
-            "cycles": context.get("cycles", 0),
-        }
+        initial_state = build_initial_state(context, user_input)
 
-        result = app_graph.invoke(initial_state, config=config)
+        config = {"configurable": {"thread_id": thread_id, DEADLINE_KEY: deadline_after()}}
+        try:
+            result = app_graph.invoke(initial_state, config=config)
+        except DeadlineExceeded:
+            result = finish_on_deadline(app_graph.get_state(config).values or initial_state)
 
-        session_cache[thread_id] = {
-            "expected_format": result.get("expected_format", context["expected_format"]),
-            "analysis_summary": result.get("analysis_summary", context["analysis_summary"]),
-            "tool_history": result.get("tool_history", context["tool_history"]),
-            "draft_solution": result.get("draft_solution", context.get("draft_solution", "")),
-            "current_problem": result.get("current_problem", context.get("current_problem", "")),
-            "last_action": result.get("last_action", context.get("last_action", "")),
-            "tool_context": result.get("tool_context", context.get("tool_context", "")),
-            "cycles": result.get("cycles", context.get("cycles", 0)),
-        }
+        sessions[thread_id] = merge_session_context(context, result)
 
         if output_mode == "assistant":
             msgs = result["messages"] if isinstance(result, dict) and "messages" in result else []
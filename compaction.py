@@ -0,0 +1,72 @@
+import os
+import re
+from typing import List
+from langchain_core.messages import BaseMessage, SystemMessage
+
+# Per-thread budget for state["messages"]; the last HISTORY_KEEP_LAST messages are always kept verbatim.
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", 2000))
+HISTORY_KEEP_LAST = int(os.environ.get("HISTORY_KEEP_LAST", 4))
+# Each folded message contributes at most this many tokens to the rolling summary.
+FOLDED_MESSAGE_TOKENS = 40
+
+SUMMARY_PREFIX = "[HISTORY SUMMARY]"
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+def count_tokens(text: str) -> int:
+    """Local token estimate (words and punctuation), close enough to BPE counts for budgeting."""
+    return len(TOKEN_RE.findall(text))
+
+def message_tokens(messages: List[BaseMessage]) -> int:
+    return sum(count_tokens(str(m.content)) for m in messages)
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    matches = list(TOKEN_RE.finditer(text))
+    if len(matches) <= max_tokens:
+        return text
+    return text[:matches[max_tokens - 1].end()] + " ..."
+
+def is_summary(message: BaseMessage) -> bool:
+    return isinstance(message, SystemMessage) and str(message.content).startswith(SUMMARY_PREFIX)
+
+def fold_message(message: BaseMessage) -> str:
+    """One summary line per folded message. Tool results keep their header and the start of the output."""
+    text = " ".join(str(message.content).split())
+    return f"- {message.type}: {truncate_tokens(text, FOLDED_MESSAGE_TOKENS)}"
+
+def compact_messages(messages: List[BaseMessage], budget: int | None = None, keep_last: int | None = None) -> List[BaseMessage]:
+    """
+    Keep the message history under `budget` tokens: the last `keep_last` messages stay verbatim,
+    older ones are folded into a single rolling summary message at the head of the list.
+    """
+    budget = HISTORY_TOKEN_BUDGET if budget is None else budget
+    keep_last = HISTORY_KEEP_LAST if keep_last is None else keep_last
+
+    if len(messages) <= keep_last or message_tokens(messages) <= budget:
+        return messages
+
+    split = len(messages) - keep_last
+    head, tail = messages[:split], messages[split:]
+    lines = []
+    for message in head:
+        if is_summary(message):
+            lines.extend(str(message.content).splitlines()[1:])
+        else:
+            lines.append(fold_message(message))
+
+    # The summary gets whatever the verbatim tail leaves of the budget; the oldest lines go first.
+    summary_budget = max(budget - message_tokens(tail), 0)
+    line_tokens = [count_tokens(line) for line in lines]
+    total = sum(line_tokens)
+    start = 0
+    while start < len(lines) and total > summary_budget:
+        total -= line_tokens[start]
+        start += 1
+    lines = lines[start:]
+
+    if not lines:
+        return tail
+    return [SystemMessage(content="\n".join([SUMMARY_PREFIX, *lines]))] + tail
+
+def append_messages(messages: List[BaseMessage], new_messages: List[BaseMessage]) -> List[BaseMessage]:
+    """Drop-in replacement for `messages + new_messages` that keeps the history within budget."""
+    return compact_messages(messages + new_messages)
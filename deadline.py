@@ -0,0 +1,64 @@
+import asyncio
+import functools
+import os
+import time
+from typing import Callable, Dict
+from langchain_core.runnables import ensure_config
+
+# Set in the graph config ({"configurable": {DEADLINE_KEY: time.monotonic() + seconds}}) to bound one turn.
+DEADLINE_KEY = "deadline"
+
+# Default time budget of one turn, in seconds (0 = no deadline).
+TURN_TIMEOUT = float(os.environ.get("TURN_TIMEOUT", 120))
+
+FINISH_ON_DEADLINE = "Think: The time budget for this turn ran out before a final answer was reached.\nAct: finish"
+
+class DeadlineExceeded(Exception):
+    """The turn's deadline passed: raised between nodes, or when an async node had to be cancelled."""
+
+def deadline_after(timeout: float | None = None) -> float | None:
+    timeout = TURN_TIMEOUT if timeout is None else timeout
+    return time.monotonic() + timeout if timeout > 0 else None
+
+def remaining(config: Dict | None = None) -> float | None:
+    """Seconds left before the deadline of the current run, None when it has none."""
+    config = config if config is not None else ensure_config()
+    deadline = config.get("configurable", {}).get(DEADLINE_KEY)
+    return None if deadline is None else deadline - time.monotonic()
+
+def check_deadline(config: Dict | None = None) -> None:
+    left = remaining(config)
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(f"deadline exceeded by {-left:.3f}s")
+
+def finish_on_deadline(state: Dict) -> Dict:
+    """Best-effort turn result: whatever the graph had reached, closed with Act: finish."""
+    return {**state, "final_response": FINISH_ON_DEADLINE, "last_action": FINISH_ON_DEADLINE}
+
+def guard_node(func: Callable, afunc: Callable | None = None) -> tuple[Callable, Callable | None]:
+    """
+    Check the deadline before each node. The async variant also runs under the time left,
+    so an LLM or doc-server call still in flight at the deadline is cancelled.
+    """
+
+    @functools.wraps(func)
+    def wrapper(state):
+        check_deadline()
+        return func(state)
+
+    if afunc is None:
+        return wrapper, None
+
+    @functools.wraps(afunc)
+    async def async_wrapper(state):
+        left = remaining()
+        if left is None:
+            return await afunc(state)
+        if left <= 0:
+            raise DeadlineExceeded(f"deadline exceeded by {-left:.3f}s")
+        try:
+            return await asyncio.wait_for(afunc(state), timeout=left)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded("deadline reached while the node was running") from None
+
+    return wrapper, async_wrapper
@@ -0,0 +1,182 @@
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+from collections import OrderedDict
+import httpx
+from pydantic import BaseModel
+
+RETRYABLE_STATUS = {502, 503, 504}
+
+class DocClientConfig(BaseModel):
+    """Connection settings for the Linux doc server (mcp/mcp_linux_doc.py)."""
+    base_url: str = "http://localhost:9000"
+    connect_timeout: float = 2.0
+    read_timeout: float = 10.0
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 30.0
+    max_retries: int = 2
+    backoff_base: float = 0.1
+    backoff_max: float = 2.0
+    etag_cache_size: int = 256
+
+    @classmethod
+    def from_env(cls) -> "DocClientConfig":
+        env = {
+            "base_url": os.environ.get("DOC_SERVER_URL"),
+            "connect_timeout": os.environ.get("DOC_CONNECT_TIMEOUT"),
+            "read_timeout": os.environ.get("DOC_READ_TIMEOUT"),
+            "max_connections": os.environ.get("DOC_MAX_CONNECTIONS"),
+            "max_retries": os.environ.get("DOC_MAX_RETRIES"),
+            "etag_cache_size": os.environ.get("DOC_ETAG_CACHE_SIZE"),
+        }
+        return cls(**{k: v for k, v in env.items() if v is not None})
+
+_config = DocClientConfig.from_env()
+_transport = None
+_client: httpx.Client | None = None
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+class ValidatorCache:
+    """
+    Last 200 answer of each request with the ETag it came with, bounded LRU.
+    The tag is sent back as If-None-Match: an unchanged page costs a 304 instead of its body.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, tuple[str, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"revalidated": 0, "changed": 0}
+
+    @staticmethod
+    def key(path: str, params: dict) -> tuple:
+        return path, tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in params.items()))
+
+    def headers(self, key: tuple) -> dict:
+        with self._lock:
+            entry = self._entries.get(key)
+        return {"If-None-Match": entry[0]} if entry is not None else {}
+
+    def not_modified(self, key: tuple) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.stats["revalidated"] += 1
+            return entry[1]
+
+    def store(self, key: tuple, resp: httpx.Response, data: dict) -> None:
+        etag = resp.headers.get("etag")
+        if etag is None or self.max_entries <= 0:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.stats["changed"] += 1
+            self._entries[key] = (etag, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.stats = {"revalidated": 0, "changed": 0}
+
+validators = ValidatorCache(_config.etag_cache_size)
+
+def configure(config: DocClientConfig | None = None, transport=None) -> None:
+    """Replace the client settings. Pooled clients are rebuilt on next use."""
+    global _config, _transport, _client
+    _config = config or DocClientConfig.from_env()
+    _transport = transport
+    validators.clear()
+    validators.max_entries = _config.etag_cache_size
+    if _client is not None:
+        _client.close()
+    _client = None
+    _async_clients.clear()
+
+def _client_kwargs() -> dict:
+    kwargs = {
+        "base_url": _config.base_url,
+        "timeout": httpx.Timeout(_config.read_timeout, connect=_config.connect_timeout),
+        "limits": httpx.Limits(
+            max_connections=_config.max_connections,
+            max_keepalive_connections=_config.max_keepalive_connections,
+            keepalive_expiry=_config.keepalive_expiry,
+        ),
+    }
+    if _transport is not None:
+        kwargs["transport"] = _transport
+    return kwargs
+
+def get_client() -> httpx.Client:
+    """Shared keep-alive client for the sync tool path."""
+    global _client
+    if _client is None:
+        _client = httpx.Client(**_client_kwargs())
+    return _client
+
+def get_async_client() -> httpx.AsyncClient:
+    """Shared keep-alive client for the async tool path, one per event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(**_client_kwargs())
+        _async_clients[loop] = client
+    return client
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(_config.backoff_max, _config.backoff_base * 2 ** attempt))
+
+def _answer(key: tuple, resp: httpx.Response) -> dict:
+    data = resp.json()
+    if resp.status_code == 200:
+        validators.store(key, resp, data)
+    return data
+
+def get_json(path: str, params: dict) -> dict:
+    key = validators.key(path, params)
+    for attempt in range(_config.max_retries + 1):
+        last_attempt = attempt == _config.max_retries
+        try:
+            resp = get_client().get(path, params=params, headers=validators.headers(key))
+            if resp.status_code == 304:
+                data = validators.not_modified(key)
+                if data is not None:
+                    return data
+                # The stored answer was evicted since the request left: ask for the body again
+                resp = get_client().get(path, params=params)
+        except httpx.TransportError:
+            if last_attempt:
+                raise
+        else:
+            if resp.status_code not in RETRYABLE_STATUS or last_attempt:
+                return _answer(key, resp)
+        time.sleep(backoff_delay(attempt))
+
+async def aget_json(path: str, params: dict) -> dict:
+    key = validators.key(path, params)
+    for attempt in range(_config.max_retries + 1):
+        last_attempt = attempt == _config.max_retries
+        try:
+            resp = await get_async_client().get(path, params=params, headers=validators.headers(key))
+            if resp.status_code == 304:
+                data = validators.not_modified(key)
+                if data is not None:
+                    return data
+                # The stored answer was evicted since the request left: ask for the body again
+                resp = await get_async_client().get(path, params=params)
+        except httpx.TransportError:
+            if last_attempt:
+                raise
+        else:
+            if resp.status_code not in RETRYABLE_STATUS or last_attempt:
+                return _answer(key, resp)
+        await asyncio.sleep(backoff_delay(attempt))
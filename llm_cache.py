@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Sequence
+from langchain_core.caches import BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+from langchain_core.runnables import ensure_config
+
+# Set in the graph config ({"configurable": {BYPASS_KEY: True}}) to skip the cache for one request.
+BYPASS_KEY = "bypass_llm_cache"
+# generation_info flag of the generations served from the cache, so callbacks can tell them from real calls
+CACHED_KEY = "llm_cache_hit"
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """
+    llm_string carries the model name and its parameters (temperature, max tokens, format, stop...).
+    The prompt is hashed as serialized: OS output and bash code are what the model reasons about,
+    so no whitespace or quoting is normalized away. The static templates are already stripped at
+    load time (prompt_and_format.load_prompts), so identical calls serialize identically.
+    """
+    return hashlib.sha256(f"{llm_string}\0{prompt}".encode()).hexdigest()
+
+def _dump_generations(generations: Sequence[Generation]) -> str:
+    return json.dumps([
+        {"message": message_to_dict(g.message), "generation_info": g.generation_info}
+        if isinstance(g, ChatGeneration) else {"text": g.text, "generation_info": g.generation_info}
+        for g in generations
+    ])
+
+def _load_generations(payload: str) -> list[Generation]:
+    generations = []
+    for item in json.loads(payload):
+        if "message" in item:
+            message = messages_from_dict([item["message"]])[0]
+            generations.append(ChatGeneration(message=message, generation_info=item["generation_info"]))
+        else:
+            generations.append(Generation(text=item["text"], generation_info=item["generation_info"]))
+    return generations
+
+def _bypassed() -> bool:
+    return bool(ensure_config().get("configurable", {}).get(BYPASS_KEY))
+
+class TTLLRUCache(BaseCache):
+    """
+    Exact-match cache for chat model responses, plugged into the models through
+    langchain's `cache=` hook so every invoke/ainvoke/with_structured_output goes through it.
+    - in-memory LRU of `max_entries` items, each valid for `ttl` seconds (None: forever)
+    - optional SQLite persistence at `path`, shared across restarts and benchmark reruns
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float | None = 3600, path: str | None = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self._memory: OrderedDict[str, tuple[float, list[Generation]]] = OrderedDict()
+        self._db: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "bypassed": 0}
+
+    @classmethod
+    def from_env(cls) -> "TTLLRUCache":
+        ttl = float(os.environ.get("LLM_CACHE_TTL", 3600))
+        return cls(
+            max_entries=int(os.environ.get("LLM_CACHE_SIZE", 1024)),
+            ttl=ttl if ttl > 0 else None,
+            path=os.environ.get("LLM_CACHE_PATH") or None,
+        )
+
+    def _connect(self) -> sqlite3.Connection | None:
+        if self.path and self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, created REAL NOT NULL, generations TEXT NOT NULL)")
+        return self._db
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _remember(self, key: str, created: float, generations: list[Generation]) -> None:
+        self._memory[key] = (created, generations)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _lookup(self, key: str) -> list[Generation] | None:
+        entry = self._memory.get(key)
+        if entry is None:
+            db = self._connect()
+            row = db.execute("SELECT created, generations FROM llm_cache WHERE key = ?", (key,)).fetchone() if db else None
+            if row is None:
+                return None
+            entry = (row[0], _load_generations(row[1]))
+            self._remember(key, *entry)
+
+        created, generations = entry
+        if self._expired(created):
+            del self._memory[key]
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._db.commit()
+            self._stats["expirations"] += 1
+            return None
+        self._memory.move_to_end(key)
+        return generations
+
+    def lookup(self, prompt: str, llm_string: str) -> Sequence[Generation] | None:
+        with self._lock:
+            if _bypassed():
+                self._stats["bypassed"] += 1
+                return None
+            generations = self._lookup(cache_key(prompt, llm_string))
+            self._stats["hits" if generations is not None else "misses"] += 1
+            if generations is None:
+                return None
+            return [g.model_copy(update={"generation_info": {**(g.generation_info or {}), CACHED_KEY: True}}) for g in generations]
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        if _bypassed():
+            return
+        key = cache_key(prompt, llm_string)
+        created = time.time()
+        with self._lock:
+            self._remember(key, created, list(return_val))
+            db = self._connect()
+            if db is not None:
+                db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, created, generations) VALUES (?, ?, ?)",
+                    (key, created, _dump_generations(return_val)),
+                )
+                db.commit()
+
+    async def alookup(self, prompt: str, llm_string: str) -> Sequence[Generation] | None:
+        # Memory and local SQLite lookups are fast enough to run inline on the event loop
+        return self.lookup(prompt, llm_string)
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        self.update(prompt, llm_string, return_val)
+
+    def clear(self, **kwargs) -> None:
+        with self._lock:
+            self._memory.clear()
+            db = self._connect()
+            if db is not None:
+                db.execute("DELETE FROM llm_cache")
+                db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "entries": len(self._memory), "max_entries": self.max_entries, "ttl": self.ttl}
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            for name in self._stats:
+                self._stats[name] = 0
+
+llm_cache = TTLLRUCache.from_env()
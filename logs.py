@@ -0,0 +1,88 @@
+import json
+import logging
+import os
+import sys
+from typing import Any
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import ensure_config
+
+# LOG_LEVEL: DEBUG dumps prompts, messages and state keys; INFO logs node results; WARNING keeps the hot path silent.
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+ROOT_LOGGER = "agent"
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, BaseMessage):
+        return {"type": value.type, "content": value.content}
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if isinstance(value, (set, tuple)) or type(value).__name__ in ("dict_keys", "dict_values"):
+        return list(value)
+    return str(value)
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, event, thread_id, node and the call's fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = {
+            "ts": round(record.created, 6),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+            "thread_id": getattr(record, "thread_id", None),
+            "node": getattr(record, "node", None),
+            **getattr(record, "fields", {}),
+        }
+        if record.exc_info:
+            line["exc"] = self.formatException(record.exc_info)
+        return json.dumps(line, default=_json_default, ensure_ascii=False)
+
+class StructuredLogger:
+    """
+    Leveled logger for the graph nodes. Fields are passed as keyword arguments, never pre-formatted:
+    when the level is disabled the call returns before touching them, so logging state or messages costs nothing.
+    """
+
+    def __init__(self, name: str):
+        self._logger = logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+    def is_enabled(self, level: int) -> bool:
+        return self._logger.isEnabledFor(level)
+
+    def _log(self, level: int, event: str, fields: dict, exc_info=None) -> None:
+        if not self._logger.isEnabledFor(level):
+            return
+        config = ensure_config()
+        extra = {
+            "thread_id": config.get("configurable", {}).get("thread_id"),
+            "node": config.get("metadata", {}).get("langgraph_node"),
+            "fields": fields,
+        }
+        self._logger.log(level, event, extra=extra, exc_info=exc_info)
+
+    def debug(self, event: str, **fields) -> None:
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event: str, **fields) -> None:
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event: str, **fields) -> None:
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event: str, exc_info=None, **fields) -> None:
+        self._log(logging.ERROR, event, fields, exc_info=exc_info)
+
+def configure_logging(level: str | int | None = None, stream=None) -> None:
+    """JSON lines on stderr (stdout stays free for the CLI). Safe to call again to change the level or stream."""
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.setLevel(level if level is not None else LOG_LEVEL)
+    logger.propagate = False
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter())
+    logger.addHandler(handler)
+
+def get_logger(name: str) -> StructuredLogger:
+    return StructuredLogger(name)
+
+configure_logging()
@@ -1,25 +1,39 @@
-from fastapi import FastAPI
+import asyncio
+import contextlib
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
 from langgraph.graph import StateGraph, END
 from langgraph.prebuilt import ToolNode
 from langchain_core.messages import HumanMessage, SystemMessage, BaseMessage
 from langchain_core.tools import tool
-from langgraph.checkpoint.memory import MemorySaver
 from pydantic import BaseModel, Field
 from typing import TypedDict, List
 from langchain_core.messages import BaseMessage
-from prompt_and_format import remove_multiline_think_blocks
-from termcolor import colored
 
 import uvicorn
 
-from model import model_llm
-from tools import linux_doc_node, search_in_doc_node
-from reasoning import reasoning_draft_node
-from analyse import analyse_problem_node
+from langchain_core.runnables import RunnableLambda
+from langchain_core.exceptions import OutputParserException
+from model import get_model
+from fast_path import fast_path_router
+import metrics
+from deadline import guard_node
+from warmup import ModelWarmer, WARMUP_ENABLED
+from logs import get_logger
+from compaction import append_messages
+from prompt_and_format import get_prompt
+from tools import (
+    PlanOutput, linux_doc_node, linux_doc_node_async, search_in_doc_node, search_in_doc_node_async,
+    semantic_search_node, semantic_search_node_async,
+)
+from reasoning import reasoning_draft_node, reasoning_draft_node_async
+from analyse import analyse_problem_node, analyse_problem_node_async, start_new_task_if_needed
 
 MAX_CYCLES = 2
 
-llm = model_llm
+llm = get_model("reasoning_final")
+planner_llm = get_model("planner")
+log = get_logger("main")
 
 class FinalResponse(BaseModel):
     """Structured response for final reasoning output"""
@@ -27,6 +41,11 @@ class FinalResponse(BaseModel):
     action: str = Field(description="The final action to take. Must be one of: bash, answer(...), or finish.")
     code: str = Field(default="", description="If action is bash, the bash command to run.")
 
+class FastPipelineResponse(FinalResponse):
+    """Structured response of the single-call fast pipeline: analysis, draft and final answer at once"""
+    summary: str = Field(description="The user's problem, or the meaning of the last OS output, in one short sentence.")
+    draft: str = Field(description="Short reasoning about how to solve the problem.")
+
 class AgentState(TypedDict):
     messages: List[BaseMessage]
     expected_format: str
@@ -36,10 +55,36 @@ class AgentState(TypedDict):
     draft_solution: str
     tool_context: str
     cycles: int
+    # Planner decision read by the tool nodes; without the channel langgraph dropped it after routing
+    plan: dict
 
 model_with_structured_output = llm.with_structured_output(FinalResponse)
-
-import re
+model_with_fast_output = get_model("fast_pipeline").with_structured_output(FastPipelineResponse)
+# Ollama constrains decoding to the PlanOutput JSON schema: the action is always a valid edge
+model_with_plan_output = planner_llm.with_structured_output(PlanOutput, method="json_schema")
+
+def _planner_shortcut(state: AgentState) -> AgentState | None:
+    shortcut = fast_path_router.run("planner", state)
+    if shortcut is not None:
+        metrics.planner_decisions.inc(action=shortcut["plan"]["action"], source="shortcut")
+    return shortcut
+
+def _planner_prompt(state: AgentState) -> list[BaseMessage]:
+    return get_prompt("planner").messages(
+        current_problem=state.get("current_problem", ""),
+        draft_solution=state.get("draft_solution", ""),
+    )
+
+def _planner_decision(state: AgentState, plan: PlanOutput | None) -> AgentState:
+    # Only a truncated or empty generation can fail to parse: keep drafting
+    plan = plan or PlanOutput(action="reasoning_draft")
+
+    metrics.planner_decisions.inc(action=plan.action, source="llm")
+    log.info("planner_decision", action=plan.action, command=plan.command, keyword=plan.keyword)
+    return {
+        **state,
+        "plan": {"action": plan.action, "input": {"command": plan.command, "keyword": plan.keyword}}
+    }
 
 def planner_node(state: AgentState) -> AgentState:
     """
@@ -48,95 +93,39 @@ def planner_node(state: AgentState) -> AgentState:
     - Utiliser un outil
     - Passer à la réponse finale
     """
-    current_problem = state.get("current_problem", "")
-    analysis_summary = state.get("analysis_summary", "")
-    draft_solution = state.get("draft_solution", "")
-    previous_tools = state.get("tool_history", [])
-
-    print("\n" + "=" * 60)
-    print("[PLANNER] Decision point")
-    print("=" * 60)
-
-    if re.search(r"\b\d+\b", analysis_summary) and "output of the os" in analysis_summary.lower():
-        print("[PLANNER] Detected numeric OS output → switch to final answer mode")
-        return {
-            **state,
-            "plan": {"action": "reasoning_final", "input": "Finalize the answer using expected format"}
-        }
-    elif re.search(r"Act:\s*answer\([^)]+\)", draft_solution):
-        print("[PLANNER] Detected final answer format → switch to reasoning_final")
-        return {
-            **state,
-            "plan": {"action": "reasoning_final", "input": "answer(...) detected"}
-        }
-    elif re.search(r"^Act:\s*bash\s*$\n+```bash", draft_solution, re.MULTILINE):
-        print("[PLANNER] Detected bash command → switch to reasoning_final")
-        return {
-            **state,
-            "plan": {"action": "reasoning_final", "input": "bash command detected"}
-        }
-
-    prompt = f"""
-You are the Orchestrator in a reasoning system.
-You have a reasoning draft {draft_solution}
-Does this draft help to solve the task {current_problem} or is the answer ?
-Decide:
-- If it fully answers the question, output reasoning_final
-- If it needs improvement, output reasoning_draft
-- If it needs command details, ouput linux_doc or search_in_doc
-DO NOT OUTPUT ANYTHING ELSE.
-"""
-
-    response = llm.invoke([SystemMessage(content=prompt)])
-    decision_raw = remove_multiline_think_blocks(response.content.strip())
-
-    print("[PLANNER RAW DECISION]")
-    print(decision_raw)
-    print("-" * 50)
-
-    if "linux_doc" in decision_raw:
-        action = "linux_doc"
-    elif "search_in_doc" in decision_raw:
-        action = "search_in_doc"
-    elif "reasoning_final" in decision_raw or "finalize" in decision_raw:
-        action = "reasoning_final"
-    else:
-        action = "reasoning_draft"
-
-    return {
-        **state,
-        "plan": {"action": action, "input": decision_raw}
-    }
-
-def reasoning_final_node(state: AgentState):
+    shortcut = _planner_shortcut(state)
+    if shortcut is not None:
+        return shortcut
+
+    try:
+        plan = model_with_plan_output.invoke(_planner_prompt(state))
+    except OutputParserException as e:
+        log.warning("planner_unparsable", error=str(e))
+        plan = None
+    return _planner_decision(state, plan)
+
+async def planner_node_async(state: AgentState) -> AgentState:
+    shortcut = _planner_shortcut(state)
+    if shortcut is not None:
+        return shortcut
+
+    try:
+        plan = await model_with_plan_output.ainvoke(_planner_prompt(state))
+    except OutputParserException as e:
+        log.warning("planner_unparsable", error=str(e))
+        plan = None
+    return _planner_decision(state, plan)
+
+def _final_messages(state: AgentState) -> list[BaseMessage]:
     current_problem = state.get("current_problem", "")
     output_os = state.get("output_of_os", "")
     reasoning = state.get("draft_solution", "")
 
-    print("\n" + "=" * 60)
-    print("[FINAL REASONING] Finalizing the task")
-    print(f"Current Problem: {current_problem}")
-    print(f"Previous Output: {output_os}")
-    print(f"Reasoning: {reasoning}")
-
-    structured = model_with_structured_output.invoke([
-        SystemMessage(content="""You are finalizing a reasoning task. You must respond using a strict JSON format. Your response must contain exactly the following fields:
-        - `thought`: your reasoning.
-        - `action`: must be EXACTLY one of the following values:
-        - "bash" if a bash command must be executed
-        - "finish" if the task is complete
-        - "answer(...)" with the answer in parentheses
-
-        - `code`: only required if action is "bash", in which case it should contain the bash command (single-line string).
-        Do not include any other text or explanation. Only return a JSON object matching this format."""),
-        HumanMessage(content=f"Task: {current_problem}\nPrevious Output: {output_os}\nReasoning: {reasoning}")
-    ])
-
-    formatted_msg = f"Think: {structured.thought}\nAct: {structured.action}\n{structured.code}"
-    print(f"FORMATED MESSAGE: {formatted_msg}")
-    print(colored(f"[FINAL REASONING]\n{structured}\n{'-'*50}", "magenta"))
-    print("FINAL STRUCTURED OUTPUT")
+    log.debug("final_reasoning_input", current_problem=current_problem, previous_output=output_os, reasoning=reasoning)
+
+    return get_prompt("reasoning_final").messages(current_problem=current_problem, output_os=output_os, reasoning=reasoning)
 
+def format_final_response(structured: FinalResponse) -> str:
     if structured.action.strip() == "bash":
         final_str = f"Think: {structured.thought}\nAct: bash\n\n```bash\n{structured.code.strip()}\n```"
     elif structured.action.startswith("answer("):
@@ -146,8 +135,11 @@ def reasoning_final_node(state: AgentState):
     else:
         final_str = f"Think: Error during final reasoning \nAct: finish"
         # raise ValueError(f"Invalid action returned: {structured.action}")
+    return final_str
 
-    print(final_str)
+def _final_result(state: AgentState, structured: FinalResponse) -> AgentState:
+    final_str = format_final_response(structured)
+    log.info("final_response", structured=structured, final=final_str)
 
     return {
         **state,
@@ -155,18 +147,99 @@ def reasoning_final_node(state: AgentState):
         "last_action": final_str,
     }
 
+def reasoning_final_node(state: AgentState):
+    shortcut = fast_path_router.run("reasoning_final", state)
+    if shortcut is not None:
+        return shortcut
+
+    structured = model_with_structured_output.invoke(_final_messages(state))
+    return _final_result(state, structured)
+
+async def reasoning_final_node_async(state: AgentState):
+    shortcut = fast_path_router.run("reasoning_final", state)
+    if shortcut is not None:
+        return shortcut
+
+    structured = await model_with_structured_output.ainvoke(_final_messages(state))
+    return _final_result(state, structured)
+
+def _fast_pipeline_messages(state: AgentState) -> tuple[str, list[BaseMessage]]:
+    user_message = state["messages"][-1].content if state.get("messages") else ""
+    if "problem is" in user_message.lower():
+        user_message = user_message.split("problem is", 1)[-1].strip()
+
+    log.debug("fast_pipeline_input", current_problem=state.get("current_problem", ""), last_action=state.get("last_action", ""))
+
+    return user_message, get_prompt("fast_pipeline").messages(
+        current_problem=state.get("current_problem", ""),
+        last_action=state.get("last_action", ""),
+        user_message=user_message,
+    )
+
+def _fast_pipeline_result(state: AgentState, user_message: str, structured: FastPipelineResponse) -> AgentState:
+    final_str = format_final_response(structured)
+    log.info("fast_pipeline_response", structured=structured, final=final_str)
+
+    return {
+        **state,
+        "analysis_summary": structured.summary,
+        "current_problem": state.get("current_problem") or structured.summary,
+        "draft_solution": structured.draft,
+        "final_response": final_str,
+        "last_action": final_str,
+        "messages": append_messages(state["messages"], [HumanMessage(content=user_message)]),
+    }
+
+def _fast_pipeline_shortcut(state: AgentState) -> AgentState | None:
+    """The reasoning_draft rules (e.g. numeric OS output) already produce a final-format answer."""
+    shortcut = fast_path_router.run("reasoning_draft", state)
+    if shortcut is None:
+        return None
+    return {**shortcut, "final_response": shortcut["draft_solution"], "last_action": shortcut["draft_solution"]}
+
+def fast_pipeline_node(state: AgentState) -> AgentState:
+    """
+    Fast mode: summary, draft and FinalResponse in one structured LLM call
+    instead of analyze -> reasoning_draft -> planner -> reasoning_final.
+    """
+    state = start_new_task_if_needed(state)
+    shortcut = _fast_pipeline_shortcut(state)
+    if shortcut is not None:
+        return shortcut
+
+    user_message, messages = _fast_pipeline_messages(state)
+    structured = model_with_fast_output.invoke(messages)
+    return _fast_pipeline_result(state, user_message, structured)
+
+async def fast_pipeline_node_async(state: AgentState) -> AgentState:
+    state = start_new_task_if_needed(state)
+    shortcut = _fast_pipeline_shortcut(state)
+    if shortcut is not None:
+        return shortcut
+
+    user_message, messages = _fast_pipeline_messages(state)
+    structured = await model_with_fast_output.ainvoke(messages)
+    return _fast_pipeline_result(state, user_message, structured)
+
 from langgraph.graph import StateGraph, END
 
 
 graph = StateGraph(AgentState)
 
 
-graph.add_node("analyze", analyse_problem_node)
-graph.add_node("reasoning_draft", reasoning_draft_node)
-graph.add_node("planner", planner_node)
-graph.add_node("linux_doc", linux_doc_node)
-graph.add_node("search_in_doc", search_in_doc_node)
-graph.add_node("reasoning_final", reasoning_final_node)
+# Each node gets a sync and an async implementation: invoke() (CLI) runs the first,
+# ainvoke()/astream() (API) run the second so LLM and HTTP calls never block the event loop.
+def graph_node(name: str, func, afunc) -> RunnableLambda:
+    """Graph node checking the turn deadline (deadline.py) and recording its duration and errors (metrics.py)."""
+    return RunnableLambda(*metrics.instrument_node(name, *guard_node(func, afunc)))
+
+graph.add_node("analyze", graph_node("analyze", analyse_problem_node, analyse_problem_node_async))
+graph.add_node("reasoning_draft", graph_node("reasoning_draft", reasoning_draft_node, reasoning_draft_node_async))
+graph.add_node("planner", graph_node("planner", planner_node, planner_node_async))
+graph.add_node("linux_doc", graph_node("linux_doc", linux_doc_node, linux_doc_node_async))
+graph.add_node("search_in_doc", graph_node("search_in_doc", search_in_doc_node, search_in_doc_node_async))
+graph.add_node("semantic_search", graph_node("semantic_search", semantic_search_node, semantic_search_node_async))
+graph.add_node("reasoning_final", graph_node("reasoning_final", reasoning_final_node, reasoning_final_node_async))
 
 graph.add_edge("analyze", "reasoning_draft")
 graph.add_edge("reasoning_draft", "planner")
@@ -174,36 +247,116 @@ graph.add_edge("reasoning_draft", "planner")
 graph.add_conditional_edges("planner", lambda state: state["plan"]["action"], {
     "linux_doc": "linux_doc",
     "search_in_doc": "search_in_doc",
+    "semantic_search": "semantic_search",
     "reasoning_draft": "reasoning_draft",
     "reasoning_final": "reasoning_final"
 })
 
 graph.add_edge("linux_doc", "planner")
 graph.add_edge("search_in_doc", "planner")
+graph.add_edge("semantic_search", "planner")
 graph.add_edge("reasoning_final", END)
 
 graph.set_entry_point("analyze")
 
 
-from routes import create_router
-from cli import run_cli
-checkpointer = MemorySaver()
+from routes import create_router, DEFAULT_MODE, session_cache
+from llm_cache import llm_cache
+from tools import tool_cache
+from cli import run_cli, session_cache as cli_session_cache
+from session_store import LatestCheckpointSaver
+# "fast" mode: one structured call per turn. The StateGraph above stays the "thorough" mode.
+fast_graph = StateGraph(AgentState)
+fast_graph.add_node("fast_pipeline", graph_node("fast_pipeline", fast_pipeline_node, fast_pipeline_node_async))
+fast_graph.add_edge("fast_pipeline", END)
+fast_graph.set_entry_point("fast_pipeline")
+
+# Only the latest checkpoint of a thread is kept: each turn starts again from the session store
+checkpointer = LatestCheckpointSaver()
 app_graph = graph.compile(checkpointer=checkpointer)
+fast_app_graph = fast_graph.compile(checkpointer=checkpointer)
+
+# Checkpoints live as long as their session: evicting a thread from the session store drops them too,
+# and their size counts towards the store's SESSION_MAX_BYTES.
+for store in (session_cache, cli_session_cache):
+    store.add_eviction_listener(checkpointer.delete_thread)
+    store.add_size_source(checkpointer.thread_bytes)
+
+# State owned by other modules is read when /metrics is scraped
+metrics.registry.counter_callback(
+    "agent_shortcut_hits_total", "Fast-path rule hits.",
+    lambda: [({"rule": rule}, hits) for rule, hits in sorted(fast_path_router.hits.items())],
+)
+metrics.registry.counter_callback(
+    "agent_llm_cache_events_total", "LLM response cache lookups and evictions.",
+    lambda: [({"event": event}, value) for event, value in llm_cache.stats().items() if event in ("hits", "misses", "evictions", "expirations", "bypassed")],
+)
+metrics.registry.counter_callback(
+    "agent_tool_cache_events_total", "Doc tool result cache lookups, coalesced lookups and evictions.",
+    lambda: [({"event": event}, value) for event, value in tool_cache.stats().items() if event in ("hits", "misses", "coalesced", "evictions", "expirations")],
+)
+_session_stores = {"api": session_cache, "cli": cli_session_cache}
+metrics.registry.gauge_callback(
+    "agent_sessions", "Sessions held by the session store.",
+    lambda: [({"store": name}, len(store)) for name, store in _session_stores.items()],
+)
+metrics.registry.gauge_callback(
+    "agent_sessions_bytes", "Serialized size of the sessions held by the session store, checkpoints included.",
+    lambda: [({"store": name}, store.total_bytes()) for name, store in _session_stores.items()],
+)
+metrics.registry.counter_callback(
+    "agent_session_evictions_total", "Sessions evicted from the session store.",
+    lambda: [({"store": name, "reason": reason}, count) for name, store in _session_stores.items() for reason, count in sorted(store.evictions.items())],
+)
+
+router = create_router(app_graph, fast_graph=fast_app_graph)
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Pre-load and keep the registry's models resident in Ollama (warmup.py) in the background."""
+    warmer = ModelWarmer.from_registry()
+    app.state.warmer = warmer
+    task = asyncio.create_task(warmer.run()) if WARMUP_ENABLED else None
+    try:
+        yield
+    finally:
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        await warmer.aclose()
+
+app = FastAPI(title="Linux Agent API", lifespan=lifespan)
+app.include_router(router)
 
-router = create_router(app_graph)
+@app.get("/ready")
+async def ready_endpoint(request: Request):
+    """200 once every configured model is loaded in Ollama, 503 before."""
+    warmer = getattr(request.app.state, "warmer", None)
+    if warmer is None:
+        warmer = ModelWarmer.from_registry()
+        try:
+            status = await warmer.status()
+        finally:
+            await warmer.aclose()
+    else:
+        status = await warmer.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
 
-app = FastAPI(title="Linux Agent API")
-app.include_router(router)
+@app.get("/metrics")
+async def metrics_endpoint():
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
 
 if __name__ == "__main__":
     import sys, argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("--cli", action="store_true")
     parser.add_argument("--thread", type=str, default=None, help="ID de session pour continuer une conversation")
+    parser.add_argument("--mode", choices=["thorough", "fast"], default=DEFAULT_MODE, help="thorough: full graph, fast: single LLM call per turn")
     args = parser.parse_args()
 
     if args.cli:
-        run_cli(app_graph, thread_id=args.thread)
+        run_cli(fast_app_graph if args.mode == "fast" else app_graph, thread_id=args.thread)
     else:
         import uvicorn
         uvicorn.run("main:app", host="127.0.0.1", port=11435, reload=True)
@@ -0,0 +1,152 @@
+# doc_embeddings.py
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import asdict
+
+import httpx
+import numpy as np
+
+from doc_index import Passage
+
+# A small sentence-embedding model served by the local Ollama, fast enough on CPU
+EMBED_MODEL = os.environ.get("EMBED_MODEL", "all-minilm")
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", 64))
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Unit rows, so a dot product is the cosine similarity."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def passage_text(passage: Passage) -> str:
+    # The command and section carry meaning the paragraph often leaves implicit ("-mtime n" alone says little)
+    return f"{passage.command} {passage.section}: {passage.text}"
+
+
+class OllamaEmbedder:
+    """Embeds texts with Ollama's /api/embed; query embeddings are kept in a small LRU."""
+
+    def __init__(self, model: str = EMBED_MODEL, base_url: str | None = None, timeout: float = 30.0,
+                 cache_size: int = 1024, transport=None):
+        host = base_url or os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+        self.model = model
+        self.cache_size = cache_size
+        self._client = httpx.Client(base_url=host if "://" in host else f"http://{host}", timeout=timeout, transport=transport)
+        self._queries: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        resp = self._client.post("/api/embed", json={"model": self.model, "input": texts})
+        resp.raise_for_status()
+        return normalize(resp.json()["embeddings"])
+
+    def embed_query(self, text: str) -> np.ndarray:
+        with self._lock:
+            vector = self._queries.get(text)
+            if vector is not None:
+                self._queries.move_to_end(text)
+                return vector
+        vector = self.embed([text])[0]
+        with self._lock:
+            self._queries[text] = vector
+            while len(self._queries) > self.cache_size:
+                self._queries.popitem(last=False)
+        return vector
+
+
+class EmbeddingIndex:
+    """
+    Passage embeddings computed offline, searched with one matrix-vector product:
+    - `<path>.f32`: float32 matrix (passages x dim), memory-mapped on load
+    - `<path>.json`: the model name, the dimension and the passages, row by row
+    """
+
+    def __init__(self, passages: list[Passage], matrix: np.ndarray, model: str):
+        if len(passages) != len(matrix):
+            raise ValueError(f"{len(passages)} passages for {len(matrix)} embeddings")
+        self.passages = passages
+        self.matrix = matrix
+        self.model = model
+        rows: dict[str, list[int]] = {}
+        for row, passage in enumerate(passages):
+            rows.setdefault(passage.command, []).append(row)
+        self._by_command = {command: np.array(ids) for command, ids in rows.items()}
+
+    def __len__(self) -> int:
+        return len(self.passages)
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1] if self.matrix.ndim == 2 else 0
+
+    @classmethod
+    def build(cls, passages: list[Passage], embedder, batch_size: int = EMBED_BATCH_SIZE) -> "EmbeddingIndex":
+        batches = [
+            embedder.embed([passage_text(p) for p in passages[start:start + batch_size]])
+            for start in range(0, len(passages), batch_size)
+        ]
+        matrix = np.concatenate(batches).astype(np.float32) if batches else np.zeros((0, 0), dtype=np.float32)
+        return cls(passages, matrix, embedder.model)
+
+    def search(self, query: np.ndarray, k: int = 5, command: str | None = None) -> list[dict]:
+        if command is not None:
+            rows = self._by_command.get(command)
+            if rows is None:
+                return []
+            scores = self.matrix[rows] @ query
+        else:
+            rows = None
+            scores = self.matrix @ query
+        if not len(scores):
+            return []
+
+        k = min(k, len(scores))
+        # argpartition finds the top k in linear time, only those k are sorted
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [
+            {**asdict(self.passages[rows[i] if rows is not None else i]), "score": round(float(scores[i]), 4)}
+            for i in best
+        ]
+
+    def save(self, path: str) -> None:
+        matrix = np.ascontiguousarray(self.matrix, dtype=np.float32)
+        matrix.tofile(f"{path}.f32")
+        with open(f"{path}.json", "w") as f:
+            json.dump({"model": self.model, "dim": self.dim, "passages": [asdict(p) for p in self.passages]}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "EmbeddingIndex | None":
+        if not os.path.exists(f"{path}.json") or not os.path.exists(f"{path}.f32"):
+            return None
+        with open(f"{path}.json") as f:
+            meta = json.load(f)
+        passages = [Passage(**p) for p in meta["passages"]]
+        if passages:
+            # Read-only mapping: the pages of the matrix are loaded by the OS as searches touch them
+            matrix = np.memmap(f"{path}.f32", dtype=np.float32, mode="r", shape=(len(passages), meta["dim"]))
+        else:
+            matrix = np.zeros((0, meta["dim"]), dtype=np.float32)
+        return cls(passages, matrix, meta["model"])
+
+
+if __name__ == "__main__":
+    # Embed the prebuilt keyword index (python mcp/doc_index.py ...) once: python mcp/doc_embeddings.py
+    import argparse
+    from mcp_linux_doc import DOC_INDEX_PATH, DOC_EMBEDDINGS_PATH
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--index", default=DOC_INDEX_PATH)
+    parser.add_argument("--output", default=DOC_EMBEDDINGS_PATH)
+    parser.add_argument("--model", default=EMBED_MODEL)
+    args = parser.parse_args()
+
+    with open(args.index) as f:
+        passages = [Passage(**p) for page in json.load(f).values() for p in page]
+    index = EmbeddingIndex.build(passages, OllamaEmbedder(args.model))
+    index.save(args.output)
+    print(f"Embedded {len(index)} passages ({index.dim} dimensions, {index.model}) into {args.output}.f32")
@@ -0,0 +1,171 @@
+# doc_index.py
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, asdict
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9_]*")
+HEADING_RE = re.compile(r"^[A-Z][A-Z0-9 ,/()&-]*$")
+MAX_PASSAGE_CHARS = 400
+
+
+@dataclass
+class Passage:
+    command: str
+    section: str
+    text: str
+
+
+def tokenize(text: str) -> list[str]:
+    # "-mtime" and "mtime" must match, so dashes are not part of tokens
+    return TOKEN_RE.findall(text.lower())
+
+
+def split_passages(command: str, doc_text: str) -> list[Passage]:
+    """Split a rendered man page into paragraphs, each tagged with its section heading."""
+    passages = []
+    section = ""
+    paragraph: list[str] = []
+
+    def flush():
+        text = " ".join(" ".join(paragraph).split())
+        if text:
+            passages.append(Passage(command, section, text[:MAX_PASSAGE_CHARS]))
+        paragraph.clear()
+
+    for line in doc_text.splitlines():
+        if line and not line[0].isspace() and HEADING_RE.match(line.strip()):
+            flush()
+            section = line.strip()
+        elif not line.strip():
+            flush()
+        else:
+            paragraph.append(line.strip())
+    flush()
+    return passages
+
+
+class DocIndex:
+    """
+    In-memory inverted index over man page passages, ranked with BM25.
+    Pages are added once when they are ingested; the passages can be saved
+    to disk and the postings are rebuilt on load.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._passages: dict[int, Passage] = {}
+        self._term_freqs: dict[int, Counter] = {}
+        self._postings: dict[str, dict[int, int]] = {}
+        self._lengths: dict[int, int] = {}
+        self._by_command: dict[str, list[int]] = {}
+        self._total_length = 0
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._passages)
+
+    def has_command(self, command: str) -> bool:
+        return command in self._by_command
+
+    def commands(self) -> list[str]:
+        return sorted(self._by_command)
+
+    def _remove_command(self, command: str) -> None:
+        for pid in self._by_command.pop(command, []):
+            term_freqs = self._term_freqs.pop(pid)
+            for term in term_freqs:
+                postings = self._postings[term]
+                del postings[pid]
+                if not postings:
+                    del self._postings[term]
+            self._total_length -= self._lengths.pop(pid)
+            del self._passages[pid]
+
+    def add_passages(self, command: str, passages: list[Passage]) -> None:
+        with self._lock:
+            self._remove_command(command)
+            ids = []
+            for passage in passages:
+                pid = self._next_id
+                self._next_id += 1
+                term_freqs = Counter(tokenize(f"{passage.section} {passage.text}"))
+                self._passages[pid] = passage
+                self._term_freqs[pid] = term_freqs
+                for term, tf in term_freqs.items():
+                    self._postings.setdefault(term, {})[pid] = tf
+                self._lengths[pid] = sum(term_freqs.values())
+                self._total_length += self._lengths[pid]
+                ids.append(pid)
+            self._by_command[command] = ids
+
+    def add_page(self, command: str, doc_text: str) -> None:
+        self.add_passages(command, split_passages(command, doc_text))
+
+    def search(self, query: str, k: int = 5, command: str | None = None) -> list[dict]:
+        terms = set(tokenize(query))
+        with self._lock:
+            n = len(self._passages)
+            if not n or not terms:
+                return []
+            allowed = set(self._by_command.get(command, [])) if command else None
+            avgdl = self._total_length / n
+            scores: dict[int, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for pid, tf in postings.items():
+                    if allowed is not None and pid not in allowed:
+                        continue
+                    norm = tf + self.k1 * (1 - self.b + self.b * self._lengths[pid] / avgdl)
+                    scores[pid] = scores.get(pid, 0.0) + idf * tf * (self.k1 + 1) / norm
+
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [{**asdict(self._passages[pid]), "score": round(score, 4)} for pid, score in best]
+
+    def save(self, path: str) -> None:
+        with self._lock:
+            data = {command: [asdict(self._passages[pid]) for pid in ids] for command, ids in self._by_command.items()}
+        with open(path, "w") as f:
+            json.dump(data, f)
+
+    @classmethod
+    def load(cls, path: str) -> "DocIndex":
+        index = cls()
+        if os.path.exists(path):
+            with open(path) as f:
+                for command, passages in json.load(f).items():
+                    index.add_passages(command, [Passage(**p) for p in passages])
+        return index
+
+
+if __name__ == "__main__":
+    # Prebuild the index: python mcp/doc_index.py ls find grep ...  (or --all for every page in `man -k .`)
+    import argparse
+    import subprocess
+    from mcp_linux_doc import load_page, doc_index, DOC_INDEX_PATH
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("commands", nargs="*")
+    parser.add_argument("--all", action="store_true", help="Index every command listed by man -k .")
+    parser.add_argument("--output", default=DOC_INDEX_PATH)
+    args = parser.parse_args()
+
+    commands = list(args.commands)
+    if args.all:
+        listing = subprocess.run(["man", "-k", "."], capture_output=True, text=True).stdout
+        commands += sorted({line.split()[0] for line in listing.splitlines() if "(1)" in line or "(8)" in line})
+
+    # load_page ingests every page it renders into the server's index
+    for command in commands:
+        load_page(command)
+    doc_index.save(args.output)
+    print(f"Indexed {len(doc_index)} passages from {len(doc_index.commands())} commands into {args.output}")
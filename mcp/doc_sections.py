@@ -0,0 +1,181 @@
+# doc_sections.py
+import hashlib
+import re
+import textwrap
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from doc_index import HEADING_RE
+
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+# "-l, --lines", "--color[=WHEN]", "-mtime n": every dash-prefixed word before the description
+FLAG_RE = re.compile(r"(?:(?<=^)|(?<=[\s,\[|]))(--?[A-Za-z0-9?][\w-]*)")
+OVERVIEW_SECTIONS = ("NAME", "SYNOPSIS", "DESCRIPTION")
+COMBINED_SHORT_RE = re.compile(r"^-[A-Za-z0-9]{2,}$")
+
+
+@dataclass
+class OptionEntry:
+    section: str
+    flags: list[str]
+    text: str
+
+
+@dataclass
+class ParsedPage:
+    """A rendered man page split once into its sections and per-option paragraphs."""
+    command: str
+    # sha256 of the rendered text: the server's ETags derive from it
+    digest: str = ""
+    sections: dict[str, str] = field(default_factory=dict)
+    options: list[OptionEntry] = field(default_factory=list)
+
+    def section(self, name: str) -> str | None:
+        return self.sections.get(name.strip().upper())
+
+    def find_options(self, flag: str, section: str | None = None) -> list[OptionEntry]:
+        """Options documenting `flag` ("-mtime", "--lines" or just "mtime"), in `section` first, then anywhere."""
+        wanted = flag.strip().split("=", 1)[0]
+        if wanted.startswith("-"):
+            matches = [o for o in self.options if wanted in o.flags]
+        else:
+            matches = [o for o in self.options if any(f.lstrip("-") == wanted for f in o.flags)]
+        if not matches and COMBINED_SHORT_RE.match(wanted):
+            # "-la", "-xzf": short options written together, unless the page documents the whole word (find -mtime)
+            for letter in wanted[1:]:
+                matches.extend(o for o in self.options if f"-{letter}" in o.flags and o not in matches)
+        if section:
+            in_section = [o for o in matches if o.section == section.strip().upper()]
+            return in_section or matches
+        return matches
+
+    def slices(self, section: str | None = None, flag: str | None = None, max_tokens: int | None = None) -> dict:
+        """
+        The parts of the page answering a query, within `max_tokens`:
+        - flag: the paragraphs of that option (falls back to the overview when it is not documented)
+        - section: that whole section
+        - neither: NAME, SYNOPSIS and DESCRIPTION
+        """
+        result: dict = {}
+        if flag:
+            options = self.find_options(flag, section)
+            result["flag_found"] = bool(options)
+            slices = [{"section": o.section, "flags": o.flags, "text": o.text} for o in options]
+        elif section:
+            text = self.section(section)
+            slices = [{"section": section.strip().upper(), "text": text}] if text is not None else []
+        else:
+            slices = []
+        if not slices and not (section and not flag):
+            slices = [{"section": name, "text": self.sections[name]} for name in OVERVIEW_SECTIONS if name in self.sections]
+
+        slices, truncated = fit_budget(slices, max_tokens)
+        return {**result, "slices": slices, "truncated": truncated}
+
+
+def count_tokens(text: str) -> int:
+    return len(TOKEN_RE.findall(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    matches = list(TOKEN_RE.finditer(text))
+    if len(matches) <= max_tokens:
+        return text
+    return text[:matches[max_tokens - 1].end()] if max_tokens > 0 else ""
+
+
+def fit_budget(slices: list[dict], max_tokens: int | None) -> tuple[list[dict], bool]:
+    """Keep slices in order until the budget is spent; the last one is cut at a token boundary."""
+    if max_tokens is None:
+        return slices, False
+    kept, left = [], max_tokens
+    for item in slices:
+        tokens = count_tokens(item["text"])
+        if tokens <= left:
+            kept.append(item)
+            left -= tokens
+            continue
+        if left > 0:
+            kept.append({**item, "text": truncate_tokens(item["text"], left) + " ..."})
+        return kept, True
+    return kept, False
+
+
+def _clean(lines: list[str]) -> str:
+    text = textwrap.dedent("\n".join(line.rstrip() for line in lines)).strip("\n")
+    return re.sub(r"\n{3,}", "\n\n", text)
+
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip())
+
+
+def _split_options(section: str, lines: list[str]) -> list[OptionEntry]:
+    """An option starts on a line beginning with "-" and runs over the lines indented deeper than it."""
+    options = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+        if not stripped.startswith("-") or stripped.startswith("--") and len(stripped) == 2:
+            i += 1
+            continue
+        header_indent = _indent(line)
+        # The description may start on the flag line, after a run of spaces
+        flags = FLAG_RE.findall(re.split(r"\s{2,}", stripped, maxsplit=1)[0])
+        body = [line]
+        j = i + 1
+        while j < len(lines) and (not lines[j].strip() or _indent(lines[j]) > header_indent):
+            body.append(lines[j])
+            j += 1
+        if flags:
+            options.append(OptionEntry(section, flags, _clean(body)))
+        i = j
+    return options
+
+
+def parse_page(command: str, doc_text: str) -> ParsedPage:
+    page = ParsedPage(command, hashlib.sha256(doc_text.encode()).hexdigest())
+    name, lines = None, []
+
+    def flush():
+        if name is not None:
+            page.sections[name] = _clean(lines)
+            page.options.extend(_split_options(name, lines))
+
+    for line in doc_text.splitlines():
+        if line and not line[0].isspace() and HEADING_RE.match(line.strip()):
+            flush()
+            name, lines = line.strip(), []
+        elif name is not None:
+            lines.append(line)
+    flush()
+    return page
+
+
+class ParsedPageStore:
+    """
+    Parsed pages keyed by (command, man section), bounded LRU.
+    A page is parsed when it is ingested and parsed again only if its rendered text changed.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._pages: OrderedDict[tuple[str, str], tuple[str, ParsedPage]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def parsed(self, command: str, man_section: str | None, doc_text: str) -> ParsedPage:
+        key = (command, man_section or "")
+        with self._lock:
+            entry = self._pages.get(key)
+            if entry is not None and (entry[0] is doc_text or entry[0] == doc_text):
+                self._pages.move_to_end(key)
+                return entry[1]
+        page = parse_page(command, doc_text)
+        with self._lock:
+            self._pages[key] = (doc_text, page)
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+        return page
@@ -0,0 +1,77 @@
+# http_cache.py
+import gzip
+import hashlib
+import json
+
+from fastapi import Request, Response
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional: gzip is always available
+    zstandard = None
+
+# Bodies smaller than this are sent as they are: compressing them saves less than it costs
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def etag_for(*parts: str) -> str:
+    """Strong validator: the same parts (page digest and query) always give the same bytes."""
+    return '"' + hashlib.sha256("\0".join(parts).encode()).hexdigest()[:32] + '"'
+
+
+def _opaque(tag: str) -> str:
+    # The encoding suffix added below names a representation of the same content
+    tag = tag.strip()
+    for suffix in ("-zstd\"", "-gzip\""):
+        if tag.endswith(suffix):
+            return tag[: -len(suffix)] + '"'
+    return tag
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or any(_opaque(tag) == etag for tag in header.split(","))
+
+
+def accepted_encodings(request: Request) -> set[str]:
+    accepted = set()
+    for item in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = item.strip().partition(";")
+        if name and params.replace(" ", "") not in ("q=0", "q=0.0"):
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def encode(body: bytes, accepted: set[str]) -> tuple[bytes, str | None]:
+    if len(body) < MIN_COMPRESS_BYTES:
+        return body, None
+    if zstandard is not None and "zstd" in accepted:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body), "zstd"
+    if "gzip" in accepted:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0), "gzip"
+    return body, None
+
+
+def json_response(request: Request, payload: dict, etag: str | None = None) -> Response:
+    """
+    JSON answer honoring the client's caches and encodings:
+    - If-None-Match matching `etag` -> 304 with no body
+    - Accept-Encoding zstd or gzip -> compressed body, the ETag suffixed with the encoding
+    """
+    headers = {"Vary": "Accept-Encoding"}
+    if etag is not None:
+        headers["ETag"] = etag
+        if not_modified(request, etag):
+            return Response(status_code=304, headers=headers)
+
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+    body, encoding = encode(body, accepted_encodings(request))
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+        if etag is not None:
+            headers["ETag"] = etag[:-1] + f"-{encoding}\""
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,129 @@
+# man_cache.py
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+
+@dataclass
+class CachedPage:
+    source_path: str
+    mtime: float
+    doc: str
+
+    @property
+    def size(self) -> int:
+        return len(self.doc.encode())
+
+
+def source_mtime(source_path: str) -> float | None:
+    try:
+        return os.stat(source_path).st_mtime
+    except OSError:
+        return None
+
+
+class ManPageCache:
+    """
+    Two-level cache of rendered man pages keyed by (command, man section):
+    - an in-memory LRU bounded by the total size of the rendered pages
+    - an on-disk SQLite store that survives restarts
+    An entry is only served while the mtime of its source page is unchanged.
+    """
+
+    def __init__(self, db_path: str, max_bytes: int = 32 * 1024 * 1024):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._memory: OrderedDict[tuple[str, str], CachedPage] = OrderedDict()
+        self._memory_bytes = 0
+        self._db: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "command TEXT NOT NULL, section TEXT NOT NULL, source_path TEXT NOT NULL, "
+                "mtime REAL NOT NULL, doc TEXT NOT NULL, PRIMARY KEY (command, section))"
+            )
+        return self._db
+
+    def _remember(self, key: tuple[str, str], page: CachedPage) -> None:
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= previous.size
+        if page.size > self.max_bytes:
+            return
+        self._memory[key] = page
+        self._memory_bytes += page.size
+        while self._memory_bytes > self.max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.size
+            self.stats["evictions"] += 1
+
+    def _forget(self, key: tuple[str, str]) -> None:
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= previous.size
+        self._connect().execute("DELETE FROM pages WHERE command = ? AND section = ?", key)
+        self._connect().commit()
+        self.stats["invalidations"] += 1
+
+    def get(self, command: str, section: str | None = None) -> CachedPage | None:
+        key = (command, section or "")
+        with self._lock:
+            page = self._memory.get(key)
+            if page is not None:
+                if source_mtime(page.source_path) == page.mtime:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return page
+                self._forget(key)
+                self.stats["misses"] += 1
+                return None
+
+            row = self._connect().execute(
+                "SELECT source_path, mtime, doc FROM pages WHERE command = ? AND section = ?", key
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+
+            page = CachedPage(*row)
+            if source_mtime(page.source_path) != page.mtime:
+                self._forget(key)
+                self.stats["misses"] += 1
+                return None
+
+            self._remember(key, page)
+            self.stats["disk_hits"] += 1
+            return page
+
+    def put(self, command: str, section: str | None, source_path: str, doc: str) -> CachedPage | None:
+        """Store a freshly rendered page. Pages whose source cannot be stat'ed are not cached."""
+        mtime = source_mtime(source_path)
+        if mtime is None:
+            return None
+        key = (command, section or "")
+        page = CachedPage(source_path, mtime, doc)
+        with self._lock:
+            self._remember(key, page)
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO pages (command, section, source_path, mtime, doc) VALUES (?, ?, ?, ?, ?)",
+                (*key, source_path, mtime, doc),
+            )
+            db.commit()
+        return page
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            db = self._connect()
+            db.execute("DELETE FROM pages")
+            db.commit()
@@ -1,34 +1,254 @@
 # mcp_linux_doc.py
+import asyncio
+import os
 import subprocess
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.responses import JSONResponse
 
+from man_cache import ManPageCache
+from doc_index import DocIndex
+from doc_sections import ParsedPageStore
+from doc_embeddings import EmbeddingIndex, OllamaEmbedder
+from render_pool import RenderPool, RenderQueueFull
+from http_cache import etag_for, json_response
+
 app = FastAPI(title="Linux Doc MCP", description="MCP server for Linux command documentation")
 
+page_cache = ManPageCache(
+    db_path=os.environ.get("MAN_CACHE_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "man_cache.sqlite3")),
+    max_bytes=int(os.environ.get("MAN_CACHE_MAX_BYTES", 32 * 1024 * 1024)),
+)
+
+# Prebuilt with `python mcp/doc_index.py <commands...>`; pages rendered later are added on ingestion.
+DOC_INDEX_PATH = os.environ.get("DOC_INDEX_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "doc_index.json"))
+doc_index = DocIndex.load(DOC_INDEX_PATH)
+
+# Passage embeddings for /semantic_search, built offline with `python mcp/doc_embeddings.py`
+DOC_EMBEDDINGS_PATH = os.environ.get("DOC_EMBEDDINGS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "doc_embeddings"))
+embedding_index = EmbeddingIndex.load(DOC_EMBEDDINGS_PATH)
+embedder = OllamaEmbedder(embedding_index.model) if embedding_index is not None else None
+
+# Sections and option paragraphs of the ingested pages, for the sliced /get_doc queries
+parsed_pages = ParsedPageStore(max_entries=int(os.environ.get("PARSED_PAGES_MAX", 512)))
+
+# Cache misses render in these threads: the event loop keeps serving cache hits meanwhile.
+# Beyond RENDER_QUEUE_MAX pending renders the server answers 503 instead of queueing more.
+render_pool = RenderPool(
+    max_workers=int(os.environ.get("RENDER_WORKERS", 4)),
+    max_pending=int(os.environ.get("RENDER_QUEUE_MAX", 32)),
+)
+
+# "1", "3p", "n"...: anything else could be read by man as an option
+MAN_SECTION_PATTERN = r"^[1-9n][a-z0-9]*$"
+
+def man_args(base_command: str, man_section: str | None) -> list[str]:
+    # "--": a command such as "--html=..." is a page name, never an option of man
+    return ["--", man_section, base_command] if man_section else ["--", base_command]
+
+def locate_page(base_command: str, man_section: str | None = None) -> str | None:
+    """Path of the source page (man -w), used to invalidate the cache when it changes."""
+    result = subprocess.run(["man", "-w", *man_args(base_command, man_section)], capture_output=True, text=True, timeout=5)
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip().splitlines()[0]
+
+def render_page(base_command: str, man_section: str | None = None) -> str | None:
+    result = subprocess.run(["man", *man_args(base_command, man_section)], capture_output=True, text=True, timeout=5)
+    if result.returncode != 0:
+        return None
+    return result.stdout
+
+def ingest_page(base_command: str, man_section: str | None, doc_text: str) -> None:
+    parsed_pages.parsed(base_command, man_section, doc_text)
+    # The search index only holds the default page of each command
+    if man_section is None and not doc_index.has_command(base_command):
+        doc_index.add_page(base_command, doc_text)
+
+def cached_page(base_command: str, man_section: str | None = None) -> str | None:
+    page = page_cache.get(base_command, man_section)
+    if page is None:
+        return None
+    ingest_page(base_command, man_section, page.doc)
+    return page.doc
+
+def render_and_store(base_command: str, man_section: str | None = None) -> str | None:
+    """Cache miss: locate and render the page, then store, parse and index it."""
+    source_path = locate_page(base_command, man_section)
+    if source_path is None:
+        return None
+    doc_text = render_page(base_command, man_section)
+    if doc_text is None:
+        return None
+    page_cache.put(base_command, man_section, source_path, doc_text)
+    parsed_pages.parsed(base_command, man_section, doc_text)
+    if man_section is None:
+        doc_index.add_page(base_command, doc_text)
+    return doc_text
+
+def load_page(base_command: str, man_section: str | None = None) -> str | None:
+    """Blocking lookup, for scripts (doc_index.py) rather than the request handlers."""
+    doc_text = cached_page(base_command, man_section)
+    if doc_text is not None:
+        return doc_text
+    return render_and_store(base_command, man_section)
+
+async def aload_page(base_command: str, man_section: str | None = None) -> str | None:
+    doc_text = cached_page(base_command, man_section)
+    if doc_text is not None:
+        return doc_text
+    try:
+        # Concurrent misses for the same page wait for the same render
+        future = render_pool.submit((base_command, man_section or ""), render_and_store, base_command, man_section)
+    except RenderQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Render queue full ({e})", headers={"Retry-After": "1"})
+    # shield: wrap_future passes a cancelled caller on to the shared render, failing everyone waiting for it
+    return await asyncio.shield(asyncio.wrap_future(future))
+
+async def doc_payload(base_command: str, man_section: str | None = None, section: str | None = None,
+                      flag: str | None = None, max_tokens: int | None = None) -> tuple[dict, str | None]:
+    """
+    The /get_doc answer for one command: the full page, or its slices when a section, flag or budget is given.
+    Also returns the digest of the rendered page, None when there is no page to validate against.
+    """
+    try:
+        # ✅ Récupérer la doc via le cache, ou via man en cas de miss
+        doc_text = await aload_page(base_command, man_section)
+        if doc_text is None:
+            return {"error": f"No documentation found for \'{base_command}\'", "not_found": True}, None
+
+        summary = []
+        for heading in ["NAME", "SYNOPSIS", "DESCRIPTION"]:
+            if heading in doc_text:
+                summary.append(heading)
+
+        # Parsed once at ingestion: the lookup is a dict hit that also gives the page digest
+        page = parsed_pages.parsed(base_command, man_section, doc_text)
+        if section is None and flag is None and max_tokens is None:
+            return {
+                "command": base_command,
+                "summary": summary,
+                "full_doc": doc_text
+            }, page.digest
+
+        # Sliced query: only the relevant parts
+        return {
+            "command": base_command,
+            "summary": summary,
+            "sections": list(page.sections),
+            **page.slices(section=section, flag=flag, max_tokens=max_tokens),
+        }, page.digest
+    except HTTPException:
+        raise
+    except Exception as e:
+        return {"error": str(e)}, None
+
+def _query_parts(section: str | None, flag: str | None, max_tokens: int | None) -> tuple[str, str, str]:
+    return section or "", flag or "", "" if max_tokens is None else str(max_tokens)
+
 @app.get("/get_doc")
-async def get_doc(command: str = Query(..., description="Linux command")):
+async def get_doc(
+    request: Request,
+    command: str = Query(..., description="Linux command"),
+    man_section: str | None = Query(None, pattern=MAN_SECTION_PATTERN, description="Manual section (1-8)"),
+    section: str | None = Query(None, description="Only this section of the page, e.g. OPTIONS"),
+    flag: str | None = Query(None, description="Only the paragraphs of this option, e.g. -mtime"),
+    max_tokens: int | None = Query(None, ge=1, description="Token budget of the returned slices"),
+):
     # ✅ Extraire la commande principale (avant les espaces)
     base_command = command.strip().split()[0]
+    payload, digest = await doc_payload(base_command, man_section, section, flag, max_tokens)
+    # Same page and same query give the same body: a client holding it gets a 304 instead
+    etag = etag_for(base_command, man_section or "", digest, *_query_parts(section, flag, max_tokens)) if digest else None
+    return json_response(request, payload, etag)
+
+MAX_BATCH_COMMANDS = 16
+
+@app.get("/get_docs")
+async def get_docs(
+    request: Request,
+    commands: list[str] = Query(..., max_length=MAX_BATCH_COMMANDS, description="Linux commands, repeated: ?commands=find&commands=grep"),
+    flags: list[str] | None = Query(None, max_length=MAX_BATCH_COMMANDS, description="One option per command, aligned with `commands` (empty for none)"),
+    section: str | None = Query(None, description="Only this section of every page, e.g. OPTIONS"),
+    max_tokens: int | None = Query(None, ge=1, description="Token budget of each command's slices"),
+):
+    """/get_doc for several commands at once; the pages missing from the cache render in parallel."""
+    flags = flags or []
+    queries = {}
+    for i, command in enumerate(commands):
+        if not command.strip():
+            continue
+        base_command = command.strip().split()[0]
+        flag = flags[i].strip() if i < len(flags) and flags[i].strip() else None
+        queries.setdefault(base_command, flag)
+
+    async def one(base_command: str, flag: str | None) -> tuple[dict, str | None]:
+        try:
+            return await doc_payload(base_command, section=section, flag=flag, max_tokens=max_tokens)
+        except HTTPException as e:
+            # One page turned away by a full render queue must not fail the whole batch
+            return {"detail": e.detail}, None
+
+    results = await asyncio.gather(*(one(base_command, flag) for base_command, flag in queries.items()))
+    payload = {"docs": {base_command: doc for base_command, (doc, _) in zip(queries, results)}}
+    # The batch is only validated when every command has a page: an error may clear up on the next call
+    digests = [digest for _, digest in results]
+    etag = None
+    if digests and all(digests):
+        parts = [f"{base_command}\0{flag or ''}\0{digest}" for (base_command, flag), digest in zip(queries.items(), digests)]
+        etag = etag_for(*parts, *_query_parts(section, None, max_tokens))
+    return json_response(request, payload, etag)
+
+@app.get("/search")
+async def search(
+    q: str = Query(..., description="Keywords to look for"),
+    command: str | None = Query(None, description="Restrict the search to one command; omit to search every indexed page"),
+    k: int = Query(5, ge=1, le=50, description="Number of passages to return"),
+):
+    base_command = command.strip().split()[0] if command and command.strip() else None
 
     try:
-        # ✅ Récupérer la doc via man
-        result = subprocess.run(["man", base_command], capture_output=True, text=True, timeout=5)
-        if result.returncode != 0:
-            return {"error": f"No documentation found for '{base_command}'"}
+        if base_command and not doc_index.has_command(base_command):
+            if await aload_page(base_command) is None:
+                return {"error": f"No documentation found for \'{base_command}\'", "not_found": True}
 
-        doc_text = result.stdout
-        summary = []
-        for section in ["NAME", "SYNOPSIS", "DESCRIPTION"]:
-            if section in doc_text:
-                summary.append(section)
+        return {
+            "query": q,
+            "command": base_command,
+            "results": doc_index.search(q, k=k, command=base_command)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        return {"error": str(e)}
 
+@app.get("/semantic_search")
+def semantic_search(
+    q: str = Query(..., description="Question in plain words, e.g. list files modified in the last day"),
+    command: str | None = Query(None, description="Restrict the search to one command; omit to search every embedded page"),
+    k: int = Query(5, ge=1, le=50, description="Number of passages to return"),
+):
+    # Plain def: FastAPI runs it in its threadpool while the query is embedded
+    if embedding_index is None or embedder is None:
+        return {"error": f"No semantic index at '{DOC_EMBEDDINGS_PATH}'"}
+    base_command = command.strip().split()[0] if command and command.strip() else None
+
+    try:
         return {
+            "query": q,
             "command": base_command,
-            "summary": summary,
-            "full_doc": doc_text
+            "results": embedding_index.search(embedder.embed_query(q), k=k, command=base_command)
         }
     except Exception as e:
         return {"error": str(e)}
+
+@app.get("/cache_stats")
+async def cache_stats():
+    return {
+        **page_cache.stats,
+        **{f"render_{name}": value for name, value in render_pool.stats.items()},
+        "render_pending": render_pool.pending(),
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=9000)
@@ -0,0 +1,51 @@
+# render_pool.py
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Hashable
+
+
+class RenderQueueFull(Exception):
+    """More renders are pending than the pool accepts; the caller should retry later."""
+
+
+class RenderPool:
+    """
+    Runs blocking page renders (man subprocesses) off the event loop:
+    - a fixed number of worker threads, and at most `max_pending` renders queued or running
+    - single flight: a render already pending for a key is shared by every caller asking for it
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 32):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="render")
+        self._inflight: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {"renders": 0, "coalesced": 0, "rejected": 0}
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._inflight)
+
+    def submit(self, key: Hashable, fn: Callable, *args) -> Future:
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                return future
+            if len(self._inflight) >= self.max_pending:
+                self.stats["rejected"] += 1
+                raise RenderQueueFull(f"{len(self._inflight)} renders pending")
+            future = self._executor.submit(fn, *args)
+            self._inflight[key] = future
+            self.stats["renders"] += 1
+        future.add_done_callback(lambda _: self._done(key, future))
+        return future
+
+    def _done(self, key: Hashable, future: Future) -> None:
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,247 @@
+import functools
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, Sequence
+from langchain_core.callbacks import BaseCallbackHandler
+from llm_cache import CACHED_KEY
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Metric(ABC):
+    """Base of the Prometheus metric types: a name, a help text and values keyed by label values."""
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> Iterable[tuple[str, Dict[str, str], float]]:
+        ...
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.type}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines)
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label values -> (per-bucket counts, sum, count)
+        self._values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, (list(e[0]), e[1], e[2])) for key, e in self._values.items())
+        for key, (counts, total, count) in values:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+class CallbackMetric(Metric):
+    """Gauge or counter read at scrape time, for state owned elsewhere (session stores, fast-path hits...)."""
+
+    def __init__(self, name: str, documentation: str, type: str, collect: Callable[[], Iterable[tuple[Dict[str, str], float]]]):
+        super().__init__(name, documentation)
+        self.type = type
+        self._collect = collect
+
+    def samples(self):
+        for labels, value in self._collect():
+            yield self.name, labels, value
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric '{metric.name}' is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def unregister(self, name: str) -> None:
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DURATION_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge_callback(self, name: str, documentation: str, collect) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, "gauge", collect))
+
+    def counter_callback(self, name: str, documentation: str, collect) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, "counter", collect))
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+registry = Registry()
+
+node_duration = registry.histogram("agent_node_duration_seconds", "Wall time of one graph node run.", ["node"])
+node_errors = registry.counter("agent_node_errors_total", "Graph node runs that raised.", ["node"])
+llm_calls = registry.counter("agent_llm_calls_total", "LLM calls, by calling graph node.", ["node"])
+llm_cached = registry.counter("agent_llm_cached_responses_total", "LLM calls answered by the response cache, by calling graph node.", ["node"])
+llm_errors = registry.counter("agent_llm_errors_total", "LLM calls that raised, by calling graph node.", ["node"])
+llm_duration = registry.histogram("agent_llm_duration_seconds", "Wall time of one LLM call.", ["node"])
+llm_tokens = registry.histogram("agent_llm_tokens", "Tokens of one LLM call.", ["node", "kind"], buckets=TOKEN_BUCKETS)
+planner_decisions = registry.counter("agent_planner_decisions_total", "Planner decisions, from the LLM or a fast-path shortcut.", ["action", "source"])
+
+def instrument_node(name: str, func: Callable, afunc: Callable | None = None) -> tuple[Callable, Callable | None]:
+    """Wrap a node's sync and async implementations to record their duration and errors."""
+
+    @functools.wraps(func)
+    def wrapper(state):
+        start = time.perf_counter()
+        try:
+            return func(state)
+        except Exception:
+            node_errors.inc(node=name)
+            raise
+        finally:
+            node_duration.observe(time.perf_counter() - start, node=name)
+
+    if afunc is None:
+        return wrapper, None
+
+    @functools.wraps(afunc)
+    async def async_wrapper(state):
+        start = time.perf_counter()
+        try:
+            return await afunc(state)
+        except Exception:
+            node_errors.inc(node=name)
+            raise
+        finally:
+            node_duration.observe(time.perf_counter() - start, node=name)
+
+    return wrapper, async_wrapper
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """
+    Attached to the chat models: counts calls, errors, duration and tokens per graph node.
+    The node comes from the langgraph metadata of the run ("none" outside the graph).
+    Answers of the LLM response cache are only counted as cached: they would skew latency and tokens.
+    """
+    run_inline = True
+
+    def __init__(self):
+        self._runs: Dict = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node", "none")
+        with self._lock:
+            self._runs[run_id] = (node, time.perf_counter())
+
+    def _finish(self, run_id, cached: bool = False) -> str | None:
+        with self._lock:
+            started = self._runs.pop(run_id, None)
+        if started is None:
+            return None
+        node, start = started
+        if cached:
+            llm_cached.inc(node=node)
+            return None
+        llm_calls.inc(node=node)
+        llm_duration.observe(time.perf_counter() - start, node=node)
+        return node
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        cached = any(
+            (generation.generation_info or {}).get(CACHED_KEY)
+            for generations in response.generations for generation in generations
+        )
+        node = self._finish(run_id, cached)
+        if node is None:
+            return
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    llm_tokens.observe(usage.get("input_tokens", 0), node=node, kind="prompt")
+                    llm_tokens.observe(usage.get("output_tokens", 0), node=node, kind="completion")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        node = self._finish(run_id)
+        if node is not None:
+            llm_errors.inc(node=node)
+
+llm_metrics = LLMMetricsHandler()
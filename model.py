@@ -1,17 +1,82 @@
-from langchain.chat_models import init_chat_model
-
-model_llm = init_chat_model(
-    # model="qwen3:1.7b",
-    # model="qwen2.5-coder:1.5b",
-    # model="qwen3:"
-    model="qwen2.5-coder:7b",
-    # model="qwen3:0.6b",
-    # model="qwen3:1.7b",
-    # model="qwen3:4b",
-    # model="qwen3:8b",
-    # model="qwen3:14b",
-    # model="qwen3:32b",
-    # model="qwen3:30b-a3b"
-    model_provider="ollama",
-    temperature=0.1,
-    max_tokens=256)
+import json
+import os
+from typing import Dict, List
+from langchain_ollama import ChatOllama
+from pydantic import BaseModel
+from llm_cache import llm_cache
+from metrics import llm_metrics
+
+# LLM_CACHE=0 disables the response cache (see llm_cache.py for size/TTL/persistence settings)
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE", "1") != "0"
+
+# Tiers: short classification/interpretation calls go to the small model, drafting and final answers to the large one.
+# Other candidates: qwen3:0.6b, qwen3:1.7b, qwen3:4b, qwen3:8b, qwen3:14b, qwen3:32b, qwen3:30b-a3b
+LARGE_MODEL = os.environ.get("LARGE_MODEL", "qwen2.5-coder:7b")
+SMALL_MODEL = os.environ.get("SMALL_MODEL", "qwen2.5-coder:1.5b")
+# How long Ollama keeps a model loaded after a call (duration string or seconds, -1 = forever)
+KEEP_ALIVE = os.environ.get("MODEL_KEEP_ALIVE", "30m")
+
+class ModelSpec(BaseModel):
+    """Model and generation parameters of one node (or group of nodes)."""
+    model: str
+    max_tokens: int = 256
+    temperature: float = 0.1
+    stop: List[str] | None = None
+    keep_alive: str | int | None = KEEP_ALIVE
+
+class OllamaChatModel(ChatOllama):
+    """ChatOllama whose LLM cache key covers the model and its generation parameters (upstream only keys on the class)."""
+
+    @property
+    def _identifying_params(self) -> Dict:
+        # Everything sent to Ollama that shapes the answer: the model, its options (temperature, num_predict,
+        # stop, num_ctx, seed, top_p...), the output format and thinking; not the transport settings (keep_alive)
+        params = self._chat_params([])
+        return {"model": params["model"], "format": params["format"], "think": params["think"], **params["options"]}
+
+MODEL_SPECS: Dict[str, ModelSpec] = {
+    "default": ModelSpec(model=LARGE_MODEL),
+    "analyze": ModelSpec(model=LARGE_MODEL),
+    "analyze_previous_summary": ModelSpec(model=SMALL_MODEL, max_tokens=64),
+    "reasoning_draft": ModelSpec(model=LARGE_MODEL),
+    # The planner answers with a short PlanOutput JSON object (action, command, keyword); the command may be a pipeline
+    "planner": ModelSpec(model=SMALL_MODEL, max_tokens=96),
+    "reasoning_final": ModelSpec(model=LARGE_MODEL),
+    "fast_pipeline": ModelSpec(model=LARGE_MODEL, max_tokens=512),
+}
+
+def load_model_specs(path: str) -> None:
+    """
+    Override MODEL_SPECS from a JSON file: {"planner": {"model": "qwen3:0.6b", "max_tokens": 16}, ...}.
+    Missing fields keep their current value; unknown roles start from "default".
+    """
+    with open(path) as f:
+        overrides = json.load(f)
+    for role, fields in overrides.items():
+        base = MODEL_SPECS.get(role, MODEL_SPECS["default"])
+        MODEL_SPECS[role] = base.model_copy(update=fields)
+
+if os.environ.get("MODEL_CONFIG"):
+    load_model_specs(os.environ["MODEL_CONFIG"])
+
+# One instance per distinct spec: roles sharing a spec share the client
+_models: Dict[str, OllamaChatModel] = {}
+
+def model_spec(role: str) -> ModelSpec:
+    return MODEL_SPECS.get(role, MODEL_SPECS["default"])
+
+def get_model(role: str) -> OllamaChatModel:
+    spec = model_spec(role)
+    key = spec.model_dump_json()
+    if key not in _models:
+        _models[key] = OllamaChatModel(
+            model=spec.model,
+            temperature=spec.temperature,
+            num_predict=spec.max_tokens,
+            stop=spec.stop,
+            keep_alive=spec.keep_alive,
+            cache=llm_cache if LLM_CACHE_ENABLED else False,
+            callbacks=[llm_metrics])
+    return _models[key]
+
+model_llm = get_model("default")
@@ -1,4 +1,10 @@
+import functools
+import os
 import re
+import tomllib
+from dataclasses import dataclass
+from typing import Dict, List
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 
 system_prompt = (
     "You are an autonomous agent operating in a simulated Ubuntu terminal environment. "
@@ -19,3 +25,30 @@ def remove_multiline_think_blocks(text: str) -> str:
     # print("############")
     cleaned = re.sub(r"<think>.*?</think>\s*", "", text, flags=re.DOTALL | re.IGNORECASE)
     return cleaned.strip()
+
+# Node prompt templates (prompts/<PROMPT_VERSION>.toml), parsed once per process.
+PROMPT_VERSION = os.environ.get("PROMPT_VERSION", "v2")
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+
+@dataclass(frozen=True)
+class NodePrompt:
+    """Static system prefix plus a per-call user template, so successive calls share their prefix."""
+    name: str
+    version: str
+    system: str
+    user: str
+
+    def messages(self, **values) -> List[BaseMessage]:
+        return [SystemMessage(content=self.system), HumanMessage(content=self.user.format(**values))]
+
+@functools.lru_cache(maxsize=None)
+def load_prompts(version: str = PROMPT_VERSION) -> Dict[str, NodePrompt]:
+    with open(os.path.join(PROMPTS_DIR, f"{version}.toml"), "rb") as f:
+        templates = tomllib.load(f)
+    return {
+        name: NodePrompt(name, version, template["system"].strip(), template["user"].strip())
+        for name, template in templates.items()
+    }
+
+def get_prompt(name: str, version: str | None = None) -> NodePrompt:
+    return load_prompts(version or PROMPT_VERSION)[name]
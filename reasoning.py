@@ -1,9 +1,9 @@
-from model import model_llm
-from langchain_core.messages import HumanMessage, SystemMessage, BaseMessage
-from termcolor import colored
+from model import get_model
+from fast_path import fast_path_router
+from langchain_core.messages import HumanMessage, BaseMessage
 from typing import TypedDict, List
-import re
-from prompt_and_format import remove_multiline_think_blocks
+from prompt_and_format import get_prompt, remove_multiline_think_blocks
+from logs import get_logger
 
 class AgentState(TypedDict):
     messages: List[BaseMessage]
@@ -15,97 +15,107 @@ class AgentState(TypedDict):
     tool_context: str
     cycles: int
 
-llm = model_llm
+llm = get_model("reasoning_draft")
+log = get_logger("reasoning")
 
-def reasoning_draft_first_interaction(state: AgentState) -> AgentState:
-    """
-    First reasoning step for the initial user interaction.
-    """
+def _first_interaction_prompt(state: AgentState) -> List[BaseMessage]:
     current_problem = state.get("current_problem", "")
 
-    print(colored("[DEBUG] First interaction reasoning...", "yellow"))
-    print(colored(f"Current Problem: {current_problem}", "yellow"))
-    prompt = f"""
-    You are an assistant that will act like a person. You MUST follow a strict multi-step process to complete the task.
-
-    RULES:
-    - You MUST choose EXACTLY ONE of the following action formats at the end of your response:
+    log.debug("draft_first_interaction", current_problem=current_problem)
+    return get_prompt("reasoning_draft_first_interaction").messages(current_problem=current_problem)
 
-    1. To execute a bash command:
-    Think: <your reasoning>
-    Act: bash
-
-    ```bash
-    # put your bash code here if needed\n```
-    NEVER output explanations or multiple actions.
-
-    Current Problem: {current_problem}
-    """
-    response = model_llm.invoke([SystemMessage(content=prompt)])
+def _draft_result(state: AgentState, response) -> AgentState:
     draft_solution = remove_multiline_think_blocks(response.content.strip())
+    # draft_solution = response.content.strip()
 
-    print(colored(f"[DRAFT REASONING]\n{draft_solution}\n{'-'*50}", "red"))
-
+    log.info("draft_solution", draft=draft_solution)
     return {
         **state,
         "draft_solution": draft_solution,
     }
 
-def reasoning_draft_multiple_steps(state: AgentState) -> AgentState:
+def reasoning_draft_first_interaction(state: AgentState) -> AgentState:
+    """
+    First reasoning step for the initial user interaction.
+    """
+    shortcut = fast_path_router.run("reasoning_draft", state)
+    if shortcut is not None:
+        return shortcut
+
+    response = llm.invoke(_first_interaction_prompt(state))
+    return _draft_result(state, response)
+
+async def reasoning_draft_first_interaction_async(state: AgentState) -> AgentState:
+    shortcut = fast_path_router.run("reasoning_draft", state)
+    if shortcut is not None:
+        return shortcut
+
+    response = await llm.ainvoke(_first_interaction_prompt(state))
+    return _draft_result(state, response)
+
+def _multiple_steps_prompt(state: AgentState) -> List[BaseMessage]:
     current_problem = state.get("current_problem", "")
     analysis_summary = state.get("analysis_summary", "No summary available.")
     last_action = state.get("last_action", None)
 
-    print(colored("[DEBUG] Generating draft reasoning for multiple steps...", "yellow"))
-    print(colored(f"Last Action: {last_action}", "yellow"))
-    print(colored(f"Current Problem: {current_problem}", "yellow"))
-    print(colored(f"Analysis Summary: {analysis_summary}", "yellow"))
-    messages = state.get("messages", [])
-
-    print("Les clés du state:", state.keys())
-
-    print(colored("[DEBUG] Messages in state:", "cyan"))
-    print(messages)
-
-    match = re.search(r"The output of the OS:\s*(\d+)", messages[-1].content)
-    if match and last_action and "```bash" in last_action:
-        value = match.group(1)
-        draft_solution = f"Think: The last command returned a numeric value, which likely answers the question directly.\n\nAct: answer({value})"
-        print(colored(f"[DRAFT REASONING - SHORTCUT]\n{draft_solution}\n{'-'*50}", "green"))
-        return {
-            **state,
-            "draft_solution": draft_solution,
-        }
-
-    prompt = f"""
-    You are an assistant that will act like a person. You MUST follow a strict multi-step process to complete the task.
-    Current Problem: {current_problem}
-    The last action you took was: {last_action}
-    The output you received from the OS was: {analysis_summary}
-    Is the output you received from the OS the answer you need to give ?
-    If it is, you should output the answer in the format:
-    Think: <your reasoning>
-    Act: answer(<value>)
-    """
+    return get_prompt("reasoning_draft_multiple_steps").messages(
+        current_problem=current_problem,
+        last_action=last_action,
+        analysis_summary=analysis_summary,
+    )
+
+def _log_multiple_steps(state: AgentState) -> None:
+    # Passed as-is: nothing is formatted unless DEBUG is enabled
+    log.debug(
+        "draft_multiple_steps",
+        last_action=state.get("last_action", None),
+        current_problem=state.get("current_problem", ""),
+        analysis_summary=state.get("analysis_summary", "No summary available."),
+        state_keys=state.keys(),
+        messages=state.get("messages", []),
+    )
 
-    response = model_llm.invoke([SystemMessage(content=prompt)])
-    draft_solution = remove_multiline_think_blocks(response.content.strip())
-    # draft_solution = response.content.strip()
+def reasoning_draft_multiple_steps(state: AgentState) -> AgentState:
+    _log_multiple_steps(state)
 
-    print(colored(f"[DRAFT REASONING]\n{draft_solution}\n{'-'*50}", "red"))
-    return {
-        **state,
-        "draft_solution": draft_solution,
-    }
+    shortcut = fast_path_router.run("reasoning_draft", state)
+    if shortcut is not None:
+        return shortcut
 
-def reasoning_draft_node(state: AgentState) -> AgentState:
+    response = llm.invoke(_multiple_steps_prompt(state))
+    return _draft_result(state, response)
+
+async def reasoning_draft_multiple_steps_async(state: AgentState) -> AgentState:
+    _log_multiple_steps(state)
+
+    shortcut = fast_path_router.run("reasoning_draft", state)
+    if shortcut is not None:
+        return shortcut
+
+    response = await llm.ainvoke(_multiple_steps_prompt(state))
+    return _draft_result(state, response)
+
+def _log_last_action(state: AgentState) -> str | None:
     last_action = state.get("last_action", None)
-    print(colored("[DEBUG] Checking last action...", "yellow"))
-    print(colored(f"Last Action: {last_action}", "yellow"))
+    log.debug("check_last_action", last_action=last_action)
+    return last_action
+
+def reasoning_draft_node(state: AgentState) -> AgentState:
+    last_action = _log_last_action(state)
 
     if not last_action:
-        print(colored("[DEBUG] No last action found, using initial reasoning.", "yellow"))
+        log.debug("draft_mode", mode="first_interaction")
         return reasoning_draft_first_interaction(state)
     else:
-        print(colored("[DEBUG] Continuing with multi-step reasoning...", "yellow"))
+        log.debug("draft_mode", mode="multiple_steps")
         return reasoning_draft_multiple_steps(state)
+
+async def reasoning_draft_node_async(state: AgentState) -> AgentState:
+    last_action = _log_last_action(state)
+
+    if not last_action:
+        log.debug("draft_mode", mode="first_interaction")
+        return await reasoning_draft_first_interaction_async(state)
+    else:
+        log.debug("draft_mode", mode="multiple_steps")
+        return await reasoning_draft_multiple_steps_async(state)
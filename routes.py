@@ -1,9 +1,31 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
-from typing import List, Dict
-from langchain_core.messages import HumanMessage
+import asyncio
+import json
+import os
+from fastapi import APIRouter, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Dict, Literal
+from fast_path import fast_path_router
+from llm_cache import llm_cache, BYPASS_KEY
+from deadline import DEADLINE_KEY, TURN_TIMEOUT, DeadlineExceeded, deadline_after, finish_on_deadline
+from session_store import SessionStore, create_session_store, build_initial_state, merge_session_context
 
-session_cache: Dict[str, Dict] = {}
+session_cache: SessionStore = create_session_store()
+
+# Nodes whose LLM tokens are forwarded to streaming clients.
+STREAMED_TOKEN_NODES = ("reasoning_draft", "reasoning_final", "fast_pipeline")
+
+# "thorough" runs the full StateGraph, "fast" the single-call pipeline (see main.py).
+DEFAULT_MODE = os.environ.get("AGENT_MODE", "thorough")
+
+# Upper bound on the number of batch items running through the graph at the same time.
+BATCH_MAX_CONCURRENCY = int(os.environ.get("BATCH_MAX_CONCURRENCY", 8))
+
+# How often a running /api/chat request checks whether its client is still connected, in seconds.
+DISCONNECT_POLL_INTERVAL = 0.5
+
+class ClientDisconnected(Exception):
+    pass
 
 class Message(BaseModel):
     role: str
@@ -12,57 +34,206 @@ class Message(BaseModel):
 class ChatInput(BaseModel):
     messages: List[Message]
     thread_id: str | None = None
+    stream: bool = False
+    bypass_cache: bool = False
+    mode: Literal["thorough", "fast"] | None = None
+    # Time budget of the turn in seconds; can only shorten the server's TURN_TIMEOUT.
+    timeout: float | None = Field(None, gt=0)
+
+class BatchChatInput(BaseModel):
+    items: List[ChatInput]
+    max_concurrency: int | None = None
+
+def format_event(event: Dict, sse: bool) -> str:
+    """Serialize a stream event as an SSE frame or as one NDJSON line."""
+    if sse:
+        return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+    return json.dumps(event) + "\n"
+
+async def stream_graph_events(app_graph, initial_state: Dict, config: Dict, thread_id: str, context: Dict, sessions: SessionStore):
+    """
+    Run the graph with astream and yield events as they happen:
+    - {"event": "node", "node": ...} when a node finishes
+    - {"event": "token", "node": ..., "content": ...} for draft/final reasoning tokens
+    - {"event": "deadline"} if the turn ran out of time, before a best-effort last_action
+    - {"event": "last_action", "content": ...} once the graph is done
+    """
+    final_state = initial_state
+    try:
+        async for mode, chunk in app_graph.astream(
+            initial_state,
+            config=config,
+            stream_mode=["updates", "messages", "values"]
+        ):
+            if mode == "values":
+                final_state = chunk
+            elif mode == "updates":
+                for node in chunk:
+                    yield {"event": "node", "node": node}
+            elif mode == "messages":
+                message, metadata = chunk
+                node = metadata.get("langgraph_node")
+                if node in STREAMED_TOKEN_NODES and message.content:
+                    yield {"event": "token", "node": node, "content": message.content}
+    except DeadlineExceeded:
+        # "values" chunks hold the state after the last completed step
+        final_state = finish_on_deadline(final_state)
+        yield {"event": "deadline"}
 
-def create_router(app_graph):
+    sessions[thread_id] = merge_session_context(context, final_state)
+    yield {"event": "last_action", "content": final_state.get("last_action", "")}
+
+async def run_until_disconnect(coro, request: Request | None):
+    """Await `coro`, cancelling it (and raising ClientDisconnected) if the client goes away first."""
+    if request is None:
+        return await coro
+
+    task = asyncio.ensure_future(coro)
+
+    async def watch():
+        while not await request.is_disconnected():
+            await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+
+    watcher = asyncio.ensure_future(watch())
+    try:
+        done, _ = await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        if not task.done():
+            task.cancel()
+    if task not in done:
+        raise ClientDisconnected()
+    return task.result()
+
+async def best_effort_state(app_graph, config: Dict, fallback: Dict) -> Dict:
+    """State of the last checkpoint the graph reached in this thread, or `fallback` without a checkpointer."""
+    if getattr(app_graph, "checkpointer", None) is None:
+        return fallback
+    snapshot = await app_graph.aget_state(config)
+    return snapshot.values or fallback
+
+def turn_deadline(timeout: float | None) -> float | None:
+    if timeout is not None and timeout <= 0:
+        # deadline_after(0) means "no deadline": a client value must never lift the server's
+        timeout = None
+    if timeout is not None and TURN_TIMEOUT > 0:
+        timeout = min(timeout, TURN_TIMEOUT)
+    return deadline_after(timeout)
+
+def create_router(app_graph, fast_graph=None, session_store: SessionStore | None = None):
     router = APIRouter()
+    sessions = session_store if session_store is not None else session_cache
 
-    @router.post("/api/chat")
-    async def chat_endpoint(input: ChatInput):
+    def select_graph(mode: str | None):
+        if (mode or DEFAULT_MODE) == "fast" and fast_graph is not None:
+            return fast_graph
+        return app_graph
+
+    def prepare_chat(input: ChatInput):
         user_message = input.messages[-1].content if input.messages else ""
         thread_id = input.thread_id or "default"
 
         # print(f"Received chat input: {user_message} (thread_id: {thread_id})")
         # print("#############################################")
 
-        context = session_cache.get(thread_id, {
+        context = sessions.get(thread_id, {
             "expected_format": "",
             "analysis_summary": "",
             "tool_history": [],
             "last_output": ""
         })
 
-        initial_state = {
-            "messages": [HumanMessage(content=user_message)],
-            "expected_format": context.get("expected_format", ""),
-            "analysis_summary": context.get("analysis_summary", ""),
-            "tool_history": context.get("tool_history", []),
-            "draft_solution": context.get("draft_solution", ""),
-            "current_problem": context.get("current_problem", ""),
-            "last_action": context.get("last_action", ""),
-            "tool_context": context.get("tool_context", ""),
-            "cycles": context.get("cycles", 0)
-        }
+        initial_state = build_initial_state(context, user_message)
+        config = {"configurable": {
+            "thread_id": thread_id,
+            BYPASS_KEY: input.bypass_cache,
+            DEADLINE_KEY: turn_deadline(input.timeout),
+        }}
+        return thread_id, context, initial_state, config, select_graph(input.mode)
 
-        result = app_graph.invoke(
-            initial_state,
-            config={"configurable": {"thread_id": thread_id}}
-        )
-
-        session_cache[thread_id] = {
-            "expected_format": result.get("expected_format", context["expected_format"]),
-            "analysis_summary": result.get("analysis_summary", context["analysis_summary"]),
-            "tool_history": result.get("tool_history", context["tool_history"]),
-            "draft_solution": result.get("draft_solution", context.get("draft_solution", None)),
-            "current_problem": result.get("current_problem", context.get("current_problem", None)),
-            "last_action": result.get("last_action", context.get("last_action", None)),
-            "tool_context": result.get("tool_context", context.get("tool_context", None)),
-            "cycles": result.get("cycles", context.get("cycles", 0))
-        }
+    async def run_chat(input: ChatInput, request: Request | None = None) -> str:
+        thread_id, context, initial_state, config, graph = prepare_chat(input)
+
+        try:
+            result = await run_until_disconnect(graph.ainvoke(initial_state, config=config), request)
+        except DeadlineExceeded:
+            result = finish_on_deadline(await best_effort_state(graph, config, initial_state))
+
+        sessions[thread_id] = merge_session_context(context, result)
+        return result["last_action"]
+
+    @router.post("/api/chat")
+    async def chat_endpoint(input: ChatInput, request: Request):
+        if input.stream:
+            thread_id, context, initial_state, config, graph = prepare_chat(input)
+            sse = "text/event-stream" in request.headers.get("accept", "")
+
+            async def body():
+                async for event in stream_graph_events(graph, initial_state, config, thread_id, context, sessions):
+                    yield format_event(event, sse)
+
+            return StreamingResponse(
+                body(),
+                media_type="text/event-stream" if sse else "application/x-ndjson"
+            )
+
+        try:
+            content = await run_chat(input, request)
+        except ClientDisconnected:
+            # Nobody is listening anymore: the graph has been cancelled, the session is left as it was
+            return Response(status_code=499)
 
         return {
             "choices": [
-                {"message": {"role": "assistant", "content": result["last_action"]}}
+                {"message": {"role": "assistant", "content": content}}
             ]
         }
 
+    @router.post("/api/chat/batch")
+    async def chat_batch_endpoint(batch: BatchChatInput):
+        """
+        Run every item through the graph concurrently (at most max_concurrency at a time)
+        and stream one NDJSON line per item, in completion order.
+        Items sharing a thread_id run one after the other so their session context stays consistent.
+        """
+        limit = min(batch.max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+        semaphore = asyncio.Semaphore(max(limit, 1))
+        thread_locks: Dict[str, asyncio.Lock] = {}
+
+        async def run_item(index: int, item: ChatInput) -> Dict:
+            thread_id = item.thread_id or "default"
+            lock = thread_locks.setdefault(thread_id, asyncio.Lock())
+            async with lock, semaphore:
+                try:
+                    content = await run_chat(item)
+                except Exception as e:
+                    return {"index": index, "thread_id": thread_id, "error": str(e)}
+            return {
+                "index": index,
+                "thread_id": thread_id,
+                "choices": [
+                    {"message": {"role": "assistant", "content": content}}
+                ]
+            }
+
+        async def body():
+            tasks = [asyncio.create_task(run_item(index, item)) for index, item in enumerate(batch.items)]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    yield json.dumps(await next_done) + "\n"
+            finally:
+                # The client went away: stop the items that are still running
+                for task in tasks:
+                    task.cancel()
+
+        return StreamingResponse(body(), media_type="application/x-ndjson")
+
+    @router.get("/api/stats")
+    async def stats_endpoint():
+        return {
+            "fast_path": fast_path_router.stats(),
+            "llm_cache": llm_cache.stats(),
+            "sessions": sessions.stats(),
+        }
+
     return router
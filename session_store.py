@@ -0,0 +1,413 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Sequence
+from langchain_core.messages import HumanMessage, messages_from_dict, messages_to_dict
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP, BaseCheckpointSaver, ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple,
+    get_checkpoint_id, get_checkpoint_metadata,
+)
+from compaction import compact_messages
+
+def build_initial_state(context: Dict, user_message: str) -> Dict:
+    # The thread's compacted history carries over; the user message stays last, where the nodes read it.
+    history = messages_from_dict(context.get("history", []))
+    return {
+        "messages": compact_messages(history + [HumanMessage(content=user_message)]),
+        "expected_format": context.get("expected_format", ""),
+        "analysis_summary": context.get("analysis_summary", ""),
+        "tool_history": context.get("tool_history", []),
+        "draft_solution": context.get("draft_solution", ""),
+        "current_problem": context.get("current_problem", ""),
+        "last_action": context.get("last_action", ""),
+        "tool_context": context.get("tool_context", ""),
+        "cycles": context.get("cycles", 0)
+    }
+
+def merge_session_context(context: Dict, result: Dict) -> Dict:
+    """Session context to keep after a turn: the graph result, falling back to the previous context."""
+    return {
+        "expected_format": result.get("expected_format", context.get("expected_format", "")),
+        "analysis_summary": result.get("analysis_summary", context.get("analysis_summary", "")),
+        "tool_history": result.get("tool_history", context.get("tool_history", [])),
+        "draft_solution": result.get("draft_solution", context.get("draft_solution", None)),
+        "current_problem": result.get("current_problem", context.get("current_problem", None)),
+        "last_action": result.get("last_action", context.get("last_action", None)),
+        "tool_context": result.get("tool_context", context.get("tool_context", None)),
+        "cycles": result.get("cycles", context.get("cycles", 0)),
+        # Stored as plain dicts: the SQLite backend keeps the context as JSON
+        "history": messages_to_dict(result["messages"]) if result.get("messages") else context.get("history", []),
+    }
+
+def context_size(context: Dict) -> int:
+    return len(json.dumps(context, default=str))
+
+class LatestCheckpointSaver(BaseCheckpointSaver):
+    """
+    In-memory checkpointer keeping only the latest checkpoint of each thread (per namespace),
+    with the pending writes attached to it.
+    Each turn is rebuilt from the session store, so older checkpoints are never read again;
+    the latest one is what `best_effort_state` reads after a deadline or a disconnect.
+    Built on the public BaseCheckpointSaver interface only: checkpoints are stored whole, serialized.
+    """
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        # thread_id -> checkpoint_ns -> latest checkpoint
+        self._threads: dict[str, dict[str, dict]] = {}
+        self._lock = threading.Lock()
+
+    def _tuple(self, thread_id: str, checkpoint_ns: str, entry: dict) -> CheckpointTuple:
+        config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": entry["id"]}}
+        parent = entry["parent_id"]
+        return CheckpointTuple(
+            config=config,
+            checkpoint=self.serde.loads_typed(entry["checkpoint"]),
+            metadata=self.serde.loads_typed(entry["metadata"]),
+            parent_config={"configurable": {**config["configurable"], "checkpoint_id": parent}} if parent else None,
+            pending_writes=[(task_id, channel, self.serde.loads_typed(value)) for task_id, channel, value, _ in entry["writes"].values()],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        configurable = config["configurable"]
+        thread_id, checkpoint_ns = configurable["thread_id"], configurable.get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        with self._lock:
+            entry = self._threads.get(thread_id, {}).get(checkpoint_ns)
+            if entry is None or checkpoint_id and checkpoint_id != entry["id"]:
+                return None
+            return self._tuple(thread_id, checkpoint_ns, entry)
+
+    def list(self, config: RunnableConfig | None, *, filter: dict[str, Any] | None = None,
+             before: RunnableConfig | None = None, limit: int | None = None) -> Iterator[CheckpointTuple]:
+        configurable = (config or {}).get("configurable", {})
+        before_id = get_checkpoint_id(before) if before else None
+        with self._lock:
+            found = []
+            for thread_id, namespaces in self._threads.items():
+                if "thread_id" in configurable and thread_id != configurable["thread_id"]:
+                    continue
+                for checkpoint_ns, entry in namespaces.items():
+                    if configurable.get("checkpoint_ns") is not None and checkpoint_ns != configurable["checkpoint_ns"]:
+                        continue
+                    if configurable.get("checkpoint_id") and entry["id"] != configurable["checkpoint_id"]:
+                        continue
+                    if before_id and entry["id"] >= before_id:
+                        continue
+                    found.append(self._tuple(thread_id, checkpoint_ns, entry))
+        for checkpoint_tuple in found:
+            if filter and any(checkpoint_tuple.metadata.get(k) != v for k, v in filter.items()):
+                continue
+            if limit is not None and limit <= 0:
+                break
+            limit = limit - 1 if limit is not None else None
+            yield checkpoint_tuple
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        configurable = config["configurable"]
+        thread_id, checkpoint_ns = configurable["thread_id"], configurable.get("checkpoint_ns", "")
+        entry = {
+            "id": checkpoint["id"],
+            "parent_id": configurable.get("checkpoint_id"),
+            "checkpoint": self.serde.dumps_typed(checkpoint),
+            "metadata": self.serde.dumps_typed(get_checkpoint_metadata(config, metadata)),
+            "writes": {},
+        }
+        with self._lock:
+            # Replaces the previous checkpoint of the thread, its writes and its channel values with it
+            self._threads.setdefault(thread_id, {})[checkpoint_ns] = entry
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        configurable = config["configurable"]
+        thread_id, checkpoint_ns = configurable["thread_id"], configurable.get("checkpoint_ns", "")
+        with self._lock:
+            entry = self._threads.get(thread_id, {}).get(checkpoint_ns)
+            if entry is None or entry["id"] != configurable["checkpoint_id"]:
+                return  # writes of a checkpoint that is no longer the latest are never read
+            for index, (channel, value) in enumerate(writes):
+                key = (task_id, WRITES_IDX_MAP.get(channel, index))
+                # Regular writes are kept once per task; special channels (errors, interrupts) are overwritten
+                if key[1] >= 0 and key in entry["writes"]:
+                    continue
+                entry["writes"][key] = (task_id, channel, self.serde.dumps_typed(value), task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._threads.pop(thread_id, None)
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return self.get_tuple(config)
+
+    async def alist(self, config: RunnableConfig | None, *, filter: dict[str, Any] | None = None,
+                    before: RunnableConfig | None = None, limit: int | None = None) -> AsyncIterator[CheckpointTuple]:
+        for checkpoint_tuple in self.list(config, filter=filter, before=before, limit=limit):
+            yield checkpoint_tuple
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self.delete_thread(thread_id)
+
+    def thread_bytes(self, thread_id: str) -> int:
+        """Serialized size of what is held for the thread: its latest checkpoints and their pending writes."""
+        with self._lock:
+            return sum(
+                len(entry["checkpoint"][1]) + len(entry["metadata"][1])
+                + sum(len(value[1]) for _, _, value, _ in entry["writes"].values())
+                for entry in self._threads.get(thread_id, {}).values()
+            )
+
+class SessionStore(ABC):
+    """
+    Per-thread session context, bounded by entry count, idle TTL and total size.
+    Supports the dict operations the routes and the CLI use (get, [], in, clear).
+    Eviction listeners receive the evicted thread_id, e.g. to drop its checkpoints.
+    Size sources add what else is held for a thread (its checkpoints) to the size of its entry.
+    """
+
+    def __init__(self, max_entries: int = 10_000, ttl: float | None = 3600, max_bytes: int | None = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.evictions: Counter = Counter()
+        self._listeners: list[Callable[[str], None]] = []
+        self._size_sources: list[Callable[[str], int]] = []
+        self._lock = threading.RLock()
+
+    def add_eviction_listener(self, listener: Callable[[str], None]) -> None:
+        self._listeners.append(listener)
+
+    def add_size_source(self, source: Callable[[str], int]) -> None:
+        self._size_sources.append(source)
+
+    def _size(self, thread_id: str, context: Dict, payload: str | None = None) -> int:
+        size = len(payload) if payload is not None else context_size(context)
+        return size + sum(source(thread_id) for source in self._size_sources)
+
+    def _evicted(self, thread_id: str, reason: str) -> None:
+        self.evictions[reason] += 1
+        for listener in self._listeners:
+            listener(thread_id)
+
+    @abstractmethod
+    def get(self, thread_id: str, default: Dict | None = None) -> Dict | None:
+        ...
+
+    @abstractmethod
+    def set(self, thread_id: str, context: Dict) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, thread_id: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    @abstractmethod
+    def thread_ids(self) -> list[str]:
+        ...
+
+    @abstractmethod
+    def total_bytes(self) -> int:
+        ...
+
+    def __getitem__(self, thread_id: str) -> Dict:
+        context = self.get(thread_id)
+        if context is None:
+            raise KeyError(thread_id)
+        return context
+
+    def __setitem__(self, thread_id: str, context: Dict) -> None:
+        self.set(thread_id, context)
+
+    def __delitem__(self, thread_id: str) -> None:
+        self.delete(thread_id)
+
+    def __contains__(self, thread_id: str) -> bool:
+        return self.get(thread_id) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.thread_ids())
+
+    def __len__(self) -> int:
+        return len(self.thread_ids())
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self),
+                "bytes": self.total_bytes(),
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "evictions": dict(self.evictions),
+            }
+
+class InMemorySessionStore(SessionStore):
+    def __init__(self, **limits):
+        super().__init__(**limits)
+        # thread_id -> (last_access, size, context), least recently used first
+        self._entries: OrderedDict[str, tuple[float, int, Dict]] = OrderedDict()
+        self._bytes = 0
+
+    def _pop(self, thread_id: str) -> None:
+        _, size, _ = self._entries.pop(thread_id)
+        self._bytes -= size
+
+    def _expire(self, now: float) -> None:
+        while self._entries and self.ttl is not None:
+            thread_id, (last_access, _, _) = next(iter(self._entries.items()))
+            if now - last_access <= self.ttl:
+                break
+            self._pop(thread_id)
+            self._evicted(thread_id, "ttl")
+
+    def get(self, thread_id: str, default: Dict | None = None) -> Dict | None:
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            entry = self._entries.get(thread_id)
+            if entry is None:
+                return default
+            self._entries[thread_id] = (now, entry[1], entry[2])
+            self._entries.move_to_end(thread_id)
+            return entry[2]
+
+    def set(self, thread_id: str, context: Dict) -> None:
+        with self._lock:
+            now = time.time()
+            if thread_id in self._entries:
+                self._pop(thread_id)
+            size = self._size(thread_id, context)
+            self._entries[thread_id] = (now, size, context)
+            self._bytes += size
+            self._expire(now)
+            while len(self._entries) > self.max_entries:
+                evicted = next(iter(self._entries))
+                self._pop(evicted)
+                self._evicted(evicted, "capacity")
+            while self.max_bytes is not None and self._bytes > self.max_bytes and len(self._entries) > 1:
+                evicted = next(iter(self._entries))
+                self._pop(evicted)
+                self._evicted(evicted, "size")
+
+    def delete(self, thread_id: str) -> None:
+        with self._lock:
+            if thread_id in self._entries:
+                self._pop(thread_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def thread_ids(self) -> list[str]:
+        with self._lock:
+            self._expire(time.time())
+            return list(self._entries)
+
+    def total_bytes(self) -> int:
+        return self._bytes
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions shared between workers and kept across restarts, in a SQLite database in WAL mode."""
+
+    def __init__(self, path: str, **limits):
+        super().__init__(**limits)
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "thread_id TEXT PRIMARY KEY, context TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access)")
+        self._db.commit()
+
+    def _delete_oldest(self, where: str, params: tuple, reason: str, limit: int | None = None) -> None:
+        query = f"SELECT thread_id FROM sessions WHERE {where} ORDER BY last_access"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        for (thread_id,) in self._db.execute(query, params).fetchall():
+            self._db.execute("DELETE FROM sessions WHERE thread_id = ?", (thread_id,))
+            self._evicted(thread_id, reason)
+
+    def _expire(self, now: float) -> None:
+        if self.ttl is not None:
+            self._delete_oldest("last_access < ?", (now - self.ttl,), "ttl")
+
+    def get(self, thread_id: str, default: Dict | None = None) -> Dict | None:
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            row = self._db.execute("SELECT context FROM sessions WHERE thread_id = ?", (thread_id,)).fetchone()
+            if row is None:
+                self._db.commit()
+                return default
+            self._db.execute("UPDATE sessions SET last_access = ? WHERE thread_id = ?", (now, thread_id))
+            self._db.commit()
+            return json.loads(row[0])
+
+    def set(self, thread_id: str, context: Dict) -> None:
+        with self._lock:
+            now = time.time()
+            payload = json.dumps(context, default=str)
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (thread_id, context, size, last_access) VALUES (?, ?, ?, ?)",
+                (thread_id, payload, self._size(thread_id, context, payload), now),
+            )
+            self._expire(now)
+            overflow = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._delete_oldest("thread_id != ?", (thread_id,), "capacity", limit=overflow)
+            while self.max_bytes is not None and self.total_bytes() > self.max_bytes and len(self) > 1:
+                self._delete_oldest("thread_id != ?", (thread_id,), "size", limit=1)
+            self._db.commit()
+
+    def delete(self, thread_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE thread_id = ?", (thread_id,))
+            self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM sessions")
+            self._db.commit()
+
+    def thread_ids(self) -> list[str]:
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT thread_id FROM sessions ORDER BY last_access")]
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM sessions").fetchone()[0]
+
+def create_session_store() -> SessionStore:
+    """
+    Build the store from the environment:
+    SESSION_BACKEND (memory | sqlite), SESSION_DB_PATH, SESSION_MAX_ENTRIES,
+    SESSION_TTL (idle seconds, 0 = never expire) and SESSION_MAX_BYTES.
+    """
+    ttl = float(os.environ.get("SESSION_TTL", 3600))
+    limits = {
+        "max_entries": int(os.environ.get("SESSION_MAX_ENTRIES", 10_000)),
+        "ttl": ttl if ttl > 0 else None,
+        "max_bytes": int(os.environ.get("SESSION_MAX_BYTES", 64 * 1024 * 1024)),
+    }
+    if os.environ.get("SESSION_BACKEND", "memory") == "sqlite":
+        return SQLiteSessionStore(os.environ.get("SESSION_DB_PATH", "sessions.sqlite3"), **limits)
+    return InMemorySessionStore(**limits)
@@ -163,3 +163,30 @@ def test_start_new_task_does_nothing():
 
     result = start_new_task_if_needed(state)
     assert result == state
+
+@pytest.mark.asyncio
+async def test_analyse_problem_node_async_first_interaction(monkeypatch):
+    from analyse import analyse_problem_node_async
+    from langchain_core.messages import HumanMessage
+
+    async def fake_ainvoke(messages, *args, **kwargs):
+        class FakeResponse:
+            content = "Count the number of files in the /etc directory."
+        return FakeResponse()
+
+    monkeypatch.setattr(analyse.llm.__class__, "ainvoke", fake_ainvoke)
+
+    state = {
+        "messages": [HumanMessage(content="Now, my problem is: how many files are in /etc?")],
+        "expected_format": "",
+        "analysis_summary": "",
+        "current_problem": "",
+        "last_action": "",
+        "draft_solution": "",
+        "tool_context": "",
+        "cycles": 0,
+    }
+
+    result = await analyse_problem_node_async(state)
+    assert result["current_problem"] == "Count the number of files in the /etc directory."
+    assert result["messages"][-1].content == ": how many files are in /etc?"
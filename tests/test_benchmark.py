@@ -0,0 +1,63 @@
+import json
+import pytest
+from langgraph.checkpoint.memory import MemorySaver
+import analyse
+import main
+from prompt_and_format import PROMPT_VERSION
+from benchmarks.fakes import FakeDocServer, ScriptedChatModel
+from benchmarks.run import TASKS_PATH, patched_environment, run_benchmark, run_task
+
+@pytest.mark.asyncio
+async def test_benchmark_report_is_deterministic():
+    llm_before = analyse.llm
+
+    first = await run_benchmark()
+    second = await run_benchmark()
+
+    counters = ("llm_calls", "prompt_tokens", "completion_tokens", "doc_requests", "planner_loops")
+    assert [{k: t[k] for k in counters} for t in first["tasks"]] == [{k: t[k] for k in counters} for t in second["tasks"]]
+    # The real modules get their models back
+    assert analyse.llm is llm_before
+
+@pytest.mark.asyncio
+async def test_benchmark_counts_planner_loops_and_tool_calls():
+    report = await run_benchmark(only=["find_recent_files"])
+
+    task = report["tasks"][0]
+    assert task["planner_loops"] == 3
+    assert task["doc_requests"] == 1
+    assert task["nodes"]["linux_doc"]["runs"] == 1
+    assert task["nodes"]["planner"]["llm_calls"] == 3
+    assert task["turns"][0]["last_action"].endswith("find . -type f -mtime -1\n```")
+    assert report["totals"]["llm_calls"] == task["llm_calls"]
+
+@pytest.mark.asyncio
+async def test_benchmark_fast_mode_uses_single_call():
+    report = await run_benchmark(mode="fast", only=["chmod_recursive"])
+
+    task = report["tasks"][0]
+    assert task["llm_calls"] == 1
+    assert list(task["nodes"]) == ["fast_pipeline"]
+
+@pytest.mark.asyncio
+async def test_benchmark_reports_prefix_cache_reuse():
+    cold = await run_benchmark(only=["find_recent_files"], kv_slots=0)
+    warm = await run_benchmark(only=["find_recent_files"], kv_slots=4)
+
+    assert cold["totals"]["prefix_cached_tokens"] == 0
+    planner = warm["tasks"][0]["nodes"]["planner"]
+    # The second and third planner calls reuse at least the system prefix of the first
+    assert planner["prefix_cached_tokens"] > 0
+    assert warm["config"]["prompt_version"] == PROMPT_VERSION
+
+@pytest.mark.asyncio
+async def test_tool_nodes_receive_the_planner_arguments():
+    corpus = json.load(open(TASKS_PATH))
+    task = next(t for t in corpus["tasks"] if t["id"] == "chmod_recursive")
+    model, server = ScriptedChatModel(), FakeDocServer(corpus["pages"])
+    app_graph = main.graph.compile(checkpointer=MemorySaver())
+
+    with patched_environment(model, server):
+        await run_task(app_graph, task, model, server, "plan")
+
+    assert server.queries == [("/search", {"q": "recursive", "k": "5", "command": "chmod"})]
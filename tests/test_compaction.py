@@ -0,0 +1,46 @@
+from langchain_core.messages import HumanMessage, SystemMessage
+from compaction import compact_messages, append_messages, count_tokens, is_summary, SUMMARY_PREFIX
+
+def turns(n, words=20):
+    return [HumanMessage(content=f"turn {i} " + " ".join(["word"] * words)) for i in range(n)]
+
+def test_count_tokens_is_local_and_counts_punctuation():
+    assert count_tokens("ls /etc | wc -l") == 7
+
+def test_small_history_is_untouched():
+    messages = turns(3)
+    assert compact_messages(messages, budget=1000, keep_last=2) is messages
+
+def test_old_turns_are_folded_into_a_summary():
+    messages = turns(10)
+
+    compacted = compact_messages(messages, budget=120, keep_last=3)
+
+    assert is_summary(compacted[0])
+    assert compacted[1:] == messages[-3:]
+    assert sum(count_tokens(m.content) for m in compacted) <= 120 + count_tokens(SUMMARY_PREFIX)
+
+def test_summary_rolls_forward_and_stays_bounded():
+    messages = turns(4)
+    for message in turns(50):
+        messages = append_messages(messages, [message])
+        messages = compact_messages(messages, budget=200, keep_last=2)
+
+    assert is_summary(messages[0])
+    assert sum(count_tokens(m.content) for m in messages) <= 200 + count_tokens(SUMMARY_PREFIX)
+    assert "turn 47" in messages[0].content
+    assert "turn 0 " not in messages[0].content
+
+def test_tool_results_are_truncated_in_the_summary():
+    doc = HumanMessage(content="[linux_doc RESULT]\n" + "option " * 500)
+    compacted = compact_messages([doc] + turns(2), budget=100, keep_last=2)
+
+    assert compacted[0].content.startswith(SUMMARY_PREFIX + "\n- human: [linux_doc RESULT] option")
+    assert count_tokens(compacted[0].content) < 60
+
+def test_existing_system_messages_are_folded_like_others():
+    messages = [SystemMessage(content="setup")] + turns(6)
+    compacted = compact_messages(messages, budget=100, keep_last=2)
+
+    assert is_summary(compacted[0])
+    assert len(compacted) == 3
@@ -0,0 +1,26 @@
+import time
+import pytest
+from langchain_core.runnables import RunnableLambda
+from deadline import DEADLINE_KEY, DeadlineExceeded, guard_node, remaining, finish_on_deadline, FINISH_ON_DEADLINE
+
+def test_no_deadline_runs_the_node():
+    node, _ = guard_node(lambda state: {**state, "ran": True})
+    assert RunnableLambda(node).invoke({}) == {"ran": True}
+
+def test_expired_deadline_stops_before_the_node():
+    calls = []
+    node, _ = guard_node(lambda state: calls.append(state))
+    config = {"configurable": {DEADLINE_KEY: time.monotonic() - 1}}
+
+    with pytest.raises(DeadlineExceeded):
+        RunnableLambda(node).invoke({}, config=config)
+    assert calls == []
+
+def test_remaining_reads_the_config():
+    assert remaining({"configurable": {}}) is None
+    assert 9 < remaining({"configurable": {DEADLINE_KEY: time.monotonic() + 10}}) <= 10
+
+def test_finish_on_deadline_keeps_the_state():
+    state = finish_on_deadline({"current_problem": "Count files.", "last_action": "Act: bash"})
+    assert state["current_problem"] == "Count files."
+    assert state["last_action"] == FINISH_ON_DEADLINE
@@ -0,0 +1,130 @@
+import httpx
+import pytest
+import doc_client
+from doc_client import DocClientConfig
+
+@pytest.fixture
+def server(monkeypatch):
+    """Fake doc server: fails `failures` times with 503, then answers."""
+    state = {"failures": 0, "requests": []}
+
+    def handler(request):
+        state["requests"].append(request)
+        if state["failures"] > 0:
+            state["failures"] -= 1
+            return httpx.Response(503, json={"error": "busy"})
+        return httpx.Response(200, json={"command": request.url.params["command"], "full_doc": "NAME"})
+
+    monkeypatch.setattr(doc_client, "backoff_delay", lambda attempt: 0)
+    doc_client.configure(DocClientConfig(base_url="http://docs.test", max_retries=2), transport=httpx.MockTransport(handler))
+    yield state
+    doc_client.configure()
+
+def test_get_json_reuses_pooled_client(server):
+    assert doc_client.get_json("/get_doc", {"command": "ls"})["command"] == "ls"
+    client = doc_client.get_client()
+    doc_client.get_json("/get_doc", {"command": "find"})
+
+    assert doc_client.get_client() is client
+    assert str(server["requests"][0].url) == "http://docs.test/get_doc?command=ls"
+
+def test_get_json_retries_retryable_status(server):
+    server["failures"] = 2
+    assert doc_client.get_json("/get_doc", {"command": "ls"})["full_doc"] == "NAME"
+    assert len(server["requests"]) == 3
+
+def test_get_json_gives_up_after_max_retries(server):
+    server["failures"] = 5
+    assert doc_client.get_json("/get_doc", {"command": "ls"}) == {"error": "busy"}
+    assert len(server["requests"]) == 3
+
+def test_get_json_raises_transport_error_after_retries(monkeypatch):
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        raise httpx.ConnectError("refused", request=request)
+
+    monkeypatch.setattr(doc_client, "backoff_delay", lambda attempt: 0)
+    doc_client.configure(DocClientConfig(max_retries=1), transport=httpx.MockTransport(handler))
+    try:
+        with pytest.raises(httpx.ConnectError):
+            doc_client.get_json("/get_doc", {"command": "ls"})
+    finally:
+        doc_client.configure()
+    assert len(attempts) == 2
+
+@pytest.mark.asyncio
+async def test_aget_json_retries_and_reuses_client(server):
+    server["failures"] = 1
+    data = await doc_client.aget_json("/get_doc", {"command": "grep"})
+    client = doc_client.get_async_client()
+    await doc_client.aget_json("/get_doc", {"command": "wc"})
+
+    assert data["command"] == "grep"
+    assert doc_client.get_async_client() is client
+    assert len(server["requests"]) == 3
+
+def test_backoff_delay_is_bounded():
+    doc_client.configure(DocClientConfig(backoff_base=0.1, backoff_max=0.3))
+    try:
+        assert all(0 <= doc_client.backoff_delay(attempt) <= 0.3 for attempt in range(6))
+    finally:
+        doc_client.configure()
+
+@pytest.fixture
+def etag_server(monkeypatch):
+    """Fake doc server answering 304 when the client sends the page's current tag."""
+    state = {"etag": '"v1"', "requests": []}
+
+    def handler(request):
+        state["requests"].append(request)
+        if request.headers.get("if-none-match") == state["etag"]:
+            return httpx.Response(304, headers={"ETag": state["etag"]})
+        return httpx.Response(200, json={"command": request.url.params["command"], "etag": state["etag"]}, headers={"ETag": state["etag"]})
+
+    doc_client.configure(DocClientConfig(base_url="http://docs.test"), transport=httpx.MockTransport(handler))
+    yield state
+    doc_client.configure()
+
+def test_get_json_revalidates_with_etag(etag_server):
+    first = doc_client.get_json("/get_doc", {"command": "ls"})
+    second = doc_client.get_json("/get_doc", {"command": "ls"})
+
+    assert first == second == {"command": "ls", "etag": '"v1"'}
+    assert "if-none-match" not in etag_server["requests"][0].headers
+    assert etag_server["requests"][1].headers["if-none-match"] == '"v1"'
+    assert doc_client.validators.stats["revalidated"] == 1
+
+def test_get_json_replaces_changed_page(etag_server):
+    doc_client.get_json("/get_doc", {"command": "ls"})
+    etag_server["etag"] = '"v2"'
+
+    assert doc_client.get_json("/get_doc", {"command": "ls"})["etag"] == '"v2"'
+    assert doc_client.get_json("/get_doc", {"command": "ls"})["etag"] == '"v2"'
+    assert doc_client.validators.stats == {"revalidated": 1, "changed": 1}
+
+def test_get_json_refetches_when_stored_answer_is_gone(etag_server, monkeypatch):
+    doc_client.get_json("/get_doc", {"command": "ls"})
+    # Evicted between sending the tag and reading the 304
+    monkeypatch.setattr(doc_client.validators, "not_modified", lambda key: None)
+
+    assert doc_client.get_json("/get_doc", {"command": "ls"})["command"] == "ls"
+    assert len(etag_server["requests"]) == 3
+    assert "if-none-match" not in etag_server["requests"][2].headers
+
+@pytest.mark.asyncio
+async def test_aget_json_revalidates_with_etag(etag_server):
+    await doc_client.aget_json("/get_doc", {"command": "grep"})
+    data = await doc_client.aget_json("/get_doc", {"command": "grep"})
+
+    assert data["command"] == "grep"
+    assert etag_server["requests"][1].headers["if-none-match"] == '"v1"'
+
+def test_validator_cache_is_bounded(etag_server):
+    doc_client.configure(DocClientConfig(base_url="http://docs.test", etag_cache_size=1), transport=doc_client._transport)
+    doc_client.get_json("/get_doc", {"command": "ls"})
+    doc_client.get_json("/get_doc", {"command": "wc"})
+    doc_client.get_json("/get_doc", {"command": "ls"})
+
+    assert "if-none-match" not in etag_server["requests"][2].headers
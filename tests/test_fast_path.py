@@ -0,0 +1,72 @@
+from langchain_core.messages import HumanMessage
+from fast_path import FastPathRouter, fast_path_router
+import pytest
+
+def make_state(**overrides):
+    state = {
+        "messages": [HumanMessage(content="How many files are in /etc?")],
+        "expected_format": "",
+        "analysis_summary": "",
+        "current_problem": "Count files in /etc.",
+        "last_action": "",
+        "draft_solution": "",
+        "tool_context": "",
+        "cycles": 0,
+    }
+    return {**state, **overrides}
+
+def test_rules_run_in_priority_order_and_count_hits():
+    router = FastPathRouter()
+    router.register("late", ["planner"], lambda s: True, lambda s: {**s, "plan": {"action": "late"}}, priority=50)
+    router.register("early", ["planner"], lambda s: True, lambda s: {**s, "plan": {"action": "early"}}, priority=5)
+
+    result = router.run("planner", make_state())
+
+    assert result["plan"]["action"] == "early"
+    assert router.hits["early"] == 1
+    assert router.hits["late"] == 0
+    assert router.stats()["evaluations"] == {"planner": 1}
+
+def test_rules_only_apply_to_their_nodes():
+    router = FastPathRouter()
+    router.register("planner_only", ["planner"], lambda s: True, lambda s: s)
+
+    assert router.run("analyze", make_state()) is None
+    assert [rule.name for rule in router.rules("planner")] == ["planner_only"]
+
+def test_duplicate_rule_names_are_rejected():
+    router = FastPathRouter()
+    router.register("dup", ["planner"], lambda s: True, lambda s: s)
+    with pytest.raises(ValueError):
+        router.register("dup", ["planner"], lambda s: True, lambda s: s)
+
+def test_default_planner_rule_detects_answer_in_draft():
+    state = make_state(draft_solution="Think: done.\nAct: answer(220)")
+
+    result = fast_path_router.run("planner", state)
+
+    assert result["plan"] == {"action": "reasoning_final", "input": "answer(...) detected"}
+
+def test_default_planner_rule_falls_through_on_plain_draft():
+    assert fast_path_router.run("planner", make_state(draft_solution="Think: I am not sure yet.")) is None
+
+def test_default_draft_rule_answers_numeric_os_output():
+    state = make_state(
+        messages=[HumanMessage(content="The output of the OS:\n220")],
+        last_action="```bash\nls /etc | wc -l\n```",
+    )
+
+    result = fast_path_router.run("reasoning_draft", state)
+
+    assert "Act: answer(220)" in result["draft_solution"]
+
+def test_stats_endpoint_exposes_rule_hits():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from routes import create_router
+
+    app = FastAPI()
+    app.include_router(create_router(object()))
+    stats = TestClient(app).get("/api/stats").json()["fast_path"]
+
+    assert "planner_bash_in_draft" in [rule["name"] for rule in stats["rules"]]
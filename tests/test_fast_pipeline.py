@@ -0,0 +1,71 @@
+import pytest
+from langchain_core.messages import HumanMessage
+import main
+from main import FastPipelineResponse
+
+class FakeFastModel:
+    def __init__(self):
+        self.calls = []
+
+    def invoke(self, messages):
+        self.calls.append(messages)
+        return FastPipelineResponse(
+            summary="Count the files in /etc.",
+            draft="Use ls and wc.",
+            thought="I need to count the files.",
+            action="bash",
+            code="ls /etc | wc -l",
+        )
+
+    async def ainvoke(self, messages):
+        return self.invoke(messages)
+
+def make_state(content, **overrides):
+    state = {
+        "messages": [HumanMessage(content=content)],
+        "expected_format": "",
+        "analysis_summary": "",
+        "current_problem": "",
+        "last_action": "",
+        "draft_solution": "",
+        "tool_context": "",
+        "cycles": 0,
+    }
+    return {**state, **overrides}
+
+def test_fast_pipeline_single_call(monkeypatch):
+    fake = FakeFastModel()
+    monkeypatch.setattr(main, "model_with_fast_output", fake)
+
+    result = main.fast_pipeline_node(make_state("Now, my problem is: how many files are in /etc?"))
+
+    assert len(fake.calls) == 1
+    assert result["current_problem"] == "Count the files in /etc."
+    assert result["draft_solution"] == "Use ls and wc."
+    assert result["last_action"] == "Think: I need to count the files.\nAct: bash\n\n```bash\nls /etc | wc -l\n```"
+
+def test_fast_pipeline_numeric_output_skips_llm(monkeypatch):
+    fake = FakeFastModel()
+    monkeypatch.setattr(main, "model_with_fast_output", fake)
+
+    state = make_state(
+        "The output of the OS:\n220",
+        analysis_summary="Count the files in /etc.",
+        current_problem="Count the files in /etc.",
+        last_action="Think: count\nAct: bash\n\n```bash\nls /etc | wc -l\n```",
+    )
+    result = main.fast_pipeline_node(state)
+
+    assert fake.calls == []
+    assert "Act: answer(220)" in result["last_action"]
+
+@pytest.mark.asyncio
+async def test_fast_graph_runs_one_node(monkeypatch):
+    monkeypatch.setattr(main, "model_with_fast_output", FakeFastModel())
+
+    result = await main.fast_app_graph.ainvoke(
+        make_state("How many files are in /etc?"),
+        config={"configurable": {"thread_id": "fast-graph-test"}}
+    )
+
+    assert result["last_action"].startswith("Think: I need to count the files.")
@@ -0,0 +1,83 @@
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import SystemMessage
+from langchain_core.runnables import RunnableLambda
+import llm_cache
+from llm_cache import TTLLRUCache, BYPASS_KEY
+
+def make_model(cache, responses=("first", "second", "third")):
+    return FakeListChatModel(responses=list(responses), cache=cache)
+
+def test_identical_prompts_hit_the_cache():
+    cache = TTLLRUCache()
+    model = make_model(cache)
+
+    assert model.invoke([SystemMessage(content="Summarize the problem")]).content == "first"
+    assert model.invoke([SystemMessage(content="Summarize the problem")]).content == "first"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_per_call_values_are_hashed_exactly():
+    cache = TTLLRUCache()
+    model = make_model(cache)
+
+    # Line breaks of an OS output and spaces inside a quoted pattern change the answer
+    assert model.invoke([SystemMessage(content='System output: "a\nb\nc"')]).content == "first"
+    assert model.invoke([SystemMessage(content='System output: "a b c"')]).content == "second"
+    assert model.invoke([SystemMessage(content='grep " x" f')]).content == "third"
+    assert model.invoke([SystemMessage(content='grep "x" f')]).content == "first"
+    assert cache.stats()["hits"] == 0
+
+def test_model_parameters_are_part_of_the_key():
+    cache = TTLLRUCache()
+    make_model(cache, ["a"]).invoke("hi")
+
+    assert make_model(cache, ["b"]).invoke("hi").content == "b"
+
+def test_lru_eviction():
+    cache = TTLLRUCache(max_entries=1)
+    model = make_model(cache)
+
+    model.invoke("one")
+    model.invoke("two")
+    assert model.invoke("one").content == "third"
+    assert cache.stats()["evictions"] == 2
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    cache = TTLLRUCache(ttl=10)
+    model = make_model(cache)
+
+    model.invoke("hi")
+    now[0] += 11
+
+    assert model.invoke("hi").content == "second"
+    assert cache.stats()["expirations"] == 1
+
+def test_sqlite_persistence_survives_restart(tmp_path):
+    path = str(tmp_path / "llm_cache.sqlite3")
+    model = make_model(TTLLRUCache(path=path))
+    model.invoke("hi")
+
+    model.cache = TTLLRUCache(path=path)
+    assert model.invoke("hi").content == "first"
+    assert model.cache.stats()["hits"] == 1
+
+def test_bypass_flag_in_config():
+    cache = TTLLRUCache()
+    model = make_model(cache)
+    node = RunnableLambda(lambda prompt: model.invoke(prompt).content)
+
+    node.invoke("hi")
+    assert node.invoke("hi", config={"configurable": {BYPASS_KEY: True}}) == "second"
+    assert cache.stats()["bypassed"] == 1
+    assert node.invoke("hi") == "first"
+
+@pytest.mark.asyncio
+async def test_async_lookup():
+    cache = TTLLRUCache()
+    model = make_model(cache)
+
+    await model.ainvoke("hi")
+    assert (await model.ainvoke("hi")).content == "first"
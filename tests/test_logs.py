@@ -0,0 +1,44 @@
+import io
+import json
+import logging
+from langchain_core.runnables import RunnableLambda
+import logs
+
+class Exploding:
+    def __str__(self):
+        raise AssertionError("formatted while the level is disabled")
+
+    __repr__ = __str__
+
+def test_disabled_level_does_not_format_fields():
+    stream = io.StringIO()
+    logs.configure_logging("INFO", stream=stream)
+    try:
+        logs.get_logger("test").debug("state_dump", state=Exploding())
+    finally:
+        logs.configure_logging()
+
+    assert stream.getvalue() == ""
+
+def test_json_line_carries_thread_id_and_node():
+    stream = io.StringIO()
+    logs.configure_logging(logging.DEBUG, stream=stream)
+    log = logs.get_logger("test")
+
+    def node(state):
+        log.info("draft_solution", draft="Act: finish", keys=state.keys())
+        return state
+
+    try:
+        RunnableLambda(node).invoke({"a": 1}, config={"configurable": {"thread_id": "t1"}, "metadata": {"langgraph_node": "reasoning_draft"}})
+    finally:
+        logs.configure_logging()
+
+    line = json.loads(stream.getvalue().strip())
+    assert line["event"] == "draft_solution"
+    assert line["level"] == "info"
+    assert line["logger"] == "agent.test"
+    assert line["thread_id"] == "t1"
+    assert line["node"] == "reasoning_draft"
+    assert line["draft"] == "Act: finish"
+    assert line["keys"] == ["a"]
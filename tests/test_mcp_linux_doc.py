@@ -0,0 +1,443 @@
+import asyncio
+import os
+import sys
+import threading
+import httpx
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mcp"))
+
+import mcp_linux_doc
+from man_cache import ManPageCache
+from doc_index import DocIndex, split_passages
+import doc_sections
+from doc_sections import count_tokens, parse_page
+from doc_embeddings import EmbeddingIndex, normalize
+from render_pool import RenderPool
+import http_cache
+
+FIND_DOC = (
+    "NAME\n       find - search for files in a directory hierarchy\n"
+    "SYNOPSIS\n       find [path...] [expression]\n"
+    "TESTS\n       -mtime n\n              File's data was last modified less than, more than or exactly n*24 hours ago.\n"
+    "\n       -name pattern\n              Base of file name matches shell pattern.\n"
+)
+WC_DOC = "NAME\n       wc - print newline, word, and byte counts for each file\nOPTIONS\n       -l, --lines\n              print the newline counts\n"
+
+@pytest.fixture
+def source_page(tmp_path):
+    path = tmp_path / "find.1.gz"
+    path.write_text("source")
+    return path
+
+@pytest.fixture
+def renders(monkeypatch, tmp_path, source_page):
+    calls = []
+
+    def fake_render(base_command, man_section=None):
+        calls.append((base_command, man_section))
+        return FIND_DOC if base_command == "find" else None
+
+    monkeypatch.setattr(mcp_linux_doc, "page_cache", ManPageCache(str(tmp_path / "cache.sqlite3")))
+    monkeypatch.setattr(mcp_linux_doc, "doc_index", DocIndex())
+    monkeypatch.setattr(mcp_linux_doc, "locate_page", lambda base_command, man_section=None: str(source_page) if base_command == "find" else None)
+    monkeypatch.setattr(mcp_linux_doc, "render_page", fake_render)
+    return calls
+
+@pytest.fixture
+def client():
+    return TestClient(mcp_linux_doc.app)
+
+def test_get_doc_renders_once_then_hits_memory(client, renders):
+    first = client.get("/get_doc", params={"command": "find . -name x"}).json()
+    second = client.get("/get_doc", params={"command": "find"}).json()
+
+    assert first["full_doc"] == FIND_DOC
+    assert second["summary"] == ["NAME", "SYNOPSIS"]
+    assert renders == [("find", None)]
+    assert mcp_linux_doc.page_cache.stats["memory_hits"] == 1
+
+def test_get_doc_unknown_command(client, renders):
+    data = client.get("/get_doc", params={"command": "nope"}).json()
+    assert data == {"error": "No documentation found for 'nope'", "not_found": True}
+
+def test_man_arguments_cannot_become_options(client, renders):
+    assert client.get("/get_doc", params={"command": "find", "man_section": "--html=touch /tmp/x"}).status_code == 422
+    assert client.get("/get_doc", params={"command": "find", "man_section": "1"}).status_code == 200
+    assert mcp_linux_doc.man_args("--html=x", None) == ["--", "--html=x"]
+    assert mcp_linux_doc.man_args("printf", "3p") == ["--", "3p", "printf"]
+
+def test_cache_is_keyed_by_man_section(client, renders):
+    client.get("/get_doc", params={"command": "find"})
+    client.get("/get_doc", params={"command": "find", "man_section": "1"})
+    assert renders == [("find", None), ("find", "1")]
+
+def test_disk_store_survives_restart(tmp_path, source_page):
+    db_path = str(tmp_path / "cache.sqlite3")
+    ManPageCache(db_path).put("find", None, str(source_page), FIND_DOC)
+
+    reopened = ManPageCache(db_path)
+    page = reopened.get("find")
+
+    assert page.doc == FIND_DOC
+    assert reopened.stats["disk_hits"] == 1
+
+def test_source_mtime_change_invalidates(tmp_path, source_page):
+    cache = ManPageCache(str(tmp_path / "cache.sqlite3"))
+    cache.put("find", None, str(source_page), FIND_DOC)
+
+    stat = os.stat(source_page)
+    os.utime(source_page, (stat.st_atime, stat.st_mtime + 10))
+
+    assert cache.get("find") is None
+    assert cache.stats["invalidations"] == 1
+    assert ManPageCache(cache.db_path).get("find") is None
+
+def test_memory_lru_evicts_by_size(tmp_path, source_page):
+    cache = ManPageCache(str(tmp_path / "cache.sqlite3"), max_bytes=10)
+    cache.put("a", None, str(source_page), "123456")
+    cache.put("b", None, str(source_page), "123456")
+
+    assert cache.stats["evictions"] == 1
+    assert cache.get("a").doc == "123456"
+    assert cache.stats["disk_hits"] == 1
+
+def test_split_passages_keeps_section_context():
+    passages = split_passages("find", FIND_DOC)
+
+    assert [p.section for p in passages] == ["NAME", "SYNOPSIS", "TESTS", "TESTS"]
+    assert passages[2].text.startswith("-mtime n File's data was last modified")
+
+def test_bm25_ranks_matching_passage_first():
+    index = DocIndex()
+    index.add_page("find", FIND_DOC)
+    index.add_page("wc", WC_DOC)
+
+    results = index.search("last modified hours", k=2)
+
+    assert results[0]["command"] == "find"
+    assert results[0]["section"] == "TESTS"
+    assert "-mtime" in results[0]["text"]
+
+def test_bm25_filters_by_command_and_replaces_pages():
+    index = DocIndex()
+    index.add_page("find", FIND_DOC)
+    index.add_page("wc", WC_DOC)
+    index.add_page("wc", WC_DOC)
+
+    assert [r["command"] for r in index.search("file", command="wc")] == ["wc"]
+    assert len(index) == len(split_passages("find", FIND_DOC)) + len(split_passages("wc", WC_DOC))
+
+def test_index_save_and_load(tmp_path):
+    index = DocIndex()
+    index.add_page("wc", WC_DOC)
+    index.save(str(tmp_path / "index.json"))
+
+    loaded = DocIndex.load(str(tmp_path / "index.json"))
+
+    assert loaded.commands() == ["wc"]
+    assert loaded.search("newline counts")[0]["section"] == "OPTIONS"
+
+def test_search_endpoint_indexes_page_on_demand(client, renders):
+    data = client.get("/search", params={"q": "modified", "command": "find", "k": 1}).json()
+
+    assert data["command"] == "find"
+    assert len(data["results"]) == 1
+    assert data["results"][0]["section"] == "TESTS"
+    assert renders == [("find", None)]
+
+def test_search_endpoint_across_all_commands(client, renders):
+    mcp_linux_doc.doc_index.add_page("wc", WC_DOC)
+    client.get("/get_doc", params={"command": "find"})
+
+    data = client.get("/search", params={"q": "newline counts"}).json()
+
+    assert data["command"] is None
+    assert data["results"][0]["command"] == "wc"
+
+def test_search_endpoint_unknown_command(client, renders):
+    data = client.get("/search", params={"q": "x", "command": "nope"}).json()
+    assert data == {"error": "No documentation found for 'nope'", "not_found": True}
+
+LS_DOC = (
+    "NAME\n       ls - list directory contents\n\n"
+    "SYNOPSIS\n       ls [OPTION]... [FILE]...\n\n"
+    "DESCRIPTION\n       List information about the FILEs.\n\n"
+    "       -a, --all\n              do not ignore entries starting with .\n\n"
+    "       -l     use a long listing format\n\n"
+    "       --color[=WHEN]\n              color the output WHEN; more info below\n\n"
+    "AUTHOR\n       Written by Richard M. Stallman and David MacKenzie.\n"
+)
+
+def test_parse_page_splits_sections_and_options():
+    page = parse_page("ls", LS_DOC)
+
+    assert list(page.sections) == ["NAME", "SYNOPSIS", "DESCRIPTION", "AUTHOR"]
+    assert [o.flags for o in page.options] == [["-a", "--all"], ["-l"], ["--color"]]
+    assert page.options[0].text == "-a, --all\n       do not ignore entries starting with ."
+
+def test_combined_short_options_are_split():
+    page = parse_page("ls", LS_DOC)
+
+    combined = page.slices(flag="-la")
+    assert combined["flag_found"] is True
+    assert [s["flags"] for s in combined["slices"]] == [["-l"], ["-a", "--all"]]
+    # A single-dash long option documented as a whole is not split
+    assert [o.flags for o in parse_page("find", FIND_DOC).find_options("-mtime")] == [["-mtime"]]
+    assert page.slices(flag="-lz")["slices"][0]["flags"] == ["-l"]
+    assert page.slices(flag="-zq")["flag_found"] is False
+
+def test_slices_by_flag_section_and_budget():
+    page = parse_page("ls", LS_DOC)
+
+    assert [s["text"] for s in page.slices(flag="--all")["slices"]] == [page.options[0].text]
+    assert page.slices(flag="color")["slices"][0]["flags"] == ["--color"]
+    assert page.slices(section="author")["slices"] == [{"section": "AUTHOR", "text": "Written by Richard M. Stallman and David MacKenzie."}]
+
+    missing = page.slices(flag="-z")
+    assert missing["flag_found"] is False
+    assert [s["section"] for s in missing["slices"]] == ["NAME", "SYNOPSIS", "DESCRIPTION"]
+
+    budget = page.slices(max_tokens=8)
+    assert budget["truncated"] is True
+    assert sum(count_tokens(s["text"].removesuffix(" ...")) for s in budget["slices"]) == 8
+
+def test_get_doc_returns_slices(client, renders):
+    data = client.get("/get_doc", params={"command": "find", "flag": "-mtime", "max_tokens": 50}).json()
+
+    assert "full_doc" not in data
+    assert data["sections"] == ["NAME", "SYNOPSIS", "TESTS"]
+    assert data["slices"] == [{
+        "section": "TESTS",
+        "flags": ["-mtime"],
+        "text": "-mtime n\n       File's data was last modified less than, more than or exactly n*24 hours ago.",
+    }]
+    assert data["truncated"] is False
+
+def test_pages_are_parsed_once_at_ingestion(client, renders, monkeypatch):
+    parsed = []
+    monkeypatch.setattr(mcp_linux_doc, "parsed_pages", doc_sections.ParsedPageStore())
+    monkeypatch.setattr(doc_sections, "parse_page", lambda command, doc_text: parsed.append(command) or parse_page(command, doc_text))
+
+    client.get("/get_doc", params={"command": "find", "section": "SYNOPSIS"})
+    client.get("/get_doc", params={"command": "find", "flag": "-name"})
+
+    assert parsed == ["find"]
+
+class FakeEmbedder:
+    """Bag of words over a tiny vocabulary: enough to check the ranking plumbing."""
+    model = "fake-embed"
+    vocabulary = ["modified", "hours", "name", "pattern", "newline", "counts", "lines"]
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed(self, texts):
+        self.calls += 1
+        return normalize([[text.lower().count(word) + 0.01 for word in self.vocabulary] for text in texts])
+
+    def embed_query(self, text):
+        return self.embed([text])[0]
+
+def test_embedding_index_ranks_and_filters():
+    passages = split_passages("find", FIND_DOC) + split_passages("wc", WC_DOC)
+    index = EmbeddingIndex.build(passages, FakeEmbedder(), batch_size=2)
+    embedder = FakeEmbedder()
+
+    results = index.search(embedder.embed_query("modified hours ago"), k=2)
+    assert results[0]["command"] == "find"
+    assert "-mtime" in results[0]["text"]
+    assert results[0]["score"] >= results[1]["score"]
+
+    only_wc = index.search(embedder.embed_query("modified hours ago"), k=5, command="wc")
+    assert {r["command"] for r in only_wc} == {"wc"}
+    assert index.search(embedder.embed_query("x"), command="nope") == []
+
+def test_embedding_index_save_and_memory_map(tmp_path):
+    passages = split_passages("wc", WC_DOC)
+    index = EmbeddingIndex.build(passages, FakeEmbedder())
+    index.save(str(tmp_path / "emb"))
+
+    loaded = EmbeddingIndex.load(str(tmp_path / "emb"))
+
+    assert isinstance(loaded.matrix, np.memmap)
+    assert loaded.matrix.dtype == np.float32
+    assert loaded.model == "fake-embed"
+    assert np.allclose(loaded.matrix, index.matrix)
+    assert EmbeddingIndex.load(str(tmp_path / "missing")) is None
+
+def test_semantic_search_endpoint(client, monkeypatch):
+    embedder = FakeEmbedder()
+    index = EmbeddingIndex.build(split_passages("find", FIND_DOC) + split_passages("wc", WC_DOC), embedder)
+    monkeypatch.setattr(mcp_linux_doc, "embedding_index", index)
+    monkeypatch.setattr(mcp_linux_doc, "embedder", embedder)
+
+    data = client.get("/semantic_search", params={"q": "count the lines", "k": 1}).json()
+
+    assert data["command"] is None
+    assert data["results"][0]["command"] == "wc"
+
+def test_semantic_search_without_index(client, monkeypatch):
+    monkeypatch.setattr(mcp_linux_doc, "embedding_index", None)
+    assert "error" in client.get("/semantic_search", params={"q": "x"}).json()
+
+@pytest.fixture
+def slow_render(monkeypatch, renders):
+    """find renders only once `release` is set; every other page is already cached."""
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocking_render(base_command, man_section=None):
+        renders.append((base_command, man_section))
+        started.set()
+        release.wait(5)
+        return FIND_DOC
+
+    monkeypatch.setattr(mcp_linux_doc, "render_page", blocking_render)
+    monkeypatch.setattr(mcp_linux_doc, "render_pool", RenderPool(max_workers=2, max_pending=1))
+    return started, release
+
+def async_client():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=mcp_linux_doc.app), base_url="http://docs")
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_render(slow_render, renders):
+    started, release = slow_render
+    async with async_client() as client:
+        requests = [asyncio.create_task(client.get("/get_doc", params={"command": "find"})) for _ in range(3)]
+        await asyncio.to_thread(started.wait, 5)
+        release.set()
+        responses = await asyncio.gather(*requests)
+
+    assert [r.json()["full_doc"] for r in responses] == [FIND_DOC] * 3
+    assert renders == [("find", None)]
+    assert mcp_linux_doc.render_pool.stats["coalesced"] == 2
+
+@pytest.mark.asyncio
+async def test_cache_hits_are_served_while_a_page_renders(slow_render, source_page):
+    started, release = slow_render
+    mcp_linux_doc.page_cache.put("wc", None, str(source_page), WC_DOC)
+    async with async_client() as client:
+        pending = asyncio.create_task(client.get("/get_doc", params={"command": "find"}))
+        await asyncio.to_thread(started.wait, 5)
+
+        hit = await asyncio.wait_for(client.get("/get_doc", params={"command": "wc"}), timeout=1)
+        # The pool holds one pending render: another miss is turned away instead of queued
+        rejected = await client.get("/get_doc", params={"command": "find", "man_section": "1"})
+
+        release.set()
+        assert (await pending).json()["full_doc"] == FIND_DOC
+
+    assert hit.json()["full_doc"] == WC_DOC
+    assert rejected.status_code == 503
+    assert rejected.headers["retry-after"] == "1"
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_a_shared_render(renders, monkeypatch, source_page):
+    release = threading.Event()
+
+    def blocking_render(base_command, man_section=None):
+        release.wait(5)
+        return FIND_DOC if base_command == "find" else WC_DOC
+
+    monkeypatch.setattr(mcp_linux_doc, "render_page", blocking_render)
+    monkeypatch.setattr(mcp_linux_doc, "locate_page", lambda base_command, man_section=None: str(source_page))
+    monkeypatch.setattr(mcp_linux_doc, "render_pool", RenderPool(max_workers=1))
+
+    # wc holds the only worker, so the find render is still queued when its first caller goes away
+    busy = asyncio.create_task(mcp_linux_doc.aload_page("wc"))
+    first = asyncio.create_task(mcp_linux_doc.aload_page("find"))
+    second = asyncio.create_task(mcp_linux_doc.aload_page("find"))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    await asyncio.sleep(0.01)
+    release.set()
+
+    assert await asyncio.wait_for(second, timeout=5) == FIND_DOC
+    assert await busy == WC_DOC
+    assert first.cancelled()
+
+@pytest.mark.asyncio
+async def test_get_docs_renders_misses_in_parallel(renders, monkeypatch, source_page):
+    both_started = threading.Barrier(2, timeout=5)
+
+    def parallel_render(base_command, man_section=None):
+        renders.append((base_command, man_section))
+        # Deadlocks (BrokenBarrierError) unless both pages render at the same time
+        both_started.wait()
+        return FIND_DOC if base_command == "find" else WC_DOC
+
+    monkeypatch.setattr(mcp_linux_doc, "render_page", parallel_render)
+    monkeypatch.setattr(mcp_linux_doc, "locate_page", lambda base_command, man_section=None: None if base_command == "nope" else str(source_page))
+    monkeypatch.setattr(mcp_linux_doc, "render_pool", RenderPool(max_workers=2))
+
+    async with async_client() as client:
+        response = await client.get("/get_docs", params={
+            "commands": ["find .", "wc", "nope", "find"],
+            "flags": ["-mtime", "", "", "-name"],
+            "max_tokens": 50,
+        })
+
+    docs = response.json()["docs"]
+    assert list(docs) == ["find", "wc", "nope"]
+    assert docs["find"]["slices"][0]["flags"] == ["-mtime"]
+    assert docs["wc"]["slices"][0]["section"] == "NAME"
+    assert docs["nope"] == {"error": "No documentation found for 'nope'", "not_found": True}
+    assert sorted(renders) == [("find", None), ("wc", None)]
+
+def test_get_docs_limits_the_batch(client, renders):
+    response = client.get("/get_docs", params={"commands": ["ls"] * (mcp_linux_doc.MAX_BATCH_COMMANDS + 1)})
+    assert response.status_code == 422
+
+def test_get_doc_etag_answers_304_when_unchanged(client, renders):
+    first = client.get("/get_doc", params={"command": "find", "flag": "-mtime"})
+    etag = first.headers["etag"]
+    again = client.get("/get_doc", params={"command": "find", "flag": "-mtime"}, headers={"If-None-Match": etag})
+    other_flag = client.get("/get_doc", params={"command": "find", "flag": "-name"}, headers={"If-None-Match": etag})
+
+    assert again.status_code == 304 and again.content == b"" and again.headers["etag"] == etag
+    assert other_flag.status_code == 200 and other_flag.headers["etag"] != etag
+
+def test_get_doc_etag_changes_with_the_page(client, renders, monkeypatch, source_page):
+    etag = client.get("/get_doc", params={"command": "find"}).headers["etag"]
+    # A newer source page is rendered again, so its digest (and tag) changes
+    os.utime(source_page, (source_page.stat().st_atime, source_page.stat().st_mtime + 10))
+    monkeypatch.setattr(mcp_linux_doc, "render_page", lambda base_command, man_section=None: FIND_DOC + "\nBUGS\n       none\n")
+
+    response = client.get("/get_doc", params={"command": "find"}, headers={"If-None-Match": etag})
+    assert response.status_code == 200 and "BUGS" in response.json()["full_doc"]
+
+def test_get_doc_errors_carry_no_etag(client, renders):
+    response = client.get("/get_doc", params={"command": "nope"})
+    assert "etag" not in response.headers
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+async def test_get_doc_compresses_large_bodies(renders, monkeypatch, encoding):
+    if encoding == "zstd" and http_cache.zstandard is None:
+        pytest.skip("zstandard is not installed")
+    monkeypatch.setattr(http_cache, "MIN_COMPRESS_BYTES", 0)
+
+    async with async_client() as client:
+        response = await client.get("/get_doc", params={"command": "find"}, headers={"Accept-Encoding": encoding})
+        revalidated = await client.get("/get_doc", params={"command": "find"}, headers={"If-None-Match": response.headers["etag"]})
+
+    assert response.headers["content-encoding"] == encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json()["full_doc"] == FIND_DOC
+    # The tag of the compressed representation still validates the page
+    assert revalidated.status_code == 304
+
+def test_get_doc_small_bodies_stay_uncompressed(client, renders):
+    response = client.get("/get_doc", params={"command": "nope"}, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+def test_get_docs_etag_covers_every_page(client, renders):
+    params = {"commands": ["find", "find"], "flags": ["-mtime", ""]}
+    etag = client.get("/get_docs", params=params).headers["etag"]
+
+    assert client.get("/get_docs", params=params, headers={"If-None-Match": etag}).status_code == 304
+    with_missing_page = client.get("/get_docs", params={"commands": ["find", "nope"]})
+    assert "etag" not in with_missing_page.headers
@@ -0,0 +1,98 @@
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import HumanMessage
+import main
+import metrics
+from tools import PlanOutput
+from benchmarks.fakes import ScriptedChatModel
+
+def test_render_counter_and_histogram():
+    registry = metrics.Registry()
+    calls = registry.counter("calls_total", "Calls.", ["node"])
+    duration = registry.histogram("duration_seconds", "Duration.", ["node"], buckets=(0.1, 1))
+
+    calls.inc(node="planner")
+    calls.inc(2, node="planner")
+    duration.observe(0.05, node="planner")
+    duration.observe(0.5, node="planner")
+
+    text = registry.render()
+    assert "# TYPE calls_total counter" in text
+    assert 'calls_total{node="planner"} 3' in text
+    assert 'duration_seconds_bucket{node="planner",le="0.1"} 1' in text
+    assert 'duration_seconds_bucket{node="planner",le="1"} 2' in text
+    assert 'duration_seconds_bucket{node="planner",le="+Inf"} 2' in text
+    assert 'duration_seconds_count{node="planner"} 2' in text
+
+def test_register_rejects_duplicates_and_bad_labels():
+    registry = metrics.Registry()
+    counter = registry.counter("x_total", "X.", ["node"])
+    with pytest.raises(ValueError):
+        registry.counter("x_total", "X.")
+    with pytest.raises(ValueError):
+        counter.inc(other="a")
+
+@pytest.mark.asyncio
+async def test_instrument_node_records_duration_and_errors():
+    def failing(state):
+        raise RuntimeError("boom")
+
+    async def ok(state):
+        return state
+
+    _, async_node = metrics.instrument_node("test_ok", ok, ok)
+    sync_node, _ = metrics.instrument_node("test_failing", failing, None)
+
+    assert await async_node({"a": 1}) == {"a": 1}
+    with pytest.raises(RuntimeError):
+        sync_node({})
+
+    assert metrics.node_duration.count(node="test_ok") == 1
+    assert metrics.node_duration.count(node="test_failing") == 1
+    assert metrics.node_errors.value(node="test_failing") == 1
+
+def test_metric_type_without_samples_fails_when_built():
+    class Untyped(metrics.Metric):
+        pass
+
+    with pytest.raises(TypeError):
+        Untyped("agent_untyped", "No samples.")
+
+def test_llm_handler_counts_calls_and_tokens():
+    model = ScriptedChatModel(callbacks=[metrics.LLMMetricsHandler()])
+    model.set_script({"test_llm_node": "three tokens here"})
+    before = metrics.llm_calls.value(node="test_llm_node")
+
+    model.invoke([HumanMessage(content="hello world")], config={"metadata": {"langgraph_node": "test_llm_node"}})
+
+    assert metrics.llm_calls.value(node="test_llm_node") == before + 1
+    assert metrics.llm_tokens.count(node="test_llm_node", kind="completion") == 1
+
+def test_llm_handler_counts_cache_hits_apart():
+    from llm_cache import TTLLRUCache
+    model = ScriptedChatModel(callbacks=[metrics.LLMMetricsHandler()], cache=TTLLRUCache())
+    model.set_script({"test_cached_node": "three tokens here"})
+    config = {"metadata": {"langgraph_node": "test_cached_node"}}
+
+    model.invoke([HumanMessage(content="hello world")], config=config)
+    model.invoke([HumanMessage(content="hello world")], config=config)
+
+    assert metrics.llm_calls.value(node="test_cached_node") == 1
+    assert metrics.llm_cached.value(node="test_cached_node") == 1
+    assert metrics.llm_duration.count(node="test_cached_node") == 1
+    assert metrics.llm_tokens.count(node="test_cached_node", kind="completion") == 1
+
+class FakePlanner:
+    def invoke(self, messages):
+        return PlanOutput(action="linux_doc", command="find")
+
+def test_metrics_route_exposes_planner_decisions(monkeypatch):
+    monkeypatch.setattr(main, "model_with_plan_output", FakePlanner())
+    main.planner_node({"messages": [], "draft_solution": "Think: look it up", "analysis_summary": ""})
+
+    response = TestClient(main.app).get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'agent_planner_decisions_total{action="linux_doc",source="llm"}' in response.text
+    assert 'agent_sessions{store="api"}' in response.text
@@ -0,0 +1,49 @@
+import json
+import model
+
+def test_planner_and_summary_use_the_small_model():
+    assert model.get_model("planner").model == model.SMALL_MODEL
+    assert model.get_model("analyze_previous_summary").model == model.SMALL_MODEL
+    assert model.get_model("reasoning_draft").model == model.LARGE_MODEL
+    assert model.get_model("reasoning_final").model == model.LARGE_MODEL
+
+def test_spec_params_reach_the_client():
+    planner = model.get_model("planner")
+    assert planner.num_predict == model.MODEL_SPECS["planner"].max_tokens
+    assert planner.keep_alive == model.MODEL_SPECS["planner"].keep_alive
+
+def test_roles_with_the_same_spec_share_one_instance():
+    assert model.get_model("reasoning_draft") is model.get_model("reasoning_final")
+    assert model.get_model("unknown_role") is model.get_model("default")
+
+def test_cache_key_distinguishes_models():
+    small = model.get_model("planner")._get_llm_string()
+    large = model.get_model("reasoning_final")._get_llm_string()
+    assert model.SMALL_MODEL in small
+    assert small != large
+
+def test_cache_key_covers_generation_parameters():
+    base = model.OllamaChatModel(model="m", temperature=0.1, num_predict=64)
+    keys = {
+        base._get_llm_string(),
+        model.OllamaChatModel(model="other", temperature=0.1, num_predict=64)._get_llm_string(),
+        model.OllamaChatModel(model="m", temperature=0.7, num_predict=64)._get_llm_string(),
+        model.OllamaChatModel(model="m", temperature=0.1, num_predict=64, num_ctx=8192)._get_llm_string(),
+        model.OllamaChatModel(model="m", temperature=0.1, num_predict=64, format="json")._get_llm_string(),
+    }
+    assert len(keys) == 5
+    # How long the model stays loaded does not change its answers
+    assert model.OllamaChatModel(model="m", temperature=0.1, num_predict=64, keep_alive="5m")._get_llm_string() == base._get_llm_string()
+
+def test_load_model_specs_overrides_fields(tmp_path, monkeypatch):
+    monkeypatch.setattr(model, "MODEL_SPECS", dict(model.MODEL_SPECS))
+    path = tmp_path / "models.json"
+    path.write_text(json.dumps({"planner": {"model": "qwen3:0.6b", "stop": ["\n"]}, "new_role": {"max_tokens": 32}}))
+
+    model.load_model_specs(str(path))
+
+    assert model.model_spec("planner").model == "qwen3:0.6b"
+    assert model.model_spec("planner").stop == ["\n"]
+    assert model.model_spec("planner").max_tokens == 96
+    assert model.model_spec("new_role").model == model.LARGE_MODEL
+    assert model.get_model("planner").stop == ["\n"]
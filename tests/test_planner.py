@@ -0,0 +1,55 @@
+import pytest
+from langchain_core.exceptions import OutputParserException
+import main
+from tools import PlanOutput
+
+def make_state(draft_solution="Think: I need the find options."):
+    return {"messages": [], "current_problem": "Find recent files.", "draft_solution": draft_solution, "analysis_summary": ""}
+
+class FakePlanner:
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+    async def ainvoke(self, messages):
+        return self.invoke(messages)
+
+def test_plan_carries_tool_arguments(monkeypatch):
+    monkeypatch.setattr(main, "model_with_plan_output", FakePlanner(PlanOutput(action="search_in_doc", command="find", keyword="mtime")))
+
+    result = main.planner_node(make_state())
+
+    assert result["plan"] == {"action": "search_in_doc", "input": {"command": "find", "keyword": "mtime"}}
+
+@pytest.mark.asyncio
+async def test_unparsable_plan_keeps_drafting(monkeypatch):
+    monkeypatch.setattr(main, "model_with_plan_output", FakePlanner(OutputParserException("truncated JSON")))
+
+    result = await main.planner_node_async(make_state())
+
+    assert result["plan"]["action"] == "reasoning_draft"
+
+def test_shortcut_skips_the_planner_model(monkeypatch):
+    planner = FakePlanner(PlanOutput(action="linux_doc"))
+    monkeypatch.setattr(main, "model_with_plan_output", planner)
+
+    result = main.planner_node(make_state("Think: done\nAct: answer(3)"))
+
+    assert planner.calls == 0
+    assert result["plan"]["action"] == "reasoning_final"
+
+def test_plan_schema_constrains_action_and_argument_length():
+    schema = PlanOutput.model_json_schema()
+
+    assert schema["properties"]["action"]["enum"] == ["reasoning_draft", "linux_doc", "search_in_doc", "semantic_search", "reasoning_final"]
+    assert schema["properties"]["command"]["maxLength"] == 128
+    # A pipeline fits, so the planner can ask for the batched documentation of all its commands
+    assert PlanOutput(action="linux_doc", command="find . -name '*.log' | xargs grep -c ERROR | sort -n").command.startswith("find")
+    # The schema is sent to Ollama as the `format` of the planner call
+    assert main.model_with_plan_output.first.kwargs["format"]["properties"]["action"]["enum"] == schema["properties"]["action"]["enum"]
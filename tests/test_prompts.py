@@ -0,0 +1,60 @@
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+import analyse
+import main
+import reasoning
+from prompt_and_format import PROMPT_VERSION, get_prompt, load_prompts
+
+def _state(**overrides):
+    state = {
+        "messages": [HumanMessage(content="The output of the OS:\n42")],
+        "current_problem": "Count the files in /etc",
+        "analysis_summary": "",
+        "last_action": "",
+        "draft_solution": "",
+    }
+    return {**state, **overrides}
+
+def test_prompts_are_loaded_once():
+    assert load_prompts("v1") is load_prompts("v1")
+    assert get_prompt("planner") is load_prompts(PROMPT_VERSION)["planner"]
+    assert get_prompt("planner", "v1").version == "v1"
+
+@pytest.mark.parametrize("version", ["v1", "v2"])
+def test_every_prompt_formats_without_leaking_into_the_system_prefix(version):
+    for name, prompt in load_prompts(version).items():
+        assert "{" not in prompt.system.replace("{{", ""), name
+        with pytest.raises(KeyError):
+            prompt.user.format()
+
+@pytest.mark.parametrize("build", [
+    lambda s: analyse._first_interaction_prompt(s)[1],
+    lambda s: analyse._previous_summary_prompt(s)[1],
+    reasoning._first_interaction_prompt,
+    reasoning._multiple_steps_prompt,
+    main._planner_prompt,
+    main._final_messages,
+    lambda s: main._fast_pipeline_messages(s)[1],
+])
+def test_node_prompts_share_a_static_prefix(build):
+    first = build(_state())
+    second = build(_state(
+        messages=[HumanMessage(content="Now, my problem is: which kernel?")],
+        current_problem="Find the kernel release",
+        analysis_summary="6.8.0",
+        last_action="Act: bash",
+        draft_solution="Think: uname -r",
+    ))
+
+    assert isinstance(first[0], SystemMessage)
+    assert first[0].content == second[0].content
+    assert first[1].content != second[1].content
+
+def test_user_template_carries_the_state():
+    messages = main._planner_prompt(_state(draft_solution="Think: ls /etc | wc -l"))
+    assert "Task: Count the files in /etc" in messages[1].content
+    assert "Reasoning draft: Think: ls /etc | wc -l" in messages[1].content
+
+def test_versions_list_the_same_prompts():
+    assert load_prompts("v2").keys() == load_prompts("v1").keys()
+    assert "semantic_search" in get_prompt("planner", "v2").system
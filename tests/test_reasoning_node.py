@@ -1,3 +1,4 @@
+import pytest
 import reasoning
 
 class FakeLLM:
@@ -85,3 +86,46 @@ def test_reasoning_draft_node_dispatch(monkeypatch):
     result = reasoning.reasoning_draft_node(state)
     assert "Think:" in result["draft_solution"]
     assert "Act:" in result["draft_solution"]
+
+class FakeAsyncLLM(FakeLLM):
+    async def ainvoke(self, messages):
+        return self.invoke(messages)
+
+@pytest.mark.asyncio
+async def test_reasoning_draft_node_async_dispatch(monkeypatch):
+    monkeypatch.setattr(reasoning, "llm", FakeAsyncLLM())
+
+    state = {
+        "messages": [],
+        "expected_format": "",
+        "analysis_summary": "",
+        "current_problem": "List processes.",
+        "last_action": None,
+        "draft_solution": "",
+        "tool_context": "",
+        "cycles": 0,
+    }
+
+    result = await reasoning.reasoning_draft_node_async(state)
+    assert "Think:" in result["draft_solution"]
+    assert "Act:" in result["draft_solution"]
+
+@pytest.mark.asyncio
+async def test_reasoning_draft_multiple_steps_async_shortcut(monkeypatch):
+    monkeypatch.setattr(reasoning, "llm", FakeAsyncLLM())
+
+    state = {
+        "messages": [
+            reasoning.HumanMessage(content="The output of the OS:\n42")
+        ],
+        "expected_format": "",
+        "analysis_summary": "Output: 42",
+        "current_problem": "How many files are in /etc?",
+        "last_action": "```bash\nls /etc | wc -l\n```",
+        "draft_solution": "",
+        "tool_context": "",
+        "cycles": 1,
+    }
+
+    result = await reasoning.reasoning_draft_multiple_steps_async(state)
+    assert "Act: answer(42)" in result["draft_solution"]
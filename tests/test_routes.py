@@ -1,10 +1,11 @@
+import asyncio
 import pytest
 from fastapi.testclient import TestClient
 from routes import create_router, session_cache
 from fastapi import FastAPI
 
 class FakeAppGraph:
-    def invoke(self, state, config=None):
+    async def ainvoke(self, state, config=None):
         return {
             "expected_format": "",
             "analysis_summary": "The user wants to count files.",
@@ -89,7 +90,7 @@ def test_chat_with_empty_message_list(client):
     assert isinstance(content, str)
 
 class AppGraphWithCycleIncrement:
-    def invoke(self, state, config=None):
+    async def ainvoke(self, state, config=None):
         return {
             **state,
             "last_action": "```bash\necho OK\n```",
@@ -116,7 +117,7 @@ def test_cycle_is_incremented(client_with_cycle_graph):
     assert session_cache["cycle-thread"]["cycles"] == 2
 
 class PartialAppGraph:
-    def invoke(self, state, config=None):
+    async def ainvoke(self, state, config=None):
         return {
             "last_action": "```bash\necho partial\n```"
         }
@@ -149,3 +150,240 @@ def test_partial_result_falls_back_to_context(client_with_partial_graph):
 
     assert session_cache["partial"]["analysis_summary"] == "Initial summary"
     assert session_cache["partial"]["last_action"] == "```bash\necho partial\n```"
+
+class StreamingAppGraph:
+    async def astream(self, state, config=None, stream_mode=None):
+        from langchain_core.messages import AIMessageChunk
+        yield "updates", {"analyze": {"current_problem": "Count files in /etc."}}
+        yield "messages", (AIMessageChunk(content="Think: "), {"langgraph_node": "reasoning_draft"})
+        yield "messages", (AIMessageChunk(content="ignored"), {"langgraph_node": "planner"})
+        yield "updates", {"reasoning_draft": {"draft_solution": "Think: count"}}
+        yield "values", {
+            **state,
+            "current_problem": "Count files in /etc.",
+            "last_action": "```bash\nls /etc | wc -l\n```",
+        }
+
+@pytest.fixture
+def client_with_streaming_graph():
+    app = FastAPI()
+    app.include_router(create_router(StreamingAppGraph()))
+    return TestClient(app)
+
+def test_chat_stream_ndjson(client_with_streaming_graph):
+    import json
+    session_cache.clear()
+
+    payload = {
+        "messages": [{"role": "user", "content": "How many files are in /etc?"}],
+        "thread_id": "stream-thread",
+        "stream": True
+    }
+
+    response = client_with_streaming_graph.post("/api/chat", json=payload)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[0] == {"event": "node", "node": "analyze"}
+    assert events[1] == {"event": "token", "node": "reasoning_draft", "content": "Think: "}
+    assert events[-1] == {"event": "last_action", "content": "```bash\nls /etc | wc -l\n```"}
+    assert all(e.get("node") != "planner" or e["event"] == "node" for e in events)
+
+    assert session_cache["stream-thread"]["current_problem"] == "Count files in /etc."
+
+def test_chat_stream_sse(client_with_streaming_graph):
+    session_cache.clear()
+
+    payload = {
+        "messages": [{"role": "user", "content": "How many files are in /etc?"}],
+        "thread_id": "sse-thread",
+        "stream": True
+    }
+
+    response = client_with_streaming_graph.post(
+        "/api/chat", json=payload, headers={"Accept": "text/event-stream"}
+    )
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text.startswith("event: node\ndata: ")
+    assert "event: last_action" in response.text
+
+class ConfigRecordingGraph:
+    def __init__(self):
+        self.configs = []
+
+    async def ainvoke(self, state, config=None):
+        self.configs.append(config)
+        return {**state, "last_action": "Act: finish"}
+
+def test_bypass_cache_is_forwarded_in_config():
+    from llm_cache import BYPASS_KEY
+    graph = ConfigRecordingGraph()
+    app = FastAPI()
+    app.include_router(create_router(graph))
+    client = TestClient(app)
+
+    client.post("/api/chat", json={"messages": [{"role": "user", "content": "hi"}], "thread_id": "t"})
+    client.post("/api/chat", json={"messages": [{"role": "user", "content": "hi"}], "thread_id": "t", "bypass_cache": True})
+
+    assert graph.configs[0]["configurable"]["thread_id"] == "t"
+    assert graph.configs[0]["configurable"][BYPASS_KEY] is False
+    assert graph.configs[1]["configurable"][BYPASS_KEY] is True
+
+class NamedGraph:
+    def __init__(self, name):
+        self.name = name
+
+    async def ainvoke(self, state, config=None):
+        return {**state, "last_action": self.name}
+
+def test_mode_selects_fast_graph(monkeypatch):
+    import routes
+    app = FastAPI()
+    app.include_router(create_router(NamedGraph("thorough"), fast_graph=NamedGraph("fast")))
+    client = TestClient(app)
+    payload = {"messages": [{"role": "user", "content": "hi"}], "thread_id": "mode"}
+
+    assert client.post("/api/chat", json=payload).json()["choices"][0]["message"]["content"] == "thorough"
+    assert client.post("/api/chat", json={**payload, "mode": "fast"}).json()["choices"][0]["message"]["content"] == "fast"
+
+    monkeypatch.setattr(routes, "DEFAULT_MODE", "fast")
+    assert client.post("/api/chat", json=payload).json()["choices"][0]["message"]["content"] == "fast"
+    assert client.post("/api/chat", json={**payload, "mode": "thorough"}).json()["choices"][0]["message"]["content"] == "thorough"
+
+class SlowFirstGraph:
+    """Item 0 is the slowest: completion order differs from request order."""
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+
+    async def ainvoke(self, state, config=None):
+        import asyncio
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        content = state["messages"][-1].content
+        await asyncio.sleep(0.05 if content == "slow" else 0.01)
+        self.running -= 1
+        if content == "boom":
+            raise RuntimeError("graph failed")
+        return {**state, "last_action": f"done {content}"}
+
+def test_batch_streams_results_in_completion_order():
+    import json
+    session_cache.clear()
+    graph = SlowFirstGraph()
+    app = FastAPI()
+    app.include_router(create_router(graph))
+    client = TestClient(app)
+
+    payload = {
+        "items": [
+            {"messages": [{"role": "user", "content": "slow"}], "thread_id": "b0"},
+            {"messages": [{"role": "user", "content": "fast"}], "thread_id": "b1"},
+            {"messages": [{"role": "user", "content": "boom"}], "thread_id": "b2"},
+        ],
+        "max_concurrency": 3
+    }
+    response = client.post("/api/chat/batch", json=payload)
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["index"] for r in results][-1] == 0
+    assert {r["index"] for r in results} == {0, 1, 2}
+    by_index = {r["index"]: r for r in results}
+    assert by_index[1]["choices"][0]["message"]["content"] == "done fast"
+    assert by_index[2]["error"] == "graph failed"
+    assert session_cache["b0"]["last_action"] == "done slow"
+
+def test_batch_respects_concurrency_limit():
+    graph = SlowFirstGraph()
+    app = FastAPI()
+    app.include_router(create_router(graph))
+    client = TestClient(app)
+
+    items = [{"messages": [{"role": "user", "content": "fast"}], "thread_id": f"c{i}"} for i in range(6)]
+    client.post("/api/chat/batch", json={"items": items, "max_concurrency": 2})
+
+    assert graph.max_running == 2
+
+def test_batch_serializes_items_of_the_same_thread():
+    graph = SlowFirstGraph()
+    app = FastAPI()
+    app.include_router(create_router(graph))
+    client = TestClient(app)
+
+    items = [{"messages": [{"role": "user", "content": "fast"}], "thread_id": "same"} for _ in range(3)]
+    client.post("/api/chat/batch", json={"items": items})
+
+    assert graph.max_running == 1
+
+class SlowGraph:
+    """Compiled-graph stand-in: one step done, then stuck in a node until the deadline cancels it."""
+    checkpointer = object()
+
+    def __init__(self):
+        self.cancelled = False
+
+    async def ainvoke(self, state, config=None):
+        from langchain_core.runnables import RunnableLambda
+        from deadline import guard_node
+
+        async def stuck(state):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                self.cancelled = True
+                raise
+
+        _, node = guard_node(lambda s: s, stuck)
+        return await RunnableLambda(lambda s: s, afunc=node).ainvoke(state, config=config)
+
+    async def aget_state(self, config):
+        class Snapshot:
+            values = {"current_problem": "Count files in /etc.", "draft_solution": "Think: use ls", "last_action": ""}
+        return Snapshot()
+
+def test_deadline_cancels_the_node_and_finishes_gracefully():
+    from deadline import FINISH_ON_DEADLINE
+    session_cache.clear()
+    graph = SlowGraph()
+    app = FastAPI()
+    app.include_router(create_router(graph))
+    client = TestClient(app)
+
+    response = client.post("/api/chat", json={"messages": [{"role": "user", "content": "hi"}], "thread_id": "slow", "timeout": 0.05})
+
+    assert response.json()["choices"][0]["message"]["content"] == FINISH_ON_DEADLINE
+    assert graph.cancelled
+    assert session_cache["slow"]["current_problem"] == "Count files in /etc."
+    assert session_cache["slow"]["last_action"] == FINISH_ON_DEADLINE
+
+def test_client_timeout_cannot_lift_the_server_deadline(client, monkeypatch):
+    import routes
+    monkeypatch.setattr(routes, "TURN_TIMEOUT", 30)
+
+    assert routes.turn_deadline(0) is not None
+    assert routes.turn_deadline(-5) is not None
+    response = client.post("/api/chat", json={"messages": [{"role": "user", "content": "hi"}], "timeout": 0})
+    assert response.status_code == 422
+
+@pytest.mark.asyncio
+async def test_client_disconnect_cancels_the_graph():
+    import routes
+
+    class DisconnectedRequest:
+        async def is_disconnected(self):
+            return True
+
+    cancelled = asyncio.Event()
+
+    async def never_ends():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(routes.ClientDisconnected):
+        await routes.run_until_disconnect(never_ends(), DisconnectedRequest())
+    await asyncio.wait_for(cancelled.wait(), 1)
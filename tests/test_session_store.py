@@ -0,0 +1,214 @@
+import pytest
+import session_store
+from session_store import SessionStore, InMemorySessionStore, SQLiteSessionStore, LatestCheckpointSaver, build_initial_state, merge_session_context
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(**limits):
+        if request.param == "sqlite":
+            return SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"), **limits)
+        return InMemorySessionStore(**limits)
+    return make
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(session_store.time, "time", lambda: now[0])
+    return now
+
+def test_dict_like_access(make_store):
+    store = make_store()
+    store["t1"] = {"current_problem": "Count files", "cycles": 1}
+
+    assert "t1" in store
+    assert store["t1"]["cycles"] == 1
+    assert store.get("missing", {"cycles": 0}) == {"cycles": 0}
+    with pytest.raises(KeyError):
+        store["missing"]
+
+    store.clear()
+    assert len(store) == 0
+
+def test_capacity_evicts_least_recently_used(make_store, clock):
+    store = make_store(max_entries=2)
+    evicted = []
+    store.add_eviction_listener(evicted.append)
+
+    store["a"] = {"n": 1}
+    clock[0] += 1
+    store["b"] = {"n": 2}
+    clock[0] += 1
+    store.get("a")
+    clock[0] += 1
+    store["c"] = {"n": 3}
+
+    assert evicted == ["b"]
+    assert sorted(store) == ["a", "c"]
+    assert store.stats()["evictions"] == {"capacity": 1}
+
+def test_idle_ttl_expires_sessions(make_store, clock):
+    store = make_store(ttl=60)
+    evicted = []
+    store.add_eviction_listener(evicted.append)
+
+    store["a"] = {"n": 1}
+    clock[0] += 61
+
+    assert store.get("a") is None
+    assert evicted == ["a"]
+    assert store.stats()["evictions"] == {"ttl": 1}
+
+def test_memory_size_cap(make_store, clock):
+    store = make_store(max_bytes=150)
+
+    store["a"] = {"draft_solution": "x" * 80}
+    clock[0] += 1
+    store["b"] = {"draft_solution": "y" * 80}
+
+    assert "a" not in store
+    assert store["b"]["draft_solution"] == "y" * 80
+    assert store.stats()["bytes"] <= 150
+
+def test_sqlite_sessions_survive_reopen(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    SQLiteSessionStore(path)["t1"] = {"current_problem": "Count files"}
+
+    assert SQLiteSessionStore(path)["t1"] == {"current_problem": "Count files"}
+
+def test_create_session_store_from_env(monkeypatch, tmp_path):
+    monkeypatch.setenv("SESSION_BACKEND", "sqlite")
+    monkeypatch.setenv("SESSION_DB_PATH", str(tmp_path / "env.sqlite3"))
+    monkeypatch.setenv("SESSION_MAX_ENTRIES", "5")
+    monkeypatch.setenv("SESSION_TTL", "0")
+
+    store = session_store.create_session_store()
+
+    assert isinstance(store, SQLiteSessionStore)
+    assert store.max_entries == 5
+    assert store.ttl is None
+
+def test_partial_backend_fails_when_built():
+    class GetOnlyStore(SessionStore):
+        def get(self, thread_id, default=None):
+            return default
+
+    with pytest.raises(TypeError):
+        GetOnlyStore()
+
+def test_merge_session_context_falls_back_to_previous_context():
+    context = {"analysis_summary": "Initial summary", "cycles": 1, "tool_history": []}
+    merged = merge_session_context(context, {"last_action": "Act: finish"})
+
+    assert merged["analysis_summary"] == "Initial summary"
+    assert merged["last_action"] == "Act: finish"
+    assert build_initial_state(merged, "hi")["cycles"] == 1
+
+def test_history_carries_across_turns_within_budget():
+    from langchain_core.messages import AIMessage
+    from compaction import HISTORY_TOKEN_BUDGET, is_summary, message_tokens
+
+    store = SQLiteSessionStore(":memory:")
+    for turn in range(50):
+        state = build_initial_state(store.get("t", {}), f"question {turn}")
+        assert state["messages"][-1].content == f"question {turn}"
+        result = {**state, "messages": state["messages"] + [AIMessage(content="answer " + "word " * 100)]}
+        store["t"] = merge_session_context(store.get("t", {}), result)
+
+    messages = build_initial_state(store.get("t", {}), "next")["messages"]
+    assert is_summary(messages[0])
+    assert messages[-3].content == "question 49"
+    assert message_tokens(messages) <= HISTORY_TOKEN_BUDGET
+
+def test_eviction_drops_thread_checkpoints():
+    from langgraph.checkpoint.memory import MemorySaver
+    from langgraph.graph import StateGraph, END
+    from typing import TypedDict
+
+    class State(TypedDict):
+        value: int
+
+    graph = StateGraph(State)
+    graph.add_node("step", lambda state: {"value": state["value"] + 1})
+    graph.add_edge("step", END)
+    graph.set_entry_point("step")
+    checkpointer = MemorySaver()
+    app = graph.compile(checkpointer=checkpointer)
+
+    store = InMemorySessionStore(max_entries=1)
+    store.add_eviction_listener(checkpointer.delete_thread)
+
+    app.invoke({"value": 0}, config={"configurable": {"thread_id": "old"}})
+    store["old"] = {"cycles": 1}
+    store["new"] = {"cycles": 1}
+
+    assert checkpointer.get({"configurable": {"thread_id": "old"}}) is None
+
+def counter_app(checkpointer):
+    from langgraph.graph import StateGraph, END
+    from typing import TypedDict
+
+    class State(TypedDict):
+        value: int
+        log: list
+
+    graph = StateGraph(State)
+    graph.add_node("first", lambda state: {"value": state["value"] + 1, "log": state["log"] + ["first"]})
+    graph.add_node("second", lambda state: {"value": state["value"] + 1, "log": state["log"] + ["second"]})
+    graph.add_edge("first", "second")
+    graph.add_edge("second", END)
+    graph.set_entry_point("first")
+    return graph.compile(checkpointer=checkpointer)
+
+def test_latest_checkpoint_saver_keeps_one_checkpoint_per_thread():
+    checkpointer = LatestCheckpointSaver()
+    app = counter_app(checkpointer)
+    config = {"configurable": {"thread_id": "default"}}
+
+    sizes = []
+    for turn in range(20):
+        app.invoke({"value": turn, "log": ["x" * 100]}, config=config)
+        sizes.append(checkpointer.thread_bytes("default"))
+
+    assert len(list(checkpointer.list(config))) == 1
+    assert app.get_state(config).values["value"] == 21
+    # Only the latest checkpoint is held, whatever the number of turns
+    assert sizes[-1] - sizes[1] < 20
+
+@pytest.mark.asyncio
+async def test_latest_checkpoint_saver_async_and_failed_run():
+    checkpointer = LatestCheckpointSaver()
+    app = counter_app(checkpointer)
+    config = {"configurable": {"thread_id": "t"}}
+
+    await app.ainvoke({"value": 0, "log": []}, config=config)
+    with pytest.raises(TypeError):
+        # "first" fails on a None value: the state stays at the checkpoint before it
+        await app.ainvoke({"value": None, "log": []}, config=config)
+
+    snapshot = await app.aget_state(config)
+    assert snapshot.values["value"] is None
+    assert snapshot.next == ("first",)
+    assert [t async for t in checkpointer.alist(config)] != []
+
+def test_latest_checkpoint_saver_delete_thread():
+    checkpointer = LatestCheckpointSaver()
+    app = counter_app(checkpointer)
+    app.invoke({"value": 0, "log": []}, config={"configurable": {"thread_id": "a"}})
+    app.invoke({"value": 0, "log": []}, config={"configurable": {"thread_id": "b"}})
+    checkpointer.delete_thread("a")
+
+    assert checkpointer.thread_bytes("a") == 0
+    assert checkpointer.thread_bytes("b") > 0
+    assert checkpointer.get({"configurable": {"thread_id": "b"}}) is not None
+
+def test_size_cap_counts_thread_checkpoints(make_store):
+    store = make_store(max_bytes=1000)
+    held = {"a": 995, "b": 0}
+    store.add_size_source(lambda thread_id: held.get(thread_id, 0))
+
+    store["a"] = {"cycles": 1}
+    store["b"] = {"cycles": 1}
+
+    assert "a" not in store
+    assert store.evictions["size"] == 1
+    assert store.total_bytes() == len('{"cycles": 1}')
@@ -0,0 +1,326 @@
+import asyncio
+import threading
+import time
+import pytest
+from langchain_core.messages import HumanMessage
+import tools
+
+FAKE_DOC = {
+    "command": "find",
+    "summary": ["NAME", "SYNOPSIS", "DESCRIPTION"],
+    "full_doc": "NAME\n  find - search for files\nOPTIONS\n  -mtime n  File's data was last modified n*24 hours ago.\n",
+}
+
+@pytest.fixture(autouse=True)
+def empty_tool_cache():
+    tools.tool_cache.clear()
+    yield
+    tools.tool_cache.clear()
+
+def make_state(plan_input):
+    return {
+        "messages": [HumanMessage(content="How many files changed today?")],
+        "expected_format": "",
+        "analysis_summary": "",
+        "draft_solution": "",
+        "tool_context": "",
+        "cycles": 0,
+        "plan": {"action": "linux_doc", "input": plan_input},
+    }
+
+def test_linux_doc_node_appends_result(monkeypatch):
+    monkeypatch.setattr(tools, "_fetch_doc", lambda base_command, flag="": FAKE_DOC)
+
+    result = tools.linux_doc_node(make_state('{"command": "find . -mtime 0"}'))
+
+    assert result["cycles"] == 1
+    assert result["tool_history"] == ["linux_doc"]
+    assert result["messages"][-1].content.startswith("[linux_doc RESULT]\nNAME")
+
+FAKE_SEARCH = {
+    "query": "mtime",
+    "command": "find",
+    "results": [
+        {"command": "find", "section": "OPTIONS", "text": "-mtime n File's data was last modified n*24 hours ago.", "score": 3.2},
+    ],
+}
+
+def test_search_in_doc_node_formats_ranked_passages(monkeypatch):
+    calls = []
+
+    def fake_search_doc(base_command, keyword):
+        calls.append((base_command, keyword))
+        return FAKE_SEARCH
+
+    monkeypatch.setattr(tools, "_search_doc", fake_search_doc)
+
+    result = tools.search_in_doc_node(make_state('{"command": "find", "keyword": "mtime"}'))
+
+    assert calls == [("find", "mtime")]
+    assert result["messages"][-1].content == "[search_in_doc RESULT]\n[find OPTIONS] -mtime n File's data was last modified n*24 hours ago."
+
+def test_search_in_doc_node_without_command_searches_everything(monkeypatch):
+    calls = []
+
+    def fake_search_doc(base_command, keyword):
+        calls.append((base_command, keyword))
+        return {"query": keyword, "command": None, "results": []}
+
+    monkeypatch.setattr(tools, "_search_doc", fake_search_doc)
+
+    result = tools.search_in_doc_node(make_state('{"keyword": "modified"}'))
+
+    assert calls == [("", "modified")]
+    assert "No matches found for 'modified'" in result["messages"][-1].content
+
+def test_tool_nodes_read_structured_plan_arguments(monkeypatch):
+    fetched, searched = [], []
+    monkeypatch.setattr(tools, "_fetch_doc", lambda base_command, flag="": fetched.append(base_command) or FAKE_DOC)
+    monkeypatch.setattr(tools, "_search_doc", lambda base_command, keyword: searched.append((base_command, keyword)) or FAKE_SEARCH)
+
+    tools.linux_doc_node(make_state({"command": "find", "keyword": ""}))
+    tools.search_in_doc_node(make_state({"command": "", "keyword": "mtime"}))
+
+    assert fetched == ["find"]
+    assert searched == [("", "mtime")]
+
+def test_search_params_omit_empty_command():
+    assert tools._search_params("", "mtime") == {"q": "mtime", "k": 5}
+    assert tools._search_params("find", "mtime")["command"] == "find"
+
+@pytest.mark.asyncio
+async def test_linux_doc_node_async_uses_async_fetch(monkeypatch):
+    calls = []
+
+    async def fake_afetch_doc(base_command, flag=""):
+        calls.append((base_command, flag))
+        return FAKE_DOC
+
+    monkeypatch.setattr(tools, "_afetch_doc", fake_afetch_doc)
+
+    result = await tools.linux_doc_node_async(make_state('{"command": "find . -mtime 0"}'))
+
+    assert calls == [("find", "-mtime")]
+    assert result["tool_history"] == ["linux_doc"]
+
+@pytest.mark.asyncio
+async def test_search_in_doc_node_async_reports_missing_doc(monkeypatch):
+    async def fake_asearch_doc(base_command, keyword):
+        return {"error": "No documentation found for 'nope'", "not_found": True}
+
+    monkeypatch.setattr(tools, "_asearch_doc", fake_asearch_doc)
+
+    result = await tools.search_in_doc_node_async(make_state('{"command": "nope", "keyword": "x"}'))
+
+    assert "No documentation found for 'nope'" in result["messages"][-1].content
+
+def test_tool_cache_serves_repeated_lookups(monkeypatch):
+    calls = []
+    monkeypatch.setattr(tools, "_fetch_doc", lambda base_command, flag="": calls.append(base_command) or FAKE_DOC)
+
+    first = tools.linux_doc.invoke("find .")
+    second = tools.linux_doc.invoke("/usr/bin/find /tmp")
+
+    assert first == second
+    assert calls == ["find"]
+    assert tools.tool_cache.stats()["hits"] >= 1
+
+def test_tool_cache_normalizes_keywords(monkeypatch):
+    calls = []
+    monkeypatch.setattr(tools, "_search_doc", lambda base_command, keyword: calls.append((base_command, keyword)) or FAKE_SEARCH)
+
+    tools.search_in_doc.invoke({"command": "find", "keyword": "MTIME"})
+    tools.search_in_doc.invoke({"command": "find .", "keyword": " mtime "})
+
+    assert calls == [("find", "mtime")]
+
+def test_tool_cache_expires_and_evicts(monkeypatch):
+    cache = tools.ToolResultCache(max_entries=2, ttl=60)
+    now = [1000.0]
+    monkeypatch.setattr(tools.time, "monotonic", lambda: now[0])
+
+    for command in ("ls", "find", "chmod"):
+        cache.get_or_fetch(("linux_doc", command, ""), lambda: FAKE_DOC)
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["evictions"] == 1
+
+    now[0] += 61
+    fetched = []
+    cache.get_or_fetch(("linux_doc", "chmod", ""), lambda: fetched.append(1) or FAKE_DOC)
+    assert fetched == [1]
+    assert cache.stats()["expirations"] == 1
+
+def test_tool_cache_does_not_store_failures():
+    cache = tools.ToolResultCache()
+
+    def unavailable():
+        raise RuntimeError("doc server down")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_fetch(("linux_doc", "find", ""), unavailable)
+    # An error body of an overloaded server is returned but not kept either
+    cache.get_or_fetch(("linux_doc", "find", ""), lambda: {"detail": "Service Unavailable"})
+
+    assert cache.get_or_fetch(("linux_doc", "find", ""), lambda: FAKE_DOC) == FAKE_DOC
+
+def test_tool_cache_single_flight_across_threads():
+    cache = tools.ToolResultCache()
+    calls = []
+    started = threading.Event()
+
+    def slow_fetch():
+        calls.append(1)
+        started.set()
+        time.sleep(0.05)
+        return FAKE_DOC
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.get_or_fetch(("linux_doc", "find", ""), slow_fetch)))
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=lambda: results.append(cache.get_or_fetch(("linux_doc", "find", ""), slow_fetch))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    for thread in [leader, *followers]:
+        thread.join()
+
+    assert calls == [1]
+    assert results == [FAKE_DOC] * 4
+    assert cache.stats()["coalesced"] == 3
+
+@pytest.mark.asyncio
+async def test_tool_cache_single_flight_across_coroutines(monkeypatch):
+    calls = []
+
+    async def slow_afetch_doc(base_command, flag=""):
+        calls.append(base_command)
+        await asyncio.sleep(0.01)
+        return FAKE_DOC
+
+    monkeypatch.setattr(tools, "_afetch_doc", slow_afetch_doc)
+
+    results = await asyncio.gather(*(tools.alinux_doc("find") for _ in range(5)))
+
+    assert calls == ["find"]
+    assert len(set(results)) == 1
+
+@pytest.mark.asyncio
+async def test_tool_cache_cancelled_leader_does_not_fail_waiters():
+    cache = tools.ToolResultCache()
+    release = asyncio.Event()
+
+    async def slow_fetch():
+        await release.wait()
+        return FAKE_DOC
+
+    leader = asyncio.create_task(cache.aget_or_fetch(("linux_doc", "find", ""), slow_fetch))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(cache.aget_or_fetch(("linux_doc", "find", ""), slow_fetch))
+    await asyncio.sleep(0)
+    # The request that started the lookup hits its deadline
+    leader.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await waiter == FAKE_DOC
+    assert leader.cancelled()
+    assert cache.stats()["coalesced"] == 1
+    assert cache.peek(("linux_doc", "find", "")) == FAKE_DOC
+
+FAKE_SLICES = {
+    "command": "find",
+    "summary": ["NAME", "SYNOPSIS"],
+    "sections": ["NAME", "SYNOPSIS", "TESTS"],
+    "flag_found": True,
+    "slices": [{"section": "TESTS", "flags": ["-mtime"], "text": "-mtime n\n       File's data was last modified n*24 hours ago."}],
+    "truncated": False,
+}
+
+def test_linux_doc_node_requests_the_planned_option(monkeypatch):
+    params = []
+    monkeypatch.setattr(tools.doc_client, "get_json", lambda path, p: params.append((path, p)) or FAKE_SLICES)
+
+    result = tools.linux_doc_node(make_state({"command": "find", "keyword": "-mtime"}))
+
+    assert params == [("/get_doc", {"command": "find", "max_tokens": tools.DOC_MAX_TOKENS, "flag": "-mtime"})]
+    assert result["messages"][-1].content == "[linux_doc RESULT]\nTESTS\n-mtime n\n       File's data was last modified n*24 hours ago."
+
+def test_linux_doc_reports_undocumented_option(monkeypatch):
+    overview = {**FAKE_SLICES, "flag_found": False, "slices": [{"section": "NAME", "text": "find - search for files"}]}
+    monkeypatch.setattr(tools, "_fetch_doc", lambda base_command, flag="": overview)
+
+    text = tools.linux_doc.invoke("find . -newerXY x")
+
+    assert text == "No '-newerXY' option in the manual of 'find'.\n\nNAME\nfind - search for files"
+
+def test_transient_semantic_error_is_not_cached(monkeypatch):
+    replies = [{"error": "Ollama unreachable"}, FAKE_SEARCH]
+    monkeypatch.setattr(tools, "_semantic_search", lambda base_command, query: replies.pop(0))
+
+    assert "unavailable" in tools.semantic_doc_search.invoke({"query": "files modified today"})
+    assert tools.semantic_doc_search.invoke({"query": "files modified today"}).startswith("[find OPTIONS]")
+
+def test_missing_doc_is_cached(monkeypatch):
+    calls = []
+    monkeypatch.setattr(tools, "_fetch_doc", lambda base_command, flag="": calls.append(base_command) or {"error": "No documentation found for 'nope'", "not_found": True})
+
+    tools.linux_doc.invoke({"command": "nope"})
+    tools.linux_doc.invoke({"command": "nope"})
+    assert calls == ["nope"]
+
+def test_semantic_search_node_asks_the_problem(monkeypatch):
+    calls = []
+    monkeypatch.setattr(tools, "_semantic_search", lambda base_command, query: calls.append((base_command, query)) or FAKE_SEARCH)
+
+    state = {**make_state({"command": "", "keyword": ""}), "current_problem": "List files modified in the last day"}
+    result = tools.semantic_search_node(state)
+
+    assert calls == [("", "list files modified in the last day")]
+    assert result["tool_history"] == ["semantic_search"]
+    assert result["messages"][-1].content.startswith("[semantic_search RESULT]\n[find OPTIONS] -mtime n")
+
+def test_overloaded_doc_server_is_reported_and_not_cached(monkeypatch):
+    replies = [{"detail": "Render queue full (32 renders pending)"}, FAKE_DOC]
+    monkeypatch.setattr(tools, "_fetch_doc", lambda base_command, flag="": replies.pop(0))
+
+    assert tools.linux_doc.invoke("find") == "Documentation server unavailable: Render queue full (32 renders pending)"
+    assert tools.linux_doc.invoke("find").startswith("NAME")
+
+def test_doc_targets_of_a_pipeline():
+    assert tools._doc_targets("find . -name '*.log' | xargs grep -c ERROR | sort -n") == [("find", "-name"), ("grep", "-c"), ("sort", "-n")]
+    assert tools._doc_targets("LC_ALL=C ls -l && ls -a; /bin/wc -l x") == [("ls", "-l"), ("wc", "-l")]
+
+def test_doc_targets_skip_wrapper_arguments_and_shell_keywords():
+    assert tools._doc_targets("sudo -u root find / -name x") == [("find", "-name")]
+    assert tools._doc_targets("find . | xargs -n 1 grep foo") == [("find", ""), ("grep", "")]
+    assert tools._doc_targets("nice -n 10 tar -c x; watch -n 5 df -h") == [("tar", "-c"), ("df", "-h")]
+    assert tools._doc_targets("for f in *; do wc -l $f; done") == [("wc", "-l")]
+    assert tools._doc_targets("if grep -q x f; then echo yes; fi") == [("grep", "-q"), ("echo", "")]
+
+def test_linux_docs_fetches_only_the_misses_in_one_request(monkeypatch):
+    requests = []
+
+    def fake_fetch_docs(targets):
+        requests.append(targets)
+        return {"docs": {base_command: {**FAKE_DOC, "command": base_command} for base_command, _ in targets}}
+
+    monkeypatch.setattr(tools, "_fetch_docs", fake_fetch_docs)
+    monkeypatch.setattr(tools, "_fetch_doc", lambda base_command, flag="": pytest.fail("single fetch"))
+    tools.tool_cache.store(("linux_doc", "sort", "-n"), FAKE_DOC)
+
+    text = tools.linux_docs.invoke("find . -name x | xargs grep -c y | sort -n")
+
+    assert requests == [[("find", "-name"), ("grep", "-c")]]
+    assert [line for line in text.splitlines() if line.startswith("## ")] == ["## find", "## grep", "## sort"]
+    # Each page is cached on its own: a later single lookup is a hit
+    assert tools.linux_doc.invoke({"command": "grep", "flag": "-c"}).startswith("NAME")
+
+def test_linux_doc_node_documents_the_draft_pipeline(monkeypatch):
+    requests = []
+    monkeypatch.setattr(tools, "_fetch_docs", lambda targets: requests.append(targets) or {"docs": {c: FAKE_DOC for c, _ in targets}})
+
+    state = {**make_state({"command": "", "keyword": ""}), "draft_solution": "Think: count\n\n```bash\nls /etc | wc -l\n```"}
+    result = tools.linux_doc_node(state)
+
+    assert requests == [[("ls", ""), ("wc", "-l")]]
+    assert result["messages"][-1].content.startswith("[linux_doc RESULT]\n## ls\nNAME")
@@ -0,0 +1,108 @@
+import asyncio
+import json
+import time
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+import main
+from warmup import ModelWarmer, parse_expires_at, model_tag
+
+class FakeOllama:
+    """/api/generate loads the model, /api/ps lists what is loaded."""
+
+    def __init__(self, resident=None):
+        self.resident = dict(resident or {})
+        self.generated = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/generate":
+            payload = json.loads(request.content)
+            self.generated.append(payload)
+            self.resident[model_tag(payload["model"])] = "2999-01-01T00:00:00.123456789Z"
+            return httpx.Response(200, json={"response": "ok", "done": True})
+        if request.url.path == "/api/ps":
+            return httpx.Response(200, json={"models": [{"name": n, "expires_at": e} for n, e in self.resident.items()]})
+        return httpx.Response(404)
+
+def make_warmer(ollama, models=None, **kwargs):
+    models = models or {"qwen2.5-coder:7b": "30m", "qwen2.5-coder:1.5b": -1}
+    return ModelWarmer(models, base_url="http://ollama", transport=httpx.MockTransport(ollama), **kwargs)
+
+@pytest.mark.asyncio
+async def test_warm_all_loads_every_model_with_keep_alive():
+    ollama = FakeOllama()
+    warmer = make_warmer(ollama)
+
+    assert (await warmer.status())["ready"] is False
+    await warmer.warm_all()
+
+    assert [p["model"] for p in ollama.generated] == ["qwen2.5-coder:7b", "qwen2.5-coder:1.5b"]
+    assert [p["keep_alive"] for p in ollama.generated] == ["30m", -1]
+    assert all(p["options"]["num_predict"] == 1 for p in ollama.generated)
+    assert (await warmer.status())["ready"] is True
+    await warmer.aclose()
+
+@pytest.mark.asyncio
+async def test_refresh_rewarms_missing_and_expiring_models():
+    expiring = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + 10))
+    ollama = FakeOllama({"qwen2.5-coder:7b": expiring, "qwen3:latest": "2999-01-01T00:00:00Z"})
+    warmer = make_warmer(ollama, {"qwen2.5-coder:7b": "30m", "qwen2.5-coder:1.5b": "30m", "qwen3": "30m"}, interval=60)
+
+    await warmer.refresh()
+
+    assert sorted(p["model"] for p in ollama.generated) == ["qwen2.5-coder:1.5b", "qwen2.5-coder:7b"]
+    await warmer.aclose()
+
+@pytest.mark.asyncio
+async def test_run_survives_a_bad_ps_body():
+    ollama = FakeOllama()
+    bodies = [b"not json", b'{"models": [{"expires_at": "2999-01-01T00:00:00Z"}]}']
+    ps_calls = []
+
+    def flaky(request):
+        if request.url.path == "/api/ps":
+            ps_calls.append(1)
+            if bodies:
+                return httpx.Response(200, content=bodies.pop(0))
+        return ollama(request)
+
+    warmer = make_warmer(flaky, interval=0)
+    task = asyncio.create_task(warmer.run())
+
+    async def third_pass():
+        while len(ps_calls) < 3:
+            await asyncio.sleep(0.01)
+
+    # The broken passes (ValueError, then KeyError) are logged and the loop keeps refreshing
+    await asyncio.wait_for(third_pass(), timeout=5)
+    assert not task.done()
+    task.cancel()
+    await warmer.aclose()
+
+@pytest.mark.asyncio
+async def test_unreachable_ollama_is_not_ready():
+    def down(request):
+        raise httpx.ConnectError("connection refused")
+
+    warmer = ModelWarmer({"qwen2.5-coder:7b": "30m"}, base_url="http://ollama", transport=httpx.MockTransport(down))
+
+    assert await warmer.warm("qwen2.5-coder:7b") is False
+    status = await warmer.status()
+    assert status["ready"] is False
+    assert "connection refused" in status["error"]
+    await warmer.aclose()
+
+def test_parse_expires_at_handles_nanoseconds():
+    assert parse_expires_at("2024-06-04T14:38:31.837533113-07:00") == pytest.approx(1717537111.837533)
+    assert parse_expires_at(None) is None
+
+def test_ready_endpoint(monkeypatch):
+    ollama = FakeOllama()
+    monkeypatch.setattr(main.app.state, "warmer", make_warmer(ollama, {"qwen2.5-coder:7b": "30m"}), raising=False)
+    client = TestClient(main.app)
+
+    assert client.get("/ready").status_code == 503
+    ollama.resident["qwen2.5-coder:7b"] = None
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["models"]["qwen2.5-coder:7b"]["resident"] is True
@@ -1,15 +1,29 @@
+import asyncio
+import os
+import re
+import shlex
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
 from langchain_core.tools import tool
-from termcolor import colored
-import httpx
+import doc_client
+from logs import get_logger
+from compaction import append_messages
 from typing import TypedDict, List
 from langchain_core.messages import BaseMessage
-from pydantic import BaseModel
-from typing import Literal, Dict
+from pydantic import BaseModel, Field
+from typing import Literal, Dict, Callable, Awaitable
 from langchain_core.messages import HumanMessage
 
 class PlanOutput(BaseModel):
-    action: Literal["linux_doc", "search_in_doc", "finish"]
-    input: Dict[str, str]
+    """Planner decision, generated under Ollama's JSON-schema constraint: the action is always one of the graph edges."""
+    action: Literal["reasoning_draft", "linux_doc", "search_in_doc", "semantic_search", "reasoning_final"]
+    # Long enough for a pipeline: linux_doc documents each of its commands in one batch
+    command: str = Field(default="", max_length=128, description="Command whose manual linux_doc/search_in_doc should read, e.g. find, or a whole pipeline for linux_doc, e.g. find . -name '*.log' | xargs grep -c ERROR.")
+    keyword: str = Field(default="", max_length=32, description="What search_in_doc looks for in the manual, or the option linux_doc should show, e.g. -mtime.")
+
+log = get_logger("tools")
 
 class AgentState(TypedDict):
     messages: List[BaseMessage]
@@ -18,85 +32,513 @@ class AgentState(TypedDict):
     draft_solution: str
     tool_context: str
     cycles: int
+    plan: dict
 
-@tool
-def linux_doc(command: str) -> str:
-    """Fetch Linux manual page for a command."""
-    base_command = command.strip().split()[0]
-    url = f"http://localhost:9000/get_doc?command={base_command}"
-    resp = httpx.get(url, timeout=10)
-    data = resp.json()
+class ToolResultCache:
+    """
+    Doc server replies keyed by (tool, base command, keyword), shared by every session:
+    - in-memory LRU of `max_entries` items, each valid for `ttl` seconds (None: forever)
+    - single flight: concurrent identical lookups wait for the one request in progress
+      (a concurrent.futures.Future for threads, a detached asyncio.Task for coroutines)
+    Failed fetches raise to every waiter and are not stored.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float | None = 600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[tuple, tuple[float, dict]] = OrderedDict()
+        self._inflight: Dict[tuple, Future] = {}
+        self._ainflight: Dict[tuple, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "expirations": 0}
+
+    @classmethod
+    def from_env(cls) -> "ToolResultCache":
+        ttl = float(os.environ.get("TOOL_CACHE_TTL", 600))
+        return cls(max_entries=int(os.environ.get("TOOL_CACHE_SIZE", 256)), ttl=ttl if ttl > 0 else None)
+
+    def _get(self, key: tuple) -> dict | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        created, value = entry
+        if self.ttl is not None and time.monotonic() - created > self.ttl:
+            del self._entries[key]
+            self._stats["expirations"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _put(self, key: tuple, value: dict) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def get_or_fetch(self, key: tuple, fetch: Callable[[], dict]) -> dict:
+        with self._lock:
+            value = self._get(key)
+            if value is not None:
+                self._stats["hits"] += 1
+                return value
+            pending = self._inflight.get(key)
+            if pending is None:
+                self._stats["misses"] += 1
+                self._inflight[key] = leader = Future()
+            else:
+                self._stats["coalesced"] += 1
+        if pending is not None:
+            return pending.result()
+
+        try:
+            value = fetch()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            leader.set_exception(e)
+            raise
+        with self._lock:
+            if _cacheable(value):
+                self._put(key, value)
+            del self._inflight[key]
+        leader.set_result(value)
+        return value
+
+    async def aget_or_fetch(self, key: tuple, fetch: Callable[[], Awaitable[dict]]) -> dict:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            value = self._get(key)
+            if value is not None:
+                self._stats["hits"] += 1
+                return value
+            task = self._ainflight.get(key)
+            if task is not None and task.get_loop() is not loop:
+                task = None
+            if task is None:
+                self._stats["misses"] += 1
+                # Detached from the caller: cancelling the request that started it leaves it running for the others
+                self._ainflight[key] = task = loop.create_task(self._afetch(key, fetch))
+            else:
+                self._stats["coalesced"] += 1
+        # shield: a cancelled caller (deadline, disconnect) only stops waiting
+        return await asyncio.shield(task)
+
+    async def _afetch(self, key: tuple, fetch: Callable[[], Awaitable[dict]]) -> dict:
+        task = asyncio.current_task()
+        try:
+            value = await fetch()
+        except BaseException:
+            with self._lock:
+                if self._ainflight.get(key) is task:
+                    del self._ainflight[key]
+            # Every caller may have been cancelled: avoid "exception was never retrieved"
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            raise
+        with self._lock:
+            if _cacheable(value):
+                self._put(key, value)
+            if self._ainflight.get(key) is task:
+                del self._ainflight[key]
+        return value
+
+    def peek(self, key: tuple) -> dict | None:
+        """Cached value without fetching, for the batched lookups that fetch their misses together."""
+        with self._lock:
+            value = self._get(key)
+            self._stats["hits" if value is not None else "misses"] += 1
+            return value
+
+    def store(self, key: tuple, value: dict) -> None:
+        with self._lock:
+            if _cacheable(value):
+                self._put(key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries), "max_entries": self.max_entries, "ttl": self.ttl}
+
+def _cacheable(data: dict) -> bool:
+    """
+    Pages, search results and "no documentation" answers (flagged not_found by the server).
+    Not other errors: an unavailable server, Ollama down or an index not built yet may clear up on the next call.
+    """
+    return isinstance(data, dict) and (any(key in data for key in ("full_doc", "slices", "results")) or data.get("not_found") is True)
+
+tool_cache = ToolResultCache.from_env()
+
+# Token budget of a linux_doc result: the doc server returns only the slices that fit
+DOC_MAX_TOKENS = int(os.environ.get("DOC_MAX_TOKENS", 400))
+
+def _doc_params(base_command: str, flag: str) -> dict:
+    params = {"command": base_command, "max_tokens": DOC_MAX_TOKENS}
+    if flag:
+        params["flag"] = flag
+    return params
+
+# Commands documented by one linux_docs call (the server accepts 16)
+DOC_BATCH_MAX = int(os.environ.get("DOC_BATCH_MAX", 8))
+
+def _docs_params(targets: list[tuple[str, str]]) -> dict:
+    return {
+        "commands": [base_command for base_command, _ in targets],
+        "flags": [flag for _, flag in targets],
+        "max_tokens": DOC_MAX_TOKENS,
+    }
+
+def _fetch_docs(targets: list[tuple[str, str]]) -> dict:
+    return doc_client.get_json("/get_docs", _docs_params(targets))
+
+async def _afetch_docs(targets: list[tuple[str, str]]) -> dict:
+    return await doc_client.aget_json("/get_docs", _docs_params(targets))
+
+def _fetch_doc(base_command: str, flag: str = "") -> dict:
+    return doc_client.get_json("/get_doc", _doc_params(base_command, flag))
+
+async def _afetch_doc(base_command: str, flag: str = "") -> dict:
+    return await doc_client.aget_json("/get_doc", _doc_params(base_command, flag))
+
+def _search_params(base_command: str, keyword: str) -> dict:
+    params = {"q": keyword, "k": 5}
+    if base_command:
+        params["command"] = base_command
+    return params
+
+def _search_doc(base_command: str, keyword: str) -> dict:
+    return doc_client.get_json("/search", _search_params(base_command, keyword))
+
+async def _asearch_doc(base_command: str, keyword: str) -> dict:
+    return await doc_client.aget_json("/search", _search_params(base_command, keyword))
+
+def _semantic_search(base_command: str, query: str) -> dict:
+    return doc_client.get_json("/semantic_search", _search_params(base_command, query))
+
+async def _asemantic_search(base_command: str, query: str) -> dict:
+    return await doc_client.aget_json("/semantic_search", _search_params(base_command, query))
+
+def _unavailable(data: dict, expected: str) -> str | None:
+    """Error body of a doc server that stayed overloaded or down after the client's retries."""
+    if "error" in data or expected in data:
+        return None
+    return f"Documentation server unavailable: {data.get('detail', 'unexpected response')}"
+
+def _format_linux_doc(base_command: str, flag: str, data: dict) -> str:
+    unavailable = _unavailable(data, "slices" if "slices" in data else "full_doc")
+    if unavailable:
+        return unavailable
     if "error" in data:
         return f"No documentation found for '{base_command}'"
-    prefix = colored("[TOOL]", "magenta")
-    print(f"{prefix} has been called")
-    return data['full_doc'][:1500]
+    log.debug("tool_called", tool="linux_doc", command=base_command, flag=flag)
+    if "slices" not in data:
+        # Doc server without sliced queries
+        return data['full_doc'][:1500]
+    text = "\n\n".join(f"{s['section']}\n{s['text']}" for s in data["slices"])
+    if flag and not data.get("flag_found", True):
+        text = f"No '{flag}' option in the manual of '{base_command}'.\n\n{text}"
+    return text
 
-@tool
-def search_in_doc(command: str, keyword: str) -> str:
-    """Search for a keyword inside the Linux manual of a command."""
-    base_command = command.strip().split()[0]
-    url = f"http://localhost:9000/get_doc?command={base_command}"
-    resp = httpx.get(url, timeout=10)
-    data = resp.json()
+def _format_search_in_doc(base_command: str, keyword: str, data: dict) -> str:
+    unavailable = _unavailable(data, "results")
+    if unavailable:
+        return unavailable
     if "error" in data:
         return f"No documentation found for '{base_command}'"
-    matches = [line for line in data['full_doc'].splitlines() if keyword.lower() in line.lower()]
-    if not matches:
+    if not data["results"]:
         return f"No matches found for '{keyword}'"
-    prefix = colored("[TOOL]", "magenta")
-    print(f"{prefix} has been called")
-    return "\n".join(matches[:10])
+    log.debug("tool_called", tool="search_in_doc", command=base_command, keyword=keyword)
+    return "\n".join(f"[{hit['command']} {hit['section']}] {hit['text']}" for hit in data["results"])
+
+def _format_semantic_search(query: str, data: dict) -> str:
+    unavailable = _unavailable(data, "results")
+    if unavailable:
+        return unavailable
+    if "error" in data:
+        return f"Semantic doc search unavailable: {data['error']}"
+    if not data["results"]:
+        return f"No passages found for '{query}'"
+    log.debug("tool_called", tool="semantic_search", query=query)
+    return "\n".join(f"[{hit['command']} {hit['section']}] {hit['text']}" for hit in data["results"])
+
+def _base_command(command: str) -> str:
+    """"/usr/bin/find . -mtime 0" -> "find": the man page only depends on the binary."""
+    parts = command.strip().split()
+    return os.path.basename(parts[0]) if parts else ""
+
+def _doc_flag(command: str, flag: str = "") -> str:
+    """The option to read about: `flag` when given, else the first option of the command line."""
+    if flag.strip():
+        return flag.strip()
+    options = [part for part in command.split()[1:] if part.startswith("-") and len(part) > 1]
+    return options[0] if options else ""
+
+# Words running the next command of the line rather than being one
+COMMAND_PREFIXES = {"sudo", "xargs", "time", "nohup", "nice", "env", "exec", "command", "watch"}
+# Options of those wrappers taking a separate argument: "sudo -u root find", "xargs -n 1 grep"
+WRAPPER_OPTION_ARGS = {
+    "sudo": {"-u", "-g", "-h", "-p", "-C", "-D", "-U", "-r", "-t"},
+    "xargs": {"-n", "-I", "-P", "-L", "-d", "-s", "-a", "-E"},
+    "nice": {"-n"},
+    "watch": {"-n"},
+    "env": {"-u", "-C"},
+    "time": {"-f", "-o"},
+}
+# Shell reserved words: a loop or test header is not a command, the body after it is
+SHELL_HEADERS = {"for", "select", "case", "function"}
+SHELL_KEYWORDS = {"do", "done", "if", "then", "else", "elif", "fi", "while", "until", "esac", "in", "{", "}", "!", "[[", "]]"}
+
+def _command_words(words: list[str]) -> list[str]:
+    """The words of the command a segment runs, past reserved words, assignments and wrappers."""
+    while words:
+        word = words[0]
+        if word in SHELL_HEADERS:
+            return []
+        if word in SHELL_KEYWORDS or "=" in word and not word.startswith("-"):
+            words = words[1:]
+            continue
+        if word not in COMMAND_PREFIXES:
+            return words
+        words = words[1:]
+        while words and words[0].startswith("-") and len(words) > 1:
+            option, words = words[0], words[1:]
+            if option in WRAPPER_OPTION_ARGS.get(word, ()) and len(words) > 1:
+                words = words[1:]
+    return words
+
+def _doc_targets(command_line: str) -> list[tuple[str, str]]:
+    """(base command, first option) of every command of a pipeline or command list, in order, without duplicates."""
+    targets: Dict[str, str] = {}
+    for segment in re.split(r"\|\|?|&&|;|\n|\$\(|`", command_line):
+        try:
+            words = shlex.split(segment)
+        except ValueError:
+            words = segment.split()
+        # Skip "for ..." headers, "do"/"then", FOO=bar assignments and wrappers: "sudo -u root find", "xargs grep -c"
+        words = _command_words(words)
+        if not words or not re.match(r"^[\w./+-]+$", words[0]) or words[0].startswith("-"):
+            continue
+        base_command = _base_command(words[0])
+        targets.setdefault(base_command, _doc_flag(" ".join(words)))
+    return list(targets.items())[:DOC_BATCH_MAX]
+
+def _normalize_keyword(keyword: str) -> str:
+    # The doc index lowercases its tokens: "MTIME" and " mtime" are the same search
+    return " ".join(keyword.lower().split())
+
+@tool
+def linux_doc(command: str, flag: str = "") -> str:
+    """Fetch the Linux manual page of a command, or only the paragraph of one of its options (e.g. flag="-mtime")."""
+    base_command, flag = _base_command(command), _doc_flag(command, flag)
+    data = tool_cache.get_or_fetch(("linux_doc", base_command, flag), lambda: _fetch_doc(base_command, flag))
+    return _format_linux_doc(base_command, flag, data)
+
+@tool
+def search_in_doc(command: str, keyword: str) -> str:
+    """Search for a keyword inside the Linux manual of a command. Leave command empty to search every manual."""
+    base_command, keyword = _base_command(command), _normalize_keyword(keyword)
+    data = tool_cache.get_or_fetch(("search_in_doc", base_command, keyword), lambda: _search_doc(base_command, keyword))
+    return _format_search_in_doc(base_command, keyword, data)
+
+async def alinux_doc(command: str, flag: str = "") -> str:
+    """Async counterpart of linux_doc, used by the async graph nodes."""
+    base_command, flag = _base_command(command), _doc_flag(command, flag)
+    data = await tool_cache.aget_or_fetch(("linux_doc", base_command, flag), lambda: _afetch_doc(base_command, flag))
+    return _format_linux_doc(base_command, flag, data)
+
+async def asearch_in_doc(command: str, keyword: str) -> str:
+    """Async counterpart of search_in_doc, used by the async graph nodes."""
+    base_command, keyword = _base_command(command), _normalize_keyword(keyword)
+    data = await tool_cache.aget_or_fetch(("search_in_doc", base_command, keyword), lambda: _asearch_doc(base_command, keyword))
+    return _format_search_in_doc(base_command, keyword, data)
+
+def _format_linux_docs(docs: Dict[str, tuple[str, dict]]) -> str:
+    if not docs:
+        return "No command found to document"
+    return "\n\n".join(f"## {base_command}\n{_format_linux_doc(base_command, flag, data)}" for base_command, (flag, data) in docs.items())
+
+def _split_cached(targets: list[tuple[str, str]]) -> tuple[Dict[str, tuple[str, dict]], list[tuple[str, str]]]:
+    cached, missing = {}, []
+    for base_command, flag in targets:
+        data = tool_cache.peek(("linux_doc", base_command, flag))
+        if data is not None:
+            cached[base_command] = (flag, data)
+        else:
+            missing.append((base_command, flag))
+    return cached, missing
+
+def _merge_fetched(targets: list[tuple[str, str]], cached: Dict, reply: dict) -> Dict[str, tuple[str, dict]]:
+    fetched = reply.get("docs")
+    docs = {}
+    for base_command, flag in targets:
+        if base_command in cached:
+            docs[base_command] = cached[base_command]
+            continue
+        # A reply without "docs" is an error body: every missing command gets it
+        data = fetched.get(base_command, {"detail": "missing from the batch"}) if fetched is not None else reply
+        tool_cache.store(("linux_doc", base_command, flag), data)
+        docs[base_command] = (flag, data)
+    return docs
+
+@tool
+def linux_docs(commands: str) -> str:
+    """Fetch the manual pages of every command of a shell pipeline (e.g. "find . -name '*.log' | xargs grep -c ERROR") in one request."""
+    targets = _doc_targets(commands)
+    cached, missing = _split_cached(targets)
+    reply = _fetch_docs(missing) if missing else {"docs": {}}
+    return _format_linux_docs(_merge_fetched(targets, cached, reply))
+
+async def alinux_docs(commands: str) -> str:
+    """Async counterpart of linux_docs, used by the async graph nodes."""
+    targets = _doc_targets(commands)
+    cached, missing = _split_cached(targets)
+    reply = await _afetch_docs(missing) if missing else {"docs": {}}
+    return _format_linux_docs(_merge_fetched(targets, cached, reply))
+
+@tool
+def semantic_doc_search(query: str, command: str = "") -> str:
+    """Find the manual passages answering a question in plain words (e.g. "files modified in the last day"), without knowing the command or option."""
+    base_command, query = _base_command(command), _normalize_keyword(query)
+    data = tool_cache.get_or_fetch(("semantic_search", base_command, query), lambda: _semantic_search(base_command, query))
+    return _format_semantic_search(query, data)
+
+async def asemantic_doc_search(query: str, command: str = "") -> str:
+    """Async counterpart of semantic_doc_search, used by the async graph nodes."""
+    base_command, query = _base_command(command), _normalize_keyword(query)
+    data = await tool_cache.aget_or_fetch(("semantic_search", base_command, query), lambda: _asemantic_search(base_command, query))
+    return _format_semantic_search(query, data)
 
 import re
 from langchain_core.messages import HumanMessage
-from termcolor import colored
 
-def linux_doc_node(state: AgentState) -> AgentState:
+def _linux_doc_args(state: AgentState) -> tuple[str, str]:
     # Récupérer le plan
     plan = state.get("plan", {})
     plan_input = plan.get("input", "")
 
+    # Planner decisions carry their arguments; fast-path rules and older checkpoints only have text
+    if isinstance(plan_input, dict):
+        command = plan_input.get("command", "")
+        keyword = plan_input.get("keyword", "")
+    else:
+        match = re.search(r'"command"\s*:\s*"([^"]+)"', plan_input)
+        command = match.group(1) if match else ""
+        keyword = ""
+    # No command named: document the ones the draft is about to run
+    command = command or _draft_code(state) or "ls"
 
-    match = re.search(r'"command"\s*:\s*"([^"]+)"', plan_input)
-    command = match.group(1) if match else "ls"
+    # A keyword naming an option narrows the page to that option's paragraph
+    flag = keyword.strip() if keyword.strip().startswith("-") else ""
 
-    print(colored(f"[TOOL CALL] linux_doc with command='{command}'", "cyan"))
+    log.info("tool_call", tool="linux_doc", command=command, flag=flag)
+    return command, flag
 
-    result = linux_doc(command)
-    print(colored(f"[TOOL RESULT] linux_doc returned {len(result)} chars", "cyan"))
+def _linux_doc_result(state: AgentState, result: str) -> AgentState:
+    log.info("tool_result", tool="linux_doc", chars=len(result))
 
     new_state = {
         **state,
-        "messages": state["messages"] + [HumanMessage(content=f"[linux_doc RESULT]\n{result}")],
+        "messages": append_messages(state["messages"], [HumanMessage(content=f"[linux_doc RESULT]\n{result}")]),
         "tool_history": state.get("tool_history", []) + ["linux_doc"],
         "cycles": state.get("cycles", 0) + 1
     }
 
-    print(colored(f"[STATE AFTER linux_doc_node] Keys: {list(new_state.keys())}", "red"))
+    log.debug("state_after_tool", tool="linux_doc", state_keys=new_state.keys())
     return new_state
 
-def search_in_doc_node(state: AgentState) -> AgentState:
-    plan = state.get("plan", {})
-    plan_input = plan.get("input", "")
+def _draft_code(state: AgentState) -> str:
+    match = re.search(r"```(?:bash|sh)?\n(.*?)```", state.get("draft_solution", ""), re.DOTALL)
+    return match.group(1).strip() if match else ""
+
+def _is_batch(command: str) -> bool:
+    return len(_doc_targets(command)) > 1
+
+def linux_doc_node(state: AgentState) -> AgentState:
+    command, flag = _linux_doc_args(state)
+    if _is_batch(command):
+        # One /get_docs request for every command of the pipeline
+        result = linux_docs.invoke(command)
+    else:
+        result = linux_doc.invoke({"command": command, "flag": flag})
+    return _linux_doc_result(state, result)
 
-    cmd_match = re.search(r'"command"\s*:\s*"([^"]+)"', plan_input)
-    kw_match = re.search(r'"keyword"\s*:\s*"([^"]+)"', plan_input)
+async def linux_doc_node_async(state: AgentState) -> AgentState:
+    command, flag = _linux_doc_args(state)
+    if _is_batch(command):
+        result = await alinux_docs(command)
+    else:
+        result = await alinux_doc(command, flag)
+    return _linux_doc_result(state, result)
 
-    cmd = cmd_match.group(1) if cmd_match else "ls"
-    kw = kw_match.group(1) if kw_match else "--help"
+def _search_in_doc_args(state: AgentState) -> tuple[str, str]:
+    plan = state.get("plan", {})
+    plan_input = plan.get("input", "")
 
-    print(colored(f"[TOOL CALL] search_in_doc {cmd}:{kw}", "cyan"))
+    if isinstance(plan_input, dict):
+        cmd, kw = plan_input.get("command", ""), plan_input.get("keyword", "")
+    else:
+        cmd_match = re.search(r'"command"\s*:\s*"([^"]+)"', plan_input)
+        kw_match = re.search(r'"keyword"\s*:\s*"([^"]+)"', plan_input)
+        cmd = cmd_match.group(1) if cmd_match else ""
+        kw = kw_match.group(1) if kw_match else ""
 
+    # Without a command the search runs across every indexed man page
+    kw = kw or "--help"
 
-    result = search_in_doc(cmd, kw)
+    log.info("tool_call", tool="search_in_doc", command=cmd, keyword=kw)
+    return cmd, kw
 
+def _search_in_doc_result(state: AgentState, result: str) -> AgentState:
     new_state = {
         **state,
-        "messages": state["messages"] + [HumanMessage(content=f"[search_in_doc RESULT]\n{result}")],
+        "messages": append_messages(state["messages"], [HumanMessage(content=f"[search_in_doc RESULT]\n{result}")]),
         "tool_history": state.get("tool_history", []) + ["search_in_doc"],
         "cycles": state.get("cycles", 0) + 1
     }
 
-    print(colored(f"[STATE AFTER search_in_doc_node] Keys: {list(new_state.keys())}", "cyan"))
+    log.info("tool_result", tool="search_in_doc", chars=len(result))
+    log.debug("state_after_tool", tool="search_in_doc", state_keys=new_state.keys())
     return new_state
+
+def search_in_doc_node(state: AgentState) -> AgentState:
+    cmd, kw = _search_in_doc_args(state)
+    result = search_in_doc.invoke({"command": cmd, "keyword": kw})
+    return _search_in_doc_result(state, result)
+
+async def search_in_doc_node_async(state: AgentState) -> AgentState:
+    cmd, kw = _search_in_doc_args(state)
+    result = await asearch_in_doc(cmd, kw)
+    return _search_in_doc_result(state, result)
+
+def _semantic_search_args(state: AgentState) -> tuple[str, str]:
+    plan_input = state.get("plan", {}).get("input", "")
+    keyword = plan_input.get("keyword", "") if isinstance(plan_input, dict) else ""
+    command = plan_input.get("command", "") if isinstance(plan_input, dict) else ""
+    # The keyword is capped at 32 characters: the problem itself is the better question when it is missing
+    query = keyword or state.get("current_problem", "") or state.get("analysis_summary", "")
+
+    log.info("tool_call", tool="semantic_search", command=command, query=query)
+    return query, command
+
+def _semantic_search_result(state: AgentState, result: str) -> AgentState:
+    log.info("tool_result", tool="semantic_search", chars=len(result))
+    return {
+        **state,
+        "messages": append_messages(state["messages"], [HumanMessage(content=f"[semantic_search RESULT]\n{result}")]),
+        "tool_history": state.get("tool_history", []) + ["semantic_search"],
+        "cycles": state.get("cycles", 0) + 1
+    }
+
+def semantic_search_node(state: AgentState) -> AgentState:
+    query, command = _semantic_search_args(state)
+    result = semantic_doc_search.invoke({"query": query, "command": command})
+    return _semantic_search_result(state, result)
+
+async def semantic_search_node_async(state: AgentState) -> AgentState:
+    query, command = _semantic_search_args(state)
+    result = await asemantic_doc_search(query, command)
+    return _semantic_search_result(state, result)
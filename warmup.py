@@ -0,0 +1,137 @@
+import asyncio
+import os
+import re
+import time
+from datetime import datetime
+from typing import Dict
+import httpx
+from logs import get_logger
+from model import MODEL_SPECS
+
+log = get_logger("warmup")
+
+# WARMUP=0 disables the startup pre-load and the periodic re-warm (/ready still reports what is resident).
+WARMUP_ENABLED = os.environ.get("WARMUP", "1") != "0"
+# Seconds between two re-warm passes; models expiring within two passes are refreshed.
+WARMUP_INTERVAL = float(os.environ.get("WARMUP_INTERVAL", 300))
+WARMUP_TIMEOUT = float(os.environ.get("WARMUP_TIMEOUT", 120))
+
+def ollama_base_url() -> str:
+    host = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+    return host if "://" in host else f"http://{host}"
+
+def model_tag(name: str) -> str:
+    """Ollama lists models with their tag: "qwen3" is resident as "qwen3:latest"."""
+    return name if ":" in name else f"{name}:latest"
+
+def parse_expires_at(value: str | None) -> float | None:
+    """Ollama's expires_at (RFC 3339, nanosecond fraction) as a Unix timestamp."""
+    if not value:
+        return None
+    value = re.sub(r"(\.\d{6})\d+", r"\1", value).replace("Z", "+00:00")
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return None
+
+def configured_models() -> Dict[str, str | int | None]:
+    """Every distinct model of the registry, with the keep_alive of its first role."""
+    models: Dict[str, str | int | None] = {}
+    for spec in MODEL_SPECS.values():
+        models.setdefault(spec.model, spec.keep_alive)
+    return models
+
+class ModelWarmer:
+    """
+    Keeps the registry's models loaded in Ollama:
+    - warm_all() sends every model a one-token prompt with its keep_alive
+    - refresh() re-warms the models that are not resident or expire soon
+    - status() is what /ready reports: ready once every model is resident
+    """
+
+    def __init__(self, models: Dict[str, str | int | None], base_url: str | None = None,
+                 interval: float = WARMUP_INTERVAL, timeout: float = WARMUP_TIMEOUT, transport=None):
+        self.models = models
+        self.interval = interval
+        self._client = httpx.AsyncClient(base_url=base_url or ollama_base_url(), timeout=timeout, transport=transport)
+        self.last_warmed: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+
+    @classmethod
+    def from_registry(cls, **kwargs) -> "ModelWarmer":
+        return cls(configured_models(), **kwargs)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def resident(self) -> Dict[str, float | None]:
+        """Loaded models (name -> expiry timestamp, None when pinned forever), from Ollama's /api/ps."""
+        resp = await self._client.get("/api/ps")
+        resp.raise_for_status()
+        return {m["name"]: parse_expires_at(m.get("expires_at")) for m in resp.json().get("models", [])}
+
+    async def warm(self, model: str) -> bool:
+        payload = {"model": model, "prompt": "ok", "stream": False, "options": {"num_predict": 1}}
+        if self.models.get(model) is not None:
+            payload["keep_alive"] = self.models[model]
+        start = time.perf_counter()
+        try:
+            resp = await self._client.post("/api/generate", json=payload)
+            resp.raise_for_status()
+        except httpx.HTTPError as e:
+            self.errors[model] = str(e) or type(e).__name__
+            log.warning("warmup_failed", model=model, error=self.errors[model])
+            return False
+        self.errors.pop(model, None)
+        self.last_warmed[model] = time.time()
+        log.info("model_warmed", model=model, seconds=round(time.perf_counter() - start, 3))
+        return True
+
+    async def warm_all(self) -> None:
+        # One at a time: loading several models at once only makes them evict each other
+        for model in self.models:
+            await self.warm(model)
+
+    async def refresh(self) -> None:
+        try:
+            resident = await self.resident()
+        except httpx.HTTPError as e:
+            log.warning("warmup_ps_failed", error=str(e) or type(e).__name__)
+            return
+        soon = time.time() + 2 * self.interval
+        for model in self.models:
+            tag = model_tag(model)
+            if tag not in resident:
+                await self.warm(model)
+            elif resident[tag] is not None and resident[tag] < soon:
+                await self.warm(model)
+
+    async def _guarded(self, step) -> None:
+        # An unexpected /api/ps body (bad JSON, missing name, unparsable expiry) must not end the background task
+        try:
+            await step()
+        except Exception as e:
+            log.error("warmup_pass_failed", exc_info=e, error=str(e) or type(e).__name__)
+
+    async def run(self) -> None:
+        """Startup pre-load, then a refresh pass every `interval` seconds."""
+        await self._guarded(self.warm_all)
+        while True:
+            await asyncio.sleep(self.interval)
+            await self._guarded(self.refresh)
+
+    async def status(self) -> Dict:
+        try:
+            resident = await self.resident()
+        except httpx.HTTPError as e:
+            return {"ready": False, "error": str(e) or type(e).__name__, "models": {}}
+        models = {
+            model: {
+                "resident": model_tag(model) in resident,
+                "expires_at": resident.get(model_tag(model)),
+                "last_warmed": self.last_warmed.get(model),
+                "error": self.errors.get(model),
+            }
+            for model in self.models
+        }
+        return {"ready": all(m["resident"] for m in models.values()), "models": models}